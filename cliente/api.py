@@ -0,0 +1,37 @@
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+
+from eventos.cache import versoes
+from eventos.models import Certificado
+from type_event.api import listar, login_api, resposta_condicional
+from type_event.replicas import ler_da_replica
+
+from .certificados import ARMAZENAMENTO
+
+
+# campos que podem ser pedidos em ?campos=; os dados do evento vêm do JOIN na mesma consulta
+CAMPOS_CERTIFICADO = {
+    'id': 'id', 'url': 'certificado', 'evento': 'evento_id', 'evento_nome': 'evento__nome',
+    'carga_horaria': 'evento__carga_horaria', 'data_inicio': 'evento__data_inicio',
+    'data_termino': 'evento__data_termino', 'enviado_em': 'enviado_em',
+}
+CAMPOS_CERTIFICADO_PADRAO = ('id', 'evento', 'evento_nome', 'url')
+
+
+def _formatar_certificado(item):
+    # o id sempre vem, ele é o cursor
+    if 'url' in item:
+        item['url'] = (ARMAZENAMENTO.url(item['url']) if item['url']
+                       else reverse('eventos:ver_certificado', kwargs={'id': item['id']}))
+
+
+@ler_da_replica
+@require_GET
+@login_api
+def certificados(request):
+    # a lista muda quando o participante ganha um certificado ou quando um evento é editado
+    escopos = versoes(f'certificados:{request.user.id}', 'edicao_eventos')
+    consulta = Certificado.objects.filter(participante=request.user)
+    return resposta_condicional(request, escopos, lambda: listar(
+        request, consulta, CAMPOS_CERTIFICADO, CAMPOS_CERTIFICADO_PADRAO, ('-id',), _formatar_certificado,
+    ))
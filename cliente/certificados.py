@@ -0,0 +1,83 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+
+from eventos.cache import TEMPO, versoes
+from eventos.models import Certificado
+from type_event.paginacao import CursorPaginator
+from type_event.replicas import ler_do_principal
+
+
+# certificados por página em meus_certificados
+POR_PAGINA = getattr(settings, 'MEUS_CERTIFICADOS_POR_PAGINA', 12)
+# dos eventos mais recentes aos mais antigos; o id desempata (um certificado por evento)
+ORDENACAO = ('-evento__data_inicio', '-id')
+# o certificado e os dados do evento que a página mostra, lidos no mesmo JOIN
+CAMPOS = ('id', 'certificado', 'evento_id', 'evento__nome', 'evento__data_inicio',
+          'evento__data_termino', 'evento__carga_horaria')
+# os endereços dos arquivos saem do storage do campo, não do default_storage
+ARMAZENAMENTO = Certificado._meta.get_field('certificado').storage
+
+
+def _paginator(usuario_id, tamanho):
+    consulta = Certificado.objects.filter(participante_id=usuario_id).values(*CAMPOS)
+    return CursorPaginator(consulta, ORDENACAO, tamanho)
+
+
+def _chave(usuario_id, cursor, tamanho):
+    # a versão muda quando o participante ganha (ou perde) um certificado e quando um evento é
+    # editado (eventos/cache.py), então as páginas antigas simplesmente deixam de ser lidas; com
+    # o LocMemCache ela vem do banco, e assim também muda com os certificados gerados pelo worker
+    versao = '|'.join(map(repr, versoes(f'certificados:{usuario_id}', 'edicao_eventos')))
+    versao = hashlib.sha1(versao.encode('ascii')).hexdigest()[:12]
+    return f'meus_certificados:{usuario_id}:{versao}:{tamanho}:{cursor or ""}'
+
+
+def _montar(pagina):
+    certificados = []
+    for item in pagina:
+        certificados.append({
+            'id': item['id'],
+            'arquivo': item['certificado'],
+            # no modo sob demanda não há arquivo, o endereço é o da view que renderiza
+            'url': (ARMAZENAMENTO.url(item['certificado']) if item['certificado']
+                    else reverse('eventos:ver_certificado', kwargs={'id': item['id']})),
+            'evento': {
+                'id': item['evento_id'],
+                'nome': item['evento__nome'],
+                'data_inicio': item['evento__data_inicio'],
+                'data_termino': item['evento__data_termino'],
+                'carga_horaria': item['evento__carga_horaria'],
+            },
+        })
+    return {'certificados': certificados, 'proximo': pagina.proximo, 'anterior': pagina.anterior,
+            'total': pagina.total}
+
+
+def pagina_certificados(usuario_id, cursor=None, tamanho=POR_PAGINA):
+    """Uma página dos certificados do participante, já com os dados de cada evento.
+
+    A página fica no cache até a próxima mudança na lista; o total só é contado na primeira.
+    """
+    chave = _chave(usuario_id, cursor, tamanho)
+    dados = cache.get(chave)
+    if dados is None:
+        # a página vai para o cache com a versão nova, então é lida do principal (type_event/replicas.py)
+        with ler_do_principal():
+            dados = _montar(_paginator(usuario_id, tamanho).pagina(cursor, contar=not cursor))
+        cache.set(chave, dados, TEMPO)
+    return dados
+
+
+async def apagina_certificados(usuario_id, cursor=None, tamanho=POR_PAGINA):
+    """Versão assíncrona de pagina_certificados(), para a view ASGI."""
+    chave = await sync_to_async(_chave)(usuario_id, cursor, tamanho)
+    dados = await cache.aget(chave)
+    if dados is None:
+        with ler_do_principal():
+            dados = _montar(await _paginator(usuario_id, tamanho).apagina(cursor, contar=not cursor))
+        await cache.aset(chave, dados, TEMPO)
+    return dados
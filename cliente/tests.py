@@ -1,3 +1,73 @@
-from django.test import TestCase
+import datetime
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from eventos.models import Certificado, Evento, GeracaoCertificados
+from eventos.tarefas import processar_lote
+
+
+def criar_evento(nome, data_inicio):
+    return Evento.objects.create(
+        nome=nome, descricao='Descrição', data_inicio=data_inicio, data_termino=data_inicio,
+        carga_horaria=8, logo='logos/logo.png', cor_principal='#000000', cor_secundaria='#000000',
+        cor_fundo='#000000',
+    )
+
+
+class MeusCertificadosTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.participante = User.objects.create_user('participante', 'participante@email.com', 'senha')
+        inicio = datetime.date(2023, 1, 1)
+        for i in range(5):
+            evento = criar_evento(f'Evento {i}', inicio + datetime.timedelta(days=100 * i))
+            Certificado.objects.create(evento=evento, participante=self.participante)
+        self.url = reverse('cliente:meus_certificados')
+
+    def test_exige_login(self):
+        response = self.client.get(self.url)
+        self.assertRedirects(response, f"{reverse('usuarios:login')}?next={self.url}", fetch_redirect_response=False)
+
+    def test_paginas_do_mais_recente_ao_mais_antigo(self):
+        self.client.force_login(self.participante)
+        response = self.client.get(self.url, {'por_pagina': 3})
+        self.assertEqual([c['evento']['nome'] for c in response.context['certificados']],
+                         ['Evento 4', 'Evento 3', 'Evento 2'])
+        self.assertEqual(response.context['total'], 5)
+
+        response = self.client.get(self.url, {'por_pagina': 3, 'cursor': response.context['proximo']})
+        self.assertEqual([c['evento']['nome'] for c in response.context['certificados']], ['Evento 1', 'Evento 0'])
+        self.assertIsNone(response.context['proximo'])
+
+    def test_lista_no_cache_ate_um_certificado_novo(self):
+        self.client.force_login(self.participante)
+        self.client.get(self.url)
+        with self.assertNumQueries(3):
+            # a sessão, o usuário e as versões (no banco, com o LocMemCache); a página vem do cache
+            self.client.get(self.url)
+
+        novo = criar_evento('Evento novo', datetime.date(2030, 1, 1))
+        Certificado.objects.create(evento=novo, participante=self.participante)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['certificados'][0]['evento']['nome'], 'Evento novo')
+        self.assertEqual(response.context['total'], 6)
+
+    @override_settings(CERTIFICADO_SOB_DEMANDA=True)
+    def test_certificado_gerado_pelo_worker_aparece_na_lista(self):
+        novo = criar_evento('Evento novo', datetime.date(2030, 1, 1))
+        novo.participantes.add(self.participante)
+        self.client.force_login(self.participante)
+        self.assertEqual(self.client.get(self.url).context['total'], 5)
+
+        # o worker é outro processo: com o LocMemCache, o cache dele não é o do servidor web
+        with mock.patch('eventos.cache.cache', LocMemCache('worker', {})):
+            processar_lote(GeracaoCertificados.objects.create(evento=novo))
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['certificados'][0]['evento']['nome'], 'Evento novo')
+        self.assertEqual(response.context['total'], 6)
@@ -1,9 +1,14 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views, views_async
+
+
+leitura = views_async if settings.VIEWS_ASYNC else views
 
 
 app_name = 'cliente'
 
 urlpatterns = [
-    path('meus_certificados/', views.meus_certificados, name='meus_certificados'),
+    path('meus_certificados/', leitura.meus_certificados, name='meus_certificados'),
+    path('api/certificados/', api.certificados, name='api_certificados'),
 ]
\ No newline at end of file
@@ -1,6 +1,19 @@
+from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
-from eventos.models import Certificado
 
+from type_event.paginacao import CursorInvalido, por_pagina
+from type_event.replicas import ler_da_replica
+
+from .certificados import POR_PAGINA, pagina_certificados
+
+
+@ler_da_replica
+@login_required
 def meus_certificados(request):
-    certificados = Certificado.objects.filter(participante=request.user)
-    return render(request, 'meus_certificados.html', {'certificados':certificados,})
+    # uma página por vez (cursor), vinda do cache enquanto o participante não ganhar outro certificado
+    tamanho = por_pagina(request, POR_PAGINA)
+    try:
+        pagina = pagina_certificados(request.user.id, request.GET.get('cursor'), tamanho)
+    except CursorInvalido:
+        pagina = pagina_certificados(request.user.id, tamanho=tamanho)
+    return render(request, 'meus_certificados.html', pagina)
@@ -0,0 +1,19 @@
+from type_event.assincrono import arender, exigir_login, usuario_logado
+from type_event.paginacao import CursorInvalido, por_pagina
+from type_event.replicas import ler_da_replica
+
+from .certificados import POR_PAGINA, apagina_certificados
+
+
+# versão assíncrona (ASGI) de views.meus_certificados, usada quando settings.VIEWS_ASYNC está ligado
+@ler_da_replica
+async def meus_certificados(request):
+    usuario = await usuario_logado(request)
+    if usuario is None:
+        return exigir_login(request)
+    tamanho = por_pagina(request, POR_PAGINA)
+    try:
+        pagina = await apagina_certificados(usuario.id, request.GET.get('cursor'), tamanho)
+    except CursorInvalido:
+        pagina = await apagina_certificados(usuario.id, tamanho=tamanho)
+    return await arender(request, 'meus_certificados.html', pagina)
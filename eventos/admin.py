@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Evento
+from .models import Evento, GeracaoCertificados
 
 
 admin.site.register(Evento)
+admin.site.register(GeracaoCertificados)
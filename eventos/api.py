@@ -0,0 +1,154 @@
+from django.contrib.auth.models import User
+from django.db.models import Exists, OuterRef, Subquery
+from django.db.models.functions import Lower
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
+
+from type_event.api import erro, ler_json, listar, login_api, resposta_condicional
+from type_event.replicas import ler_da_replica
+
+from .cache import obter_evento, versoes
+from .importacao import importar_participantes
+from .inscricoes import Inscricao
+from .models import Certificado, Evento
+from .views import ARMAZENAMENTO_CERTIFICADOS, MAXIMO_EMAILS_BUSCA
+
+
+# campos que podem ser pedidos em ?campos= e os que vêm sem o parâmetro
+CAMPOS_EVENTO = {
+    'id': 'id', 'nome': 'nome', 'descricao': 'descricao', 'data_inicio': 'data_inicio',
+    'data_termino': 'data_termino', 'carga_horaria': 'carga_horaria', 'logo': 'logo',
+    'capacidade': 'capacidade', 'total_participantes': 'total_participantes',
+    'total_certificados': 'total_certificados',
+}
+CAMPOS_EVENTO_PADRAO = ('id', 'nome', 'data_inicio', 'data_termino', 'total_participantes')
+CAMPOS_PARTICIPANTE_PADRAO = ('id', 'username', 'email')
+# participantes enviados de uma vez na inscrição em lote
+MAXIMO_PARTICIPANTES_LOTE = 1000
+# como os certificados (eventos/views.py), o logo sai do storage do próprio campo
+ARMAZENAMENTO_LOGOS = Evento._meta.get_field('logo').storage
+
+
+def _evento_do_criador(request, id):
+    # o evento vem do cache, então um 304 não consulta o banco
+    evento = obter_evento(id)
+    if evento.criador_id != request.user.id:
+        raise Http404('Esse evento não é seu')
+    return evento
+
+
+def _formatar_evento(item):
+    if item.get('logo'):
+        item['logo'] = ARMAZENAMENTO_LOGOS.url(item['logo'])
+
+
+@ler_da_replica
+@require_GET
+@login_api
+def eventos(request):
+    # mesma ordenação (e índice) da página gerenciar_evento
+    consulta = Evento.objects.filter(criador=request.user)
+    return resposta_condicional(request, versoes('eventos', 'edicao_eventos'), lambda: listar(
+        request, consulta, CAMPOS_EVENTO, CAMPOS_EVENTO_PADRAO, ('-data_inicio', 'id'), _formatar_evento,
+    ))
+
+
+@ler_da_replica
+@require_GET
+@login_api
+def participantes(request, id):
+    evento = _evento_do_criador(request, id)
+
+    def gerar():
+        certificados = Certificado.objects.filter(evento_id=evento.id, participante=OuterRef('pk'))
+        # o certificado só entra na consulta (como subconsulta) se for pedido
+        disponiveis = {
+            'id': 'id', 'username': 'username', 'email': 'email',
+            'certificado': Subquery(certificados.values('id')[:1]),
+            'certificado_enviado_em': Subquery(certificados.values('enviado_em')[:1]),
+        }
+        return listar(request, evento.participantes.all(), disponiveis, CAMPOS_PARTICIPANTE_PADRAO, ('id',))
+
+    return resposta_condicional(request, versoes(f'evento:{evento.id}', 'usuarios'), gerar)
+
+
+@require_POST
+@login_api
+def inscrever_lote(request, id):
+    """Inscreve vários participantes: {"participantes": [{"username": ..., "email": ..., "senha": ...}]}.
+
+    Os usuários que não existem são criados, como na importação do csv.
+    """
+    evento = get_object_or_404(Evento, id=id)
+    if evento.criador_id != request.user.id:
+        raise Http404('Esse evento não é seu')
+
+    dados = ler_json(request)
+    if dados is None or not isinstance(dados.get('participantes'), list):
+        return erro('Envie {"participantes": [...]}')
+    if len(dados['participantes']) > MAXIMO_PARTICIPANTES_LOTE:
+        return erro(f'No máximo {MAXIMO_PARTICIPANTES_LOTE} participantes por requisição')
+
+    linhas = []
+    for participante in dados['participantes']:
+        if not isinstance(participante, dict) or not str(participante.get('username') or '').strip():
+            return erro('Todo participante precisa de um username')
+        linhas.append((
+            str(participante['username']).strip(),
+            str(participante.get('email') or '').strip(),
+            str(participante.get('senha') or ''),
+        ))
+    return JsonResponse(importar_participantes(linhas, evento=evento))
+
+
+@ler_da_replica
+@require_POST
+@login_api
+def status_participantes(request, id):
+    """Situação de vários participantes de uma vez: {"emails": [...]}.
+
+    Para cada e-mail: se está inscrito, o certificado e quando ele foi enviado por e-mail
+    (null para e-mails sem usuário), tudo numa consulta só.
+    """
+    evento = get_object_or_404(Evento.objects.only('criador'), id=id)
+    if evento.criador_id != request.user.id:
+        raise Http404('Esse evento não é seu')
+
+    dados = ler_json(request)
+    if dados is None or not isinstance(dados.get('emails'), list):
+        return erro('Envie {"emails": [...]}')
+    emails = {email.strip().lower() for email in dados['emails'] if isinstance(email, str) and email.strip()}
+    if len(emails) > MAXIMO_EMAILS_BUSCA:
+        return erro(f'No máximo {MAXIMO_EMAILS_BUSCA} e-mails por consulta')
+
+    certificados = Certificado.objects.filter(evento=evento, participante=OuterRef('pk'))
+    # mesma expressão LOWER(email) do índice usado pela busca de certificados por e-mail
+    usuarios = (
+        User.objects.annotate(email_normalizado=Lower('email')).filter(email_normalizado__in=emails)
+        .annotate(
+            inscrito=Exists(Inscricao.objects.filter(evento_id=evento.id, user_id=OuterRef('pk'))),
+            certificado_id=Subquery(certificados.values('id')[:1]),
+            arquivo=Subquery(certificados.values('certificado')[:1]),
+            enviado_em=Subquery(certificados.values('enviado_em')[:1]),
+        )
+        .order_by('id')
+        .values('email_normalizado', 'username', 'inscrito', 'certificado_id', 'arquivo', 'enviado_em')
+    )
+    situacao = dict.fromkeys(sorted(emails))
+    for usuario in usuarios:
+        # e-mails repetidos entre usuários ficam com o primeiro cadastrado
+        if situacao[usuario['email_normalizado']] is not None:
+            continue
+        url = None
+        if usuario['certificado_id']:
+            url = (ARMAZENAMENTO_CERTIFICADOS.url(usuario['arquivo']) if usuario['arquivo']
+                   else reverse('eventos:ver_certificado', kwargs={'id': usuario['certificado_id']}))
+        situacao[usuario['email_normalizado']] = {
+            'username': usuario['username'],
+            'inscrito': usuario['inscrito'],
+            'certificado': url,
+            'certificado_enviado_em': usuario['enviado_em'],
+        }
+    return JsonResponse({'participantes': situacao})
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class EventosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'eventos'
+
+    def ready(self):
+        # registra os sinais que mantêm os contadores do Evento
+        from . import signals  # noqa: F401
+        # e o que configura cada conexão nova do SQLite (WAL e outros PRAGMAs)
+        from type_event import banco  # noqa: F401
@@ -0,0 +1,73 @@
+import re
+
+from django.db import connection
+
+
+# índices de busca criados pela migração 0010_busca_eventos:
+# - SQLite: tabela virtual FTS5 (eventos_evento_fts) mantida por triggers a cada insert/update/delete
+# - PostgreSQL: índices GIN de texto completo (nome + descrição) e de trigramas (nome)
+TABELA_FTS = 'eventos_evento_fts'
+
+SQL_SQLITE = f'''
+    SELECT e.id
+    FROM {TABELA_FTS} f
+    JOIN eventos_evento e ON e.id = f.rowid
+    WHERE {TABELA_FTS} MATCH %s AND e.criador_id = %s
+    ORDER BY bm25({TABELA_FTS}, 10.0, 1.0), e.id
+    LIMIT %s OFFSET %s
+'''
+
+# a expressão do to_tsvector precisa ser idêntica à do índice para que ele seja usado
+VETOR_POSTGRES = "to_tsvector('portuguese', nome || ' ' || descricao)"
+SQL_POSTGRES = f'''
+    SELECT id
+    FROM eventos_evento
+    WHERE criador_id = %s
+      AND ({VETOR_POSTGRES} @@ to_tsquery('portuguese', %s) OR nome %% %s)
+    ORDER BY ts_rank({VETOR_POSTGRES}, to_tsquery('portuguese', %s)) + similarity(nome, %s) DESC, id
+    LIMIT %s OFFSET %s
+'''
+
+_fts_disponivel = None
+
+
+def _palavras(termo):
+    # só letras e números, para não deixar a sintaxe de busca do banco chegar ao usuário
+    return re.findall(r'\w+', termo.lower())
+
+
+def fts_disponivel():
+    """True se a tabela FTS5 existe (o SQLite pode ter sido compilado sem FTS5)."""
+    global _fts_disponivel
+    if _fts_disponivel is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABELA_FTS])
+            _fts_disponivel = cursor.fetchone() is not None
+    return _fts_disponivel
+
+
+def buscar_ids(termo, criador_id, limite, deslocamento=0):
+    """Ids dos eventos do criador que combinam com o termo, do mais relevante ao menos.
+
+    Cada palavra é buscada como prefixo ("jav" encontra "java"). Devolve None quando o
+    banco não tem busca indexada; nesse caso quem chamou usa o filtro simples.
+    """
+    palavras = _palavras(termo)
+    if not palavras:
+        return []
+
+    if connection.vendor == 'sqlite' and fts_disponivel():
+        consulta = ' '.join(f'"{palavra}"*' for palavra in palavras)
+        parametros = [consulta, criador_id, limite, deslocamento]
+        sql = SQL_SQLITE
+    elif connection.vendor == 'postgresql':
+        consulta = ' & '.join(f'{palavra}:*' for palavra in palavras)
+        texto = ' '.join(palavras)
+        parametros = [criador_id, consulta, texto, consulta, texto, limite, deslocamento]
+        sql = SQL_POSTGRES
+    else:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        return [linha[0] for linha in cursor.fetchall()]
@@ -0,0 +1,155 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+
+from type_event.replicas import ler_do_principal
+
+from .models import Evento, VersaoEscopo
+
+
+# tempo (em segundos) que eventos, páginas e fragmentos ficam no cache;
+# a invalidação é feita pelos sinais em eventos/signals.py, o tempo é só uma garantia
+TEMPO = getattr(settings, 'CACHE_EVENTOS_TEMPO', 600)
+
+# tempo das versões (ETags da API) no cache; uma versão que sai do cache recomeça, e o cliente
+# recebe a resposta inteira uma vez
+TEMPO_VERSAO = getattr(settings, 'CACHE_VERSOES_TEMPO', 24 * 60 * 60)
+# caches que são de cada processo (as versões marcadas pelo worker não chegariam ao servidor web)
+CACHES_LOCAIS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# fragmentos de template ({% cache cache_eventos_tempo ... evento.id %}) que dependem só do evento;
+# o tempo chega aos templates pelo context processor eventos.context_processors.cache_eventos
+FRAGMENTOS_EVENTO = ('evento_cabecalho', 'evento_inscricao')
+
+
+def _chave_evento(evento_id):
+    return f'evento:{evento_id}'
+
+
+def _chave_inscrito(evento_id, usuario_id):
+    return f'evento:{evento_id}:inscrito:{usuario_id}'
+
+
+def _chave_versao(escopo):
+    return f'versao:{escopo}'
+
+
+def versoes(*escopos):
+    """Momento (time.time()) da última alteração de cada escopo, usado nos ETags da API.
+
+    Escopos: 'eventos' (qualquer evento, inscrição ou certificado), 'edicao_eventos' (dados
+    dos eventos), 'usuarios', 'evento:<id>' e 'certificados:<id do participante>'. Um escopo
+    que ainda não tem versão (ou que saiu do cache) recomeça agora: o cliente recebe a
+    resposta completa uma vez.
+    """
+    if not versoes_compartilhadas():
+        return _versoes_no_banco(escopos)
+    chaves = [_chave_versao(escopo) for escopo in escopos]
+    encontradas = cache.get_many(chaves)
+    faltando = {chave: time.time() for chave in chaves if chave not in encontradas}
+    if faltando:
+        cache.set_many(faltando, TEMPO_VERSAO)
+    return [encontradas.get(chave) or faltando[chave] for chave in chaves]
+
+
+def _versoes_no_banco(escopos):
+    # uma consulta pela chave primária; lida do principal, como o corpo das respostas com ETag
+    with ler_do_principal():
+        gravadas = dict(VersaoEscopo.objects.filter(escopo__in=escopos).values_list('escopo', 'alterado_em'))
+    faltando = {escopo: time.time() for escopo in escopos if escopo not in gravadas}
+    if faltando:
+        # se outro processo gravou o mesmo escopo nesse meio tempo, a versão dele fica valendo
+        VersaoEscopo.objects.bulk_create(
+            [VersaoEscopo(escopo=escopo, alterado_em=agora) for escopo, agora in faltando.items()],
+            ignore_conflicts=True,
+        )
+    return [gravadas.get(escopo) or faltando[escopo] for escopo in escopos]
+
+
+def versoes_compartilhadas():
+    """True se as versões ficam no cache, False se ficam no banco (tabela VersaoEscopo).
+
+    O servidor web e o worker precisam ver as mesmas versões: com o LocMemCache (padrão)
+    cada processo teria as suas, o worker geraria certificados e enviaria e-mails sem que a
+    versão do servidor web mudasse, e um ETag tirado dela daria 304 para sempre. Por isso,
+    com um cache de cada processo as versões vão para o banco. CACHE_VERSOES_COMPARTILHADAS
+    força a escolha (por exemplo, True num único processo sem worker).
+    """
+    compartilhadas = getattr(settings, 'CACHE_VERSOES_COMPARTILHADAS', None)
+    if compartilhadas is None:
+        return settings.CACHES['default']['BACKEND'] not in CACHES_LOCAIS
+    return compartilhadas
+
+
+def marcar_alteracao(*escopos):
+    agora = time.time()
+    if versoes_compartilhadas():
+        cache.set_many({_chave_versao(escopo): agora for escopo in escopos}, TEMPO_VERSAO)
+        return
+    # insere ou atualiza todos os escopos num comando só
+    VersaoEscopo.objects.bulk_create(
+        [VersaoEscopo(escopo=escopo, alterado_em=agora) for escopo in escopos],
+        update_conflicts=True, unique_fields=['escopo'], update_fields=['alterado_em'],
+    )
+
+
+def obter_evento(evento_id):
+    """Evento vindo do cache; só vai ao banco quando não estiver lá (ou 404)."""
+    evento = cache.get(_chave_evento(evento_id))
+    if evento is None:
+        # o que vai para o cache sempre vem do principal (type_event/replicas.py)
+        with ler_do_principal():
+            evento = get_object_or_404(Evento, id=evento_id)
+        cache.set(_chave_evento(evento_id), evento, TEMPO)
+    return evento
+
+
+def obter_inscrito(evento_id, usuario_id, consultar):
+    """Situação de inscrição de um usuário (variante por usuário da página de inscrição)."""
+    chave = _chave_inscrito(evento_id, usuario_id)
+    inscrito = cache.get(chave)
+    if inscrito is None:
+        with ler_do_principal():
+            inscrito = consultar(evento_id, usuario_id)
+        cache.set(chave, inscrito, TEMPO)
+    return inscrito
+
+
+def _invalidar(chaves, escopos, depois_do_commit):
+    no_banco = not versoes_compartilhadas()
+
+    def limpar():
+        cache.delete_many(chaves)
+        if not no_banco:
+            marcar_alteracao(*escopos)
+
+    if no_banco:
+        # versões no banco entram na transação da alteração: ficam visíveis junto com ela, e
+        # não há um segundo comando depois do commit que pudesse falhar com a alteração já gravada
+        marcar_alteracao(*escopos)
+    if depois_do_commit:
+        # o cache só é limpo (e as versões do cache só avançam) depois do commit, senão
+        # outra requisição leria os dados antigos e os guardaria de novo
+        transaction.on_commit(limpar)
+    else:
+        limpar()
+
+
+def invalidar_evento(evento_id, usuarios_ids=(), depois_do_commit=False):
+    chaves = [_chave_evento(evento_id)]
+    chaves += [make_template_fragment_key(fragmento, [evento_id]) for fragmento in FRAGMENTOS_EVENTO]
+    chaves += [_chave_inscrito(evento_id, usuario_id) for usuario_id in usuarios_ids]
+    _invalidar(chaves, ['eventos', f'evento:{evento_id}'], depois_do_commit)
+
+
+def invalidar_certificados(evento_id, usuarios_ids=(), depois_do_commit=False):
+    # certificados criados ou apagados: mudam o contador do evento e a lista de cada participante
+    escopos = ['eventos', f'evento:{evento_id}', *[f'certificados:{usuario_id}' for usuario_id in usuarios_ids]]
+    _invalidar([], escopos, depois_do_commit)
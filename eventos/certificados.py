@@ -0,0 +1,88 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image, ImageDraw, ImageFont
+
+from type_event.desempenho import cronometrar
+
+from .imagens import LARGURAS, redimensionar
+
+
+PATH_TEMPLATE = os.path.join(settings.BASE_DIR, 'templates/static/evento/img/template_certificado.png')
+PATH_FONTE = os.path.join(settings.BASE_DIR, 'templates/static/fontes/arimo.ttf')
+
+# abaixo desse número de certificados não compensa subir um pool de processos
+MINIMO_PARALELO = 8
+
+# cada processo (worker) guarda aqui o template já decodificado e as fontes já carregadas,
+# assim o arquivo png e o arquivo ttf são lidos uma única vez por processo
+_assets = {}
+
+
+def _carregar_assets(path_template=PATH_TEMPLATE, path_fonte=PATH_FONTE):
+    # o load() força a decodificação do png agora, e não no primeiro acesso aos pixels
+    base = Image.open(path_template)
+    base.load()
+    _assets['base'] = base
+    _assets['fonte_nome'] = ImageFont.truetype(path_fonte, 80)
+    _assets['fonte_info'] = ImageFont.truetype(path_fonte, 30)
+
+
+def desenhar_certificado(nome_participante, nome_evento, carga_horaria):
+    """Desenha um certificado e devolve a imagem (ainda não codificada)."""
+    if not _assets:
+        _carregar_assets()
+
+    # cada participante recebe uma cópia da imagem base já decodificada
+    img = _assets['base'].copy()
+    draw = ImageDraw.Draw(img)
+    draw.text((222, 632), f"{nome_participante}", font=_assets['fonte_nome'], fill=(0, 0, 0))
+    draw.text((761, 775), f"{nome_evento}", font=_assets['fonte_info'], fill=(0, 0, 0))
+    draw.text((816, 842), f"{carga_horaria} horas.", font=_assets['fonte_info'], fill=(0, 0, 0))
+    return img
+
+
+@cronometrar('imagem')
+def renderizar_certificado(nome_participante, nome_evento, carga_horaria):
+    """Desenha um certificado e devolve os bytes do PNG."""
+    img = desenhar_certificado(nome_participante, nome_evento, carga_horaria)
+    output = BytesIO()
+    img.save(output, format="PNG")
+    return output.getvalue()
+
+
+@cronometrar('imagem')
+def _renderizar(dados):
+    # o executor só consegue chamar funções com um único argumento no map;
+    # as miniaturas são feitas aqui, aproveitando a imagem que já está na memória
+    img = desenhar_certificado(*dados)
+    output = BytesIO()
+    img.save(output, format="PNG")
+    return output.getvalue(), redimensionar(img, LARGURAS['certificado'])
+
+
+def quantidade_workers():
+    # por padrão usa um processo por núcleo, mas pode ser ajustado no settings
+    return getattr(settings, 'CERTIFICADO_WORKERS', None) or os.cpu_count() or 1
+
+
+def renderizar_lote(dados, workers=None):
+    """Renderiza uma lista de tuplas (participante, evento, carga_horaria).
+
+    É um gerador: devolve tuplas (png, miniaturas) na mesma ordem da lista recebida,
+    conforme ficam prontas, para não manter o lote inteiro na memória.
+    """
+    dados = list(dados)
+    workers = workers or quantidade_workers()
+
+    if workers <= 1 or len(dados) < MINIMO_PARALELO:
+        for item in dados:
+            yield _renderizar(item)
+        return
+
+    # o initializer roda uma vez em cada processo, carregando template e fontes
+    chunksize = max(1, len(dados) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_carregar_assets) as executor:
+        yield from executor.map(_renderizar, dados, chunksize=chunksize)
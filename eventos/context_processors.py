@@ -0,0 +1,6 @@
+from .cache import TEMPO
+
+
+def cache_eventos(request):
+    # tempo dos fragmentos {% cache cache_eventos_tempo ... %}, o mesmo CACHE_EVENTOS_TEMPO do eventos/cache.py
+    return {'cache_eventos_tempo': TEMPO}
@@ -0,0 +1,195 @@
+import smtplib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .cache import invalidar_certificados
+from .models import Certificado, Evento
+from .sob_demanda import obter_certificado
+
+
+# quantos e-mails vão pela mesma conexão SMTP
+TAMANHO_LOTE = getattr(settings, 'CERTIFICADO_EMAIL_LOTE', 50)
+# limite de envio do provedor de e-mail (0: sem limite)
+POR_SEGUNDO = getattr(settings, 'CERTIFICADO_EMAIL_POR_SEGUNDO', 5)
+# depois dessa quantidade de erros o participante não entra mais nos envios automáticos
+MAXIMO_TENTATIVAS = getattr(settings, 'CERTIFICADO_EMAIL_TENTATIVAS', 5)
+# False: o e-mail leva só o link para o certificado, sem o png anexado
+ANEXAR = getattr(settings, 'CERTIFICADO_EMAIL_ANEXO', True)
+# uma reserva mais velha que isso é de um envio que caiu no meio, e pode ser assumida por outro
+EXPIRACAO_RESERVA = timedelta(seconds=getattr(settings, 'CERTIFICADO_EMAIL_EXPIRACAO_RESERVA', 600))
+
+
+class Limitador:
+    """Espaça as chamadas de esperar() para no máximo `por_segundo` por segundo."""
+
+    def __init__(self, por_segundo):
+        self.intervalo = 1 / por_segundo if por_segundo else 0
+        self.proximo = time.monotonic()
+
+    def esperar(self):
+        if not self.intervalo:
+            return
+        agora = time.monotonic()
+        if agora < self.proximo:
+            time.sleep(self.proximo - agora)
+            agora = self.proximo
+        self.proximo = agora + self.intervalo
+
+
+def pendentes_envio(evento):
+    """Certificados do evento que ainda precisam ser enviados (e que podem ser)."""
+    return (
+        Certificado.objects.filter(evento=evento, enviado_em__isnull=True, tentativas_envio__lt=MAXIMO_TENTATIVAS)
+        .exclude(participante__email='')
+    )
+
+
+def _png(certificado):
+    if certificado.certificado:
+        # pelo FieldFile, que abre com o storage do campo
+        with certificado.certificado.open('rb') as arquivo:
+            return arquivo.read()
+    # modo sob demanda: renderiza (ou pega do cache) como a view ver_certificado
+    participante = certificado.participante
+    return obter_certificado(certificado.evento, participante.id, participante.username, cachear=False)[0]
+
+
+def _livres(consulta):
+    # sem reserva, ou com a reserva de um envio que caiu no meio
+    limite = timezone.now() - EXPIRACAO_RESERVA
+    return consulta.filter(Q(envio_reservado_em__isnull=True) | Q(envio_reservado_em__lt=limite))
+
+
+def reservar_envio(certificado):
+    """Marca o certificado como "sendo enviado"; False se outro envio já ficou com ele.
+
+    O update só altera a linha se ela continua pendente e livre (como no reservar_tarefa
+    do eventos/tarefas.py), então só um dos envios simultâneos recebe 1.
+    """
+    return bool(
+        _livres(Certificado.objects.filter(id=certificado.id, enviado_em__isnull=True))
+        .update(envio_reservado_em=timezone.now())
+    )
+
+
+def montar_email(certificado, conexao=None, anexar=ANEXAR):
+    evento = certificado.evento
+    participante = certificado.participante
+    link = settings.SITE_URL.rstrip('/') + reverse('eventos:ver_certificado', kwargs={'id': certificado.id})
+    corpo = render_to_string('email_certificado.txt', {
+        'evento': evento,
+        'participante': participante,
+        'link': link,
+        'anexado': anexar,
+    })
+    mensagem = EmailMessage(
+        subject=f'Seu certificado: {evento.nome}',
+        body=corpo,
+        to=[participante.email],
+        connection=conexao,
+    )
+    if anexar:
+        mensagem.attach(f'certificado-{slugify(evento.nome) or evento.id}.png', _png(certificado), 'image/png')
+    return mensagem
+
+
+def enviar_lote(evento, depois_de=0, tamanho=TAMANHO_LOTE, limitador=None, anexar=ANEXAR):
+    """Envia o próximo lote de certificados (id maior que depois_de) por uma conexão só.
+
+    Devolve (último id processado, enviados, erros); o id é None quando não há mais nada.
+    """
+    certificados = list(
+        _livres(pendentes_envio(evento)).filter(id__gt=depois_de)
+        .select_related('evento', 'participante').order_by('id')[:tamanho]
+    )
+    if not certificados:
+        return None, 0, 0
+
+    limitador = limitador or Limitador(0)
+    enviados = erros = 0
+    # mudanças nos contadores do evento: erros novos e erros que agora foram enviados
+    novos_erros = recuperados = 0
+    ultimo = depois_de
+    # participantes cujo envio foi gravado (enviado ou erro)
+    alterados = []
+    try:
+        # o with abre a conexão uma vez e a fecha (QUIT) no fim do lote, então o
+        # send_messages de cada certificado reaproveita a mesma sessão SMTP
+        with get_connection() as conexao:
+            for certificado in certificados:
+                # a reserva é feita um por um, logo antes do envio, então não envelhece com o limitador
+                if not reservar_envio(certificado):
+                    ultimo = certificado.id
+                    continue
+                limitador.esperar()
+                try:
+                    conexao.send_messages([montar_email(certificado, conexao, anexar)])
+                except Exception as erro:
+                    erros += 1
+                    # a reserva é desfeita para o próximo envio tentar de novo
+                    Certificado.objects.filter(id=certificado.id).update(
+                        tentativas_envio=certificado.tentativas_envio + 1, erro_envio=repr(erro),
+                        envio_reservado_em=None,
+                    )
+                    alterados.append(certificado.participante_id)
+                    ultimo = certificado.id
+                    if not certificado.tentativas_envio:
+                        novos_erros += 1
+                    if isinstance(erro, smtplib.SMTPServerDisconnected):
+                        # o servidor derrubou a conexão: abre outra para o resto do lote; se nem
+                        # isso der certo, o lote termina aqui e o próximo tenta com uma conexão nova
+                        conexao.close()
+                        try:
+                            conexao.open()
+                        except (smtplib.SMTPException, OSError):
+                            break
+                else:
+                    enviados += 1
+                    # gravado logo depois de cada envio, assim um worker que cair no meio
+                    # do lote não manda o mesmo e-mail de novo na próxima vez
+                    Certificado.objects.filter(id=certificado.id).update(
+                        enviado_em=timezone.now(), tentativas_envio=certificado.tentativas_envio + 1, erro_envio='',
+                    )
+                    alterados.append(certificado.participante_id)
+                    ultimo = certificado.id
+                    if certificado.tentativas_envio:
+                        recuperados += 1
+    finally:
+        # os update() não disparam sinais e a API mostra o enviado_em, então as versões
+        # do evento e dos participantes (ETag) avançam no fim de cada lote
+        if alterados:
+            # cada certificado foi reservado antes do envio, então só este lote mexeu nele
+            # e os contadores podem ser somados sem recontar o evento
+            Evento.objects.filter(id=evento.id).update(
+                certificados_enviados=F('certificados_enviados') + enviados,
+                envios_com_erro=Greatest(F('envios_com_erro') + novos_erros - recuperados, 0),
+            )
+            invalidar_certificados(evento.id, alterados)
+    return ultimo, enviados, erros
+
+
+def enviar_certificados(evento, tamanho=TAMANHO_LOTE, por_segundo=POR_SEGUNDO, anexar=ANEXAR):
+    """Envia por e-mail todos os certificados ainda não enviados do evento.
+
+    Quem já recebeu fica de fora, então rodar de novo só tenta os que faltaram
+    (ou deram erro). Devolve (enviados, erros).
+    """
+    limitador = Limitador(por_segundo)
+    ultimo = 0
+    total_enviados = total_erros = 0
+    while True:
+        # o id do último processado avança sempre, assim um erro não é tentado de novo na mesma execução
+        ultimo, enviados, erros = enviar_lote(evento, ultimo, tamanho, limitador, anexar)
+        if ultimo is None:
+            return total_enviados, total_erros
+        total_enviados += enviados
+        total_erros += erros
@@ -0,0 +1,109 @@
+import csv
+import os
+import time
+import zipfile
+import zlib
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+
+# colunas do usuário que podem ser exportadas, na ordem padrão
+COLUNAS_CSV = ('username', 'email', 'first_name', 'last_name', 'date_joined')
+COLUNAS_PADRAO = ('username', 'email')
+# quantas linhas são lidas do banco e enviadas de cada vez
+LINHAS_POR_BLOCO = 2000
+
+
+def escolher_colunas(pedido):
+    """Transforma o parâmetro ?colunas=a,b em uma tupla válida de colunas."""
+    if not pedido:
+        return COLUNAS_PADRAO
+    colunas = tuple(coluna for coluna in pedido.split(',') if coluna in COLUNAS_CSV)
+    return colunas or COLUNAS_PADRAO
+
+
+def gerar_linhas_csv(participantes, colunas):
+    """Gera o CSV em blocos de texto, sem carregar todos os participantes na memória."""
+    buffer = StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    # values_list + iterator: o banco devolve tuplas em blocos, sem montar objetos User
+    linhas = participantes.order_by().values_list(*colunas).iterator(chunk_size=LINHAS_POR_BLOCO)
+    for numero, linha in enumerate(linhas, start=1):
+        writer.writerow(linha)
+        if numero % LINHAS_POR_BLOCO == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def comprimir_gzip(blocos):
+    """Comprime em gzip, bloco a bloco, o texto gerado por outro gerador."""
+    # wbits=31 gera o formato gzip (com cabeçalho), e não só o deflate puro
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for bloco in blocos:
+        dados = compressor.compress(bloco.encode('utf-8'))
+        if dados:
+            yield dados
+    yield compressor.flush()
+
+
+class _SaidaZip:
+    """Arquivo "falso" onde o zipfile escreve, esvaziado a cada bloco enviado ao cliente.
+
+    Como não tem seek/tell, o zipfile grava no modo de streaming
+    (tamanhos e CRC vão no descritor depois dos dados de cada arquivo).
+    """
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        dados = b''.join(self.partes)
+        self.partes.clear()
+        return dados
+
+
+def gerar_zip(arquivos, tamanho_bloco=64 * 1024):
+    """Monta um ZIP aos poucos a partir de uma sequência de (nome no zip, nome no storage ou bytes).
+
+    Os arquivos são lidos do storage em blocos e cada bloco já sai no gerador,
+    então nem o zip nem os arquivos ficam inteiros na memória ou no disco.
+    """
+    saida = _SaidaZip()
+    data = time.localtime()[:6]
+    with zipfile.ZipFile(saida, mode='w', allowZip64=True) as arquivo_zip:
+        for nome_zip, origem in arquivos:
+            if isinstance(origem, bytes):
+                # conteúdo já na memória (certificado renderizado sob demanda)
+                origem = ContentFile(origem)
+            else:
+                try:
+                    origem = default_storage.open(origem, 'rb')
+                except OSError:
+                    # arquivo apagado do storage, o restante do zip continua
+                    continue
+
+            info = zipfile.ZipInfo(nome_zip, date_time=data)
+            # png já é comprimido, então é só armazenado (sem recomprimir)
+            if os.path.splitext(nome_zip)[1].lower() == '.png':
+                info.compress_type = zipfile.ZIP_STORED
+            else:
+                info.compress_type = zipfile.ZIP_DEFLATED
+
+            with origem, arquivo_zip.open(info, 'w') as destino:
+                for bloco in origem.chunks(tamanho_bloco):
+                    destino.write(bloco)
+                    yield saida.esvaziar()
+            yield saida.esvaziar()
+    # o diretório central do zip é escrito quando o ZipFile é fechado
+    yield saida.esvaziar()
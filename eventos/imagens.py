@@ -0,0 +1,122 @@
+import posixpath
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, UnidentifiedImageError
+
+from type_event.desempenho import cronometrar
+
+
+# larguras (em pixels) geradas para cada tipo de imagem, usadas no srcset dos templates
+LARGURAS = {
+    'logo': (160, 320, 640),
+    'certificado': (400, 800),
+}
+# trocar a versão gera novos nomes, invalidando os derivados que estiverem em cache no navegador
+VERSAO = 1
+QUALIDADE = 80
+# tempo (em segundos) que o cache lembra que um derivado existe, ou que ele falta
+# (o que falta dura pouco: outro processo pode gerá-lo nesse meio tempo)
+TEMPO_EXISTE = 24 * 60 * 60
+TEMPO_FALTA = 5 * 60
+
+
+def nome_derivado(nome_original, largura):
+    """Nome (e chave de cache) do derivado de uma imagem em uma largura.
+
+    Fica em derivados/<pasta do original>/, com o mesmo nome base do original,
+    assim dá para saber de qual arquivo (e de quem) o derivado veio.
+    """
+    pasta, arquivo = posixpath.split(nome_original)
+    base = posixpath.splitext(arquivo)[0]
+    return posixpath.join('derivados', pasta, f'{base}-{largura}w-v{VERSAO}.webp')
+
+
+def imagem_valida(arquivo):
+    """Confere com o Pillow se o arquivo enviado é mesmo uma imagem, antes de gravar qualquer coisa."""
+    try:
+        with Image.open(arquivo) as img:
+            img.verify()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return False
+    finally:
+        arquivo.seek(0)
+    return True
+
+
+def _chave_existe(nome_original, largura):
+    return f'derivado:{nome_derivado(nome_original, largura)}'
+
+
+def derivados_existentes(nome_original, larguras):
+    """As larguras de `larguras` cujo derivado já está no storage.
+
+    Imagens anteriores aos derivados, ou cujos derivados não chegaram a ser gravados
+    (worker interrompido, falha ao redimensionar), não têm todos eles; quem monta a URL
+    usa o original no lugar. As duas respostas vão para o cache, assim as páginas não
+    consultam o storage a cada render; o salvar_derivados marca o que acabou de gravar.
+    """
+    chaves = {largura: _chave_existe(nome_original, largura) for largura in larguras}
+    em_cache = cache.get_many(chaves.values())
+    existentes, existem, faltam = [], {}, {}
+    for largura, chave in chaves.items():
+        if chave in em_cache:
+            existe = em_cache[chave]
+        else:
+            existe = default_storage.exists(nome_derivado(nome_original, largura))
+            (existem if existe else faltam)[chave] = existe
+        if existe:
+            existentes.append(largura)
+    if existem:
+        cache.set_many(existem, TEMPO_EXISTE)
+    if faltam:
+        cache.set_many(faltam, TEMPO_FALTA)
+    return existentes
+
+
+def url_imagem(nome_original, largura):
+    """URL do derivado na largura pedida ou, se ele não existir, do próprio original."""
+    if derivados_existentes(nome_original, (largura,)):
+        return default_storage.url(nome_derivado(nome_original, largura))
+    return default_storage.url(nome_original)
+
+
+@cronometrar('imagem')
+def redimensionar(img, larguras):
+    """Gera os bytes WebP de uma imagem já aberta em cada largura pedida."""
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA')
+
+    derivados = {}
+    for largura in larguras:
+        # imagens menores que a largura pedida não são ampliadas, só recomprimidas
+        copia = img.copy()
+        copia.thumbnail((largura, largura * 10), Image.LANCZOS)
+        output = BytesIO()
+        copia.save(output, format='WEBP', quality=QUALIDADE, method=4)
+        derivados[largura] = output.getvalue()
+    return derivados
+
+
+def salvar_derivados(nome_original, derivados, substituir=False):
+    for largura, conteudo in derivados.items():
+        nome = nome_derivado(nome_original, largura)
+        # o original tem o nome do hash do conteúdo e o derivado leva a VERSAO no nome,
+        # então um derivado que já existe é igual ao que seria gravado
+        if default_storage.exists(nome):
+            if not substituir:
+                continue
+            default_storage.delete(nome)
+        default_storage.save(nome, ContentFile(conteudo))
+    # troca o "falta" que as páginas possam ter guardado
+    cache.set_many({_chave_existe(nome_original, largura): True for largura in derivados}, TEMPO_EXISTE)
+
+
+def gerar_derivados(arquivo, tipo, substituir=False):
+    """Abre uma imagem do storage (ImageField) e grava todos os seus derivados."""
+    with arquivo.open('rb'):
+        img = Image.open(arquivo)
+        img.load()
+    salvar_derivados(arquivo.name, redimensionar(img, LARGURAS[tipo]), substituir)
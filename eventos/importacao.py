@@ -0,0 +1,150 @@
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import TextIOWrapper
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .cache import invalidar_evento
+from .models import Evento, ImportacaoParticipantes
+
+
+# linhas do csv processadas (e gravadas) de cada vez
+TAMANHO_LOTE = 1000
+
+
+def _inicializar_worker():
+    # em sistemas que iniciam processos com spawn (macOS, Windows) o Django precisa ser configurado de novo
+    django.setup()
+
+
+def ler_csv(arquivo):
+    """Lê o csv (username;email;senha) linha a linha, ignorando o cabeçalho se houver."""
+    leitor = csv.reader(arquivo, delimiter=';')
+    for numero, linha in enumerate(leitor):
+        if not linha or not linha[0].strip():
+            continue
+        if numero == 0 and linha[0].strip().lower() == 'username':
+            continue
+        username = linha[0].strip()
+        email = linha[1].strip() if len(linha) > 1 else ''
+        senha = linha[2] if len(linha) > 2 else ''
+        yield username, email, senha
+
+
+def _lotes(iteravel, tamanho):
+    iterador = iter(iteravel)
+    while lote := list(islice(iterador, tamanho)):
+        yield lote
+
+
+def _gerar_hashes(senhas, executor):
+    # sem senha, o usuário recebe uma senha inutilizável (e precisa redefinir para entrar)
+    com_senha = [senha for senha in senhas if senha]
+    if executor and com_senha:
+        hashes = iter(executor.map(make_password, com_senha, chunksize=max(1, len(com_senha) // 32)))
+    else:
+        hashes = iter([make_password(senha) for senha in com_senha])
+    return [next(hashes) if senha else make_password(None) for senha in senhas]
+
+
+def importar_participantes(linhas, evento=None, workers=None, progresso=None):
+    """Cria os usuários que ainda não existem e, se houver evento, inscreve todos nele.
+
+    O hash das senhas (a parte lenta) é feito em um pool de processos, e os
+    usuários e as inscrições são gravados com bulk_create, um lote por vez.
+    Devolve quantos usuários foram criados, quantos já existiam e quantos foram
+    inscritos agora (quem já estava inscrito não conta); progresso, se houver,
+    é chamado com esses números no fim de cada lote.
+    """
+    workers = workers or os.cpu_count() or 1
+    resultado = {'criados': 0, 'existentes': 0, 'inscritos': 0}
+    Inscricao = Evento.participantes.through
+
+    executor = None
+    try:
+        for lote in _lotes(linhas, TAMANHO_LOTE):
+            # usernames repetidos dentro do próprio csv ficam só com a primeira linha
+            por_username = {}
+            for username, email, senha in lote:
+                por_username.setdefault(username, (email, senha))
+
+            existentes = set(User.objects.filter(username__in=por_username).values_list('username', flat=True))
+            novos = [(username, email, senha) for username, (email, senha) in por_username.items()
+                     if username not in existentes]
+
+            # o pool só é criado quando aparece a primeira senha (sem senha não há hash caro)
+            if executor is None and workers > 1 and any(senha for _, _, senha in novos):
+                executor = ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker)
+            hashes = dict(zip((username for username, _, _ in novos),
+                              _gerar_hashes([senha for _, _, senha in novos], executor)))
+            usuarios = [
+                User(username=username, email=email, password=hashes[username])
+                for username, email, _ in novos
+            ]
+            # ignore_conflicts: um usuário criado por outro caminho nesse meio tempo é só ignorado
+            User.objects.bulk_create(usuarios, batch_size=TAMANHO_LOTE, ignore_conflicts=True)
+            # o bulk_create com ignore_conflicts não diz quais linhas entraram; cada hash tem o
+            # seu salt, então só as linhas gravadas aqui têm a senha igual à que foi gerada
+            ids = []
+            for id, username, senha_hash in (
+                User.objects.filter(username__in=por_username).values_list('id', 'username', 'password')
+            ):
+                ids.append(id)
+                if hashes.get(username) == senha_hash:
+                    resultado['criados'] += 1
+                else:
+                    resultado['existentes'] += 1
+
+            if evento is not None:
+                # quem já estava inscrito fica de fora (e não é contado)
+                ja_inscritos = set(
+                    Inscricao.objects.filter(evento_id=evento.id, user_id__in=ids).values_list('user_id', flat=True)
+                )
+                inscricoes = [Inscricao(evento_id=evento.id, user_id=id) for id in ids if id not in ja_inscritos]
+                # uma inscrição feita nesse meio tempo é ignorada pela restrição única da tabela de ligação
+                Inscricao.objects.bulk_create(inscricoes, batch_size=TAMANHO_LOTE, ignore_conflicts=True)
+                invalidar_evento(evento.id, [inscricao.user_id for inscricao in inscricoes])
+                resultado['inscritos'] += len(inscricoes)
+
+            if progresso:
+                progresso(resultado)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    if evento is not None:
+        # o bulk_create não dispara o m2m_changed, então o contador é recontado
+        evento.recontar()
+    return resultado
+
+
+def executar_importacao(importacao, workers=None):
+    """Importa o csv de uma ImportacaoParticipantes da fila (chamado pelo processar_certificados)."""
+    def progresso(resultado):
+        # também renova o atualizado_em, para a importação não parecer abandonada (tarefas.EXPIRACAO)
+        ImportacaoParticipantes.objects.filter(id=importacao.id).update(**resultado, atualizado_em=timezone.now())
+
+    try:
+        with importacao.arquivo.open('rb') as arquivo:
+            texto = TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+            resultado = importar_participantes(ler_csv(texto), evento=importacao.evento,
+                                               workers=workers, progresso=progresso)
+    except Exception as erro:
+        importacao.refresh_from_db(fields=['criados', 'existentes', 'inscritos'])
+        importacao.status = ImportacaoParticipantes.ERRO
+        importacao.erro = repr(erro)
+        raise
+    else:
+        for campo, valor in resultado.items():
+            setattr(importacao, campo, valor)
+        importacao.status = ImportacaoParticipantes.CONCLUIDA
+    finally:
+        # o csv tem as senhas em texto puro, então sai do storage assim que é lido;
+        # se falhar, basta enviar de novo (quem já foi criado ou inscrito é pulado)
+        importacao.arquivo.delete(save=False)
+        importacao.save()
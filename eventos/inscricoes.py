@@ -0,0 +1,46 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+
+from .cache import invalidar_evento
+from .models import Evento
+
+
+INSCRITO = 'inscrito'
+JA_INSCRITO = 'ja_inscrito'
+LOTADO = 'lotado'
+
+Inscricao = Evento.participantes.through
+
+
+def esta_inscrito(evento_id, usuario_id):
+    # consulta só a tabela de ligação, usando o índice único (evento_id, user_id)
+    return Inscricao.objects.filter(evento_id=evento_id, user_id=usuario_id).exists()
+
+
+def inscrever(evento_id, usuario_id):
+    """Inscreve o usuário no evento, respeitando a capacidade.
+
+    São só dois comandos: um UPDATE nos contadores que já reserva a vaga
+    (só passa se ainda houver vaga) e o INSERT na tabela de ligação.
+    Se o usuário já estiver inscrito, o INSERT falha pela restrição única
+    e a reserva da vaga é desfeita junto.
+    """
+    com_vaga = Evento.objects.filter(id=evento_id).filter(
+        Q(capacidade__isnull=True) | Q(total_participantes__lt=F('capacidade'))
+    )
+    try:
+        with transaction.atomic():
+            atualizados = com_vaga.update(
+                total_participantes=F('total_participantes') + 1,
+                certificados_pendentes=F('certificados_pendentes') + Evento.sem_certificado(usuario_id),
+            )
+            if not atualizados:
+                return JA_INSCRITO if esta_inscrito(evento_id, usuario_id) else LOTADO
+            # create direto na tabela de ligação não dispara o m2m_changed,
+            # o contador já foi atualizado acima
+            Inscricao.objects.create(evento_id=evento_id, user_id=usuario_id)
+            # o create direto na tabela de ligação também não dispara a invalidação do cache
+            invalidar_evento(evento_id, [usuario_id], depois_do_commit=True)
+    except IntegrityError:
+        return JA_INSCRITO
+    return INSCRITO
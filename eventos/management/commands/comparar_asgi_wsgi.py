@@ -0,0 +1,113 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncRequestFactory, RequestFactory
+
+from cliente import views as cliente_views, views_async as cliente_views_async
+from eventos import views, views_async
+from eventos.medicao import resumir_latencias
+from eventos.models import Evento, Certificado
+
+
+class Command(BaseCommand):
+    help = 'Compara as views de leitura síncronas (WSGI, uma thread por requisição) com as assíncronas (ASGI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evento', type=int, help='evento usado nas medições (padrão: o com mais participantes)')
+        parser.add_argument('--requisicoes', type=int, default=200, help='requisições por view em cada modo')
+        parser.add_argument('--concorrencia', type=int, default=16, help='requisições simultâneas (threads no WSGI, tarefas no ASGI)')
+        parser.add_argument('--json', action='store_true', help='imprime o resultado em JSON')
+
+    def _cenarios(self, evento):
+        participante = evento.participantes.order_by('id').first()
+        cenarios = [
+            ('gerenciar_evento', evento.criador, '/eventos/gerenciar_evento/', {},
+             views.gerenciar_evento, views_async.gerenciar_evento),
+            ('participantes_evento', evento.criador, f'/eventos/participantes_evento/{evento.id}/', {'id': evento.id},
+             views.participantes_evento, views_async.participantes_evento),
+        ]
+        if participante:
+            cenarios.append(('meus_certificados', participante, '/cliente/meus_certificados/', {},
+                             cliente_views.meus_certificados, cliente_views_async.meus_certificados))
+        # certificado sob demanda (sem arquivo): a view renderiza com o Pillow
+        certificado = Certificado.objects.filter(evento=evento, certificado='').first()
+        if certificado:
+            cenarios.append(('ver_certificado', evento.criador, f'/eventos/ver_certificado/{certificado.id}/',
+                             {'id': certificado.id}, views.ver_certificado, views_async.ver_certificado))
+        return cenarios
+
+    def _resultado(self, modo, nome, latencias, duracao):
+        return {
+            'modo': modo,
+            'view': nome,
+            'requisicoes': len(latencias),
+            'requisicoes_por_segundo': round(len(latencias) / duracao, 2),
+            **resumir_latencias(latencias),
+        }
+
+    def _medir_wsgi(self, usuario, url, kwargs, view, requisicoes, concorrencia):
+        factory = RequestFactory()
+
+        def chamar(_):
+            request = factory.get(url)
+            request.user = usuario
+            inicio = time.perf_counter()
+            response = view(request, **kwargs)
+            if response.status_code >= 400:
+                raise CommandError(f'{url} respondeu {response.status_code}')
+            return time.perf_counter() - inicio
+
+        with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+            inicio = time.perf_counter()
+            latencias = list(executor.map(chamar, range(requisicoes)))
+            return latencias, time.perf_counter() - inicio
+
+    def _medir_asgi(self, usuario, url, kwargs, view, requisicoes, concorrencia):
+        factory = AsyncRequestFactory()
+
+        async def chamar(semaforo):
+            async with semaforo:
+                request = factory.get(url)
+                request.user = usuario
+                inicio = time.perf_counter()
+                response = await view(request, **kwargs)
+                if response.status_code >= 400:
+                    raise CommandError(f'{url} respondeu {response.status_code}')
+                return time.perf_counter() - inicio
+
+        async def medir():
+            semaforo = asyncio.Semaphore(concorrencia)
+            inicio = time.perf_counter()
+            latencias = await asyncio.gather(*(chamar(semaforo) for _ in range(requisicoes)))
+            return list(latencias), time.perf_counter() - inicio
+
+        return asyncio.run(medir())
+
+    def handle(self, *args, **options):
+        if options['evento']:
+            evento = Evento.objects.select_related('criador').filter(id=options['evento']).first()
+        else:
+            evento = Evento.objects.select_related('criador').order_by('-total_participantes', 'id').first()
+        if evento is None:
+            raise CommandError('Nenhum evento encontrado para medir.')
+
+        resultados = []
+        for nome, usuario, url, kwargs, view_sync, view_async in self._cenarios(evento):
+            # uma chamada de aquecimento em cada modo (conexões, templates, caches)
+            self._medir_wsgi(usuario, url, kwargs, view_sync, 1, 1)
+            self._medir_asgi(usuario, url, kwargs, view_async, 1, 1)
+            for modo, medir, view in (('wsgi', self._medir_wsgi, view_sync), ('asgi', self._medir_asgi, view_async)):
+                latencias, duracao = medir(usuario, url, kwargs, view, options['requisicoes'], options['concorrencia'])
+                resultados.append(self._resultado(modo, nome, latencias, duracao))
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultados))
+            return
+        for r in resultados:
+            self.stdout.write(
+                f"{r['view']:<22} {r['modo']}: {r['requisicoes_por_segundo']:>8} req/s "
+                f"(p50 {r['p50_ms']} ms, p95 {r['p95_ms']} ms, p99 {r['p99_ms']} ms)"
+            )
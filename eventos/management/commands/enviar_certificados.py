@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from eventos.envios import ANEXAR, POR_SEGUNDO, TAMANHO_LOTE, enviar_certificados
+from eventos.models import Certificado, Evento
+
+
+class Command(BaseCommand):
+    help = 'Envia por e-mail os certificados que ainda não foram enviados (ou que deram erro)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evento', type=int, nargs='*', help='ids dos eventos (padrão: todos com envio pendente)')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='e-mails enviados por conexão SMTP')
+        parser.add_argument('--por-segundo', type=float, default=POR_SEGUNDO, help='limite de e-mails por segundo (0: sem limite)')
+        parser.add_argument('--sem-anexo', action='store_true', help='envia só o link para o certificado')
+
+    def handle(self, *args, **options):
+        eventos = Evento.objects.all()
+        if options['evento']:
+            eventos = eventos.filter(id__in=options['evento'])
+        else:
+            eventos = eventos.filter(id__in=Certificado.objects.filter(enviado_em__isnull=True).values('evento_id'))
+
+        anexar = ANEXAR and not options['sem_anexo']
+        for evento in eventos.order_by('id'):
+            enviados, erros = enviar_certificados(evento, options['lote'], options['por_segundo'], anexar)
+            if enviados or erros:
+                self.stdout.write(f'{evento}: {enviados} enviado(s), {erros} erro(s)')
+        self.stdout.write(self.style.SUCCESS('Envio concluído'))
@@ -0,0 +1,32 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from eventos.imagens import LARGURAS, gerar_derivados, nome_derivado
+from eventos.models import Certificado, Evento
+
+
+class Command(BaseCommand):
+    help = 'Gera as versões reduzidas (srcset) dos logos e certificados que ainda não têm'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true', help='refaz também as imagens que já têm derivados')
+
+    def handle(self, *args, **options):
+        self.todas = options['todas']
+        total = 0
+        for evento in Evento.objects.exclude(logo='').only('logo').iterator():
+            total += self._gerar(evento.logo, 'logo')
+        for certificado in Certificado.objects.only('certificado').iterator():
+            total += self._gerar(certificado.certificado, 'certificado')
+        self.stdout.write(self.style.SUCCESS(f'{total} imagens processadas'))
+
+    def _gerar(self, arquivo, tipo):
+        maior = nome_derivado(arquivo.name, max(LARGURAS[tipo]))
+        if not self.todas and default_storage.exists(maior):
+            return 0
+        try:
+            gerar_derivados(arquivo, tipo, substituir=self.todas)
+        except (OSError, ValueError) as erro:
+            self.stderr.write(f'Não foi possível processar {arquivo.name}: {erro}')
+            return 0
+        return 1
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from eventos.importacao import importar_participantes, ler_csv
+from eventos.models import Evento
+
+
+class Command(BaseCommand):
+    help = 'Importa usuários de um csv (username;email;senha) e opcionalmente inscreve todos em um evento'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='caminho do csv, separado por ponto e vírgula')
+        parser.add_argument('--evento', type=int, help='id do evento em que os usuários serão inscritos')
+        parser.add_argument('--workers', type=int, help='processos usados no hash das senhas (padrão: núcleos)')
+
+    def handle(self, *args, **options):
+        evento = None
+        if options['evento']:
+            try:
+                evento = Evento.objects.get(id=options['evento'])
+            except Evento.DoesNotExist:
+                raise CommandError(f"Evento {options['evento']} não existe")
+
+        inicio = time.perf_counter()
+        with open(options['arquivo'], encoding='utf-8-sig', newline='') as arquivo:
+            resultado = importar_participantes(ler_csv(arquivo), evento=evento, workers=options['workers'])
+        duracao = time.perf_counter() - inicio
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['criados']} criados, {resultado['existentes']} já existiam, "
+            f"{resultado['inscritos']} inscritos em {duracao:.1f}s"
+        ))
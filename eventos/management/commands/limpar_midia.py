@@ -0,0 +1,169 @@
+import os
+import posixpath
+import re
+from datetime import timedelta
+from itertools import islice
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from eventos.imagens import LARGURAS, VERSAO, nome_derivado
+from eventos.models import Certificado, Evento, ImportacaoParticipantes
+from type_event.armazenamento import armazenamento_por_conteudo
+
+
+# nomes gerados pelo type_event/armazenamento.py: <pasta>/ab/cd/<sha256>.<extensão>
+RE_NOME_POR_CONTEUDO = re.compile(r'^[\w-]+/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.\w+$')
+# nomes do eventos/imagens.py nome_derivado: derivados/<pasta do original>/<base>-<largura>w-v<versão>.webp
+PASTA_DERIVADOS = 'derivados/'
+RE_NOME_DERIVADO = re.compile(
+    rf'^{PASTA_DERIVADOS}(?:(?P<pasta>.*)/)?(?P<base>[^/]+)-(?P<largura>\d+)w-v{VERSAO}\.webp$'
+)
+# quantos arquivos do storage são conferidos no banco por consulta
+TAMANHO_LOTE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Apaga do storage os arquivos que nenhum certificado ou logo usa (inclusive os csv antigos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simular', action='store_true', help='só mostra o que seria apagado')
+        parser.add_argument('--idade-minima', type=int, default=3600,
+                            help='segundos; arquivos mais novos nunca são apagados (gerações em andamento)')
+        parser.add_argument('--reorganizar', action='store_true',
+                            help='antes de limpar, passa os arquivos com nomes antigos para os nomes por conteúdo')
+
+    def _arquivos(self, pasta=''):
+        # percorre o storage pasta por pasta, sem montar a lista inteira na memória
+        pastas, arquivos = default_storage.listdir(pasta)
+        for arquivo in arquivos:
+            yield posixpath.join(pasta, arquivo)
+        for subpasta in pastas:
+            yield from self._arquivos(posixpath.join(pasta, subpasta))
+
+    def _originais(self, derivado):
+        """(nome do original, tamanho) possíveis para um derivado, procurados na pasta do original.
+
+        O nome do derivado não guarda a extensão do original; com os nomes por conteúdo
+        a pasta do original (<pasta>/ab/cd) tem poucos arquivos.
+        """
+        encontrado = RE_NOME_DERIVADO.match(derivado)
+        if not encontrado:
+            return []
+        pasta, base = encontrado.group('pasta') or '', encontrado.group('base')
+        largura = int(encontrado.group('largura'))
+        if self._pasta_listada[0] != pasta:
+            try:
+                self._pasta_listada = (pasta, default_storage.listdir(pasta)[1])
+            except FileNotFoundError:
+                self._pasta_listada = (pasta, [])
+        return [
+            (posixpath.join(pasta, arquivo), largura)
+            for arquivo in self._pasta_listada[1] if posixpath.splitext(arquivo)[0] == base
+        ]
+
+    def _usados(self, nomes):
+        """Os nomes do lote que algum logo, certificado ou importação ainda usa.
+
+        O banco é consultado só com os nomes do lote (pelo índice do arquivo), em vez de
+        carregar todos os arquivos usados na memória antes de percorrer o storage.
+        """
+        # nome do original -> [(nome no storage, largura do derivado ou None)]
+        candidatos = {}
+        for nome in nomes:
+            if nome.startswith(PASTA_DERIVADOS):
+                for original, largura in self._originais(nome):
+                    candidatos.setdefault(original, []).append((nome, largura))
+            else:
+                candidatos.setdefault(nome, []).append((nome, None))
+
+        originais = list(candidatos)
+        consultas = (
+            ('logo', Evento.objects.filter(logo__in=originais).values_list('logo', flat=True)),
+            ('certificado', Certificado.objects.filter(certificado__in=originais).values_list('certificado', flat=True)),
+            # csv de importações que ainda estão na fila
+            (None, ImportacaoParticipantes.objects.filter(arquivo__in=originais).values_list('arquivo', flat=True)),
+        )
+        usados = set()
+        for tipo, encontrados in consultas:
+            for original in encontrados.distinct():
+                for nome, largura in candidatos[original]:
+                    # derivados de larguras ou versões que não são mais geradas também são apagados
+                    if largura is None or (tipo and largura in LARGURAS[tipo] and nome == nome_derivado(original, largura)):
+                        usados.add(nome)
+        return usados
+
+    def _reorganizar(self, modelo, campo, tipo):
+        # a lista é lida inteira antes porque as linhas são atualizadas durante o laço
+        antigos = list(
+            modelo.objects.exclude(**{campo: ''}).exclude(**{f'{campo}__regex': RE_NOME_POR_CONTEUDO.pattern})
+            .values_list(campo, flat=True).distinct().order_by(campo)
+        )
+        total = 0
+        for nome in antigos:
+            if not default_storage.exists(nome):
+                continue
+            with default_storage.open(nome, 'rb') as arquivo:
+                novo = armazenamento_por_conteudo.save(nome, arquivo)
+            # os derivados são só copiados para o nome novo, sem redimensionar de novo
+            for largura in LARGURAS[tipo]:
+                derivado = nome_derivado(nome, largura)
+                if default_storage.exists(derivado) and not default_storage.exists(nome_derivado(novo, largura)):
+                    with default_storage.open(derivado, 'rb') as arquivo:
+                        default_storage.save(nome_derivado(novo, largura), arquivo)
+            modelo.objects.filter(**{campo: nome}).update(**{campo: novo})
+            total += 1
+        return total
+
+    def _remover_pastas_vazias(self, nome):
+        # as subpastas dos nomes por conteúdo que ficaram vazias (nunca a raiz do MEDIA_ROOT)
+        try:
+            raiz = os.path.abspath(default_storage.path(''))
+            pasta = os.path.dirname(default_storage.path(nome))
+        except NotImplementedError:
+            # storages remotos (S3 etc.) não têm pastas de verdade
+            return
+        while pasta.startswith(raiz + os.sep):
+            try:
+                os.rmdir(pasta)
+            except OSError:
+                break
+            pasta = os.path.dirname(pasta)
+
+    def handle(self, *args, **options):
+        simular = options['simular']
+        if options['reorganizar'] and not simular:
+            total = self._reorganizar(Evento, 'logo', 'logo') + self._reorganizar(Certificado, 'certificado', 'certificado')
+            self.stdout.write(f'{total} arquivo(s) reorganizado(s)')
+
+        limite = timezone.now() - timedelta(seconds=options['idade_minima'])
+        self._pasta_listada = (None, [])
+
+        apagados = bytes_liberados = 0
+        arquivos = self._arquivos()
+        while lote := list(islice(arquivos, TAMANHO_LOTE)):
+            usados = self._usados(lote)
+            for nome in lote:
+                if nome in usados:
+                    continue
+                # a data é conferida depois do banco: um arquivo gravado (ou reaproveitado) depois
+                # da consulta é mais novo que a idade mínima e fica de fora
+                try:
+                    if default_storage.get_modified_time(nome) > limite:
+                        continue
+                    tamanho = default_storage.size(nome)
+                except FileNotFoundError:
+                    continue
+                if simular:
+                    self.stdout.write(nome)
+                else:
+                    default_storage.delete(nome)
+                    self._remover_pastas_vazias(nome)
+                apagados += 1
+                bytes_liberados += tamanho
+
+        verbo = 'seriam apagados' if simular else 'apagados'
+        self.stdout.write(self.style.SUCCESS(
+            f'{apagados} arquivo(s) {verbo} ({bytes_liberados / 1024 / 1024:.1f} MB)'
+        ))
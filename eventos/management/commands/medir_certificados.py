@@ -0,0 +1,44 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from eventos.certificados import renderizar_lote
+
+
+class Command(BaseCommand):
+    help = 'Mede quantos certificados por segundo o renderizador gera com 1..N processos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quantidade', type=int, default=200, help='certificados renderizados em cada medição')
+        parser.add_argument('--workers', type=int, nargs='*', help='quantidades de processos a medir (padrão: 1 até o número de núcleos)')
+        parser.add_argument('--json', action='store_true', help='imprime o resultado em JSON')
+
+    def handle(self, *args, **options):
+        quantidade = options['quantidade']
+        workers = options['workers'] or sorted({1, *range(2, (os.cpu_count() or 1) + 1, 2), os.cpu_count() or 1})
+        dados = [(f'Participante {i}', 'Evento de medição', 8) for i in range(quantidade)]
+
+        resultados = []
+        for n in workers:
+            inicio = time.perf_counter()
+            total_bytes = sum(len(png) for png, miniaturas in renderizar_lote(dados, workers=n))
+            duracao = time.perf_counter() - inicio
+            resultados.append({
+                'workers': n,
+                'certificados': quantidade,
+                'segundos': round(duracao, 3),
+                'certificados_por_segundo': round(quantidade / duracao, 2),
+                'ms_por_certificado': round(duracao * 1000 / quantidade, 2),
+                'bytes_medio': total_bytes // quantidade,
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultados))
+            return
+        for r in resultados:
+            self.stdout.write(
+                f"{r['workers']:>3} processo(s): {r['certificados_por_segundo']:>8} cert/s "
+                f"({r['ms_por_certificado']} ms/cert)"
+            )
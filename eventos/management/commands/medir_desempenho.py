@@ -0,0 +1,220 @@
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from eventos.cache import invalidar_evento
+from eventos.medicao import host_local, resumir_latencias
+from eventos.models import Evento, Certificado, GeracaoCertificados
+from eventos.tarefas import executar_tarefa
+
+from .seed_benchmark import EVENTO_CERTIFICADOS, eventos_benchmark, usuarios_benchmark
+
+
+CENARIOS = ['gerenciar_evento_busca', 'participantes_evento', 'gerar_csv', 'inscrever_evento',
+            'meus_certificados', 'gerar_certificado']
+# métricas mostradas na comparação com uma medição anterior (--comparar)
+METRICAS = ['p50_ms', 'p95_ms', 'consultas_media', 'memoria_pico_kb', 'certificados_por_segundo']
+TERMOS_BUSCA = ['python', 'django', 'dados', 'workshop', 'curso de', 'segu']
+
+
+def _git():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=settings.BASE_DIR, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _consumir(response):
+    # respostas em streaming (csv) só são geradas quando lidas
+    if response.streaming:
+        return sum(len(bloco) for bloco in response.streaming_content)
+    return len(response.content)
+
+
+class Command(BaseCommand):
+    help = 'Mede latência, consultas SQL e memória das páginas principais com os dados do seed_benchmark'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=30, help='requisições por cenário')
+        parser.add_argument('--repeticoes-certificados', type=int, default=3,
+                            help='gerações completas no cenário gerar_certificado')
+        parser.add_argument('--cenarios', nargs='*', choices=CENARIOS, help='cenários a medir (padrão: todos)')
+        parser.add_argument('--saida', help='grava o resultado em JSON nesse arquivo')
+        parser.add_argument('--comparar', help='JSON de uma medição anterior, para mostrar a diferença')
+        parser.add_argument('--json', action='store_true', help='imprime o resultado em JSON')
+
+    def _cliente(self, usuario):
+        cliente = Client(HTTP_HOST=host_local())
+        cliente.force_login(usuario)
+        return cliente
+
+    def _medir(self, requisicao, repeticoes):
+        """Roda a requisição várias vezes medindo o tempo e as consultas SQL de cada uma.
+
+        A memória é medida numa execução a mais, separada, porque o tracemalloc
+        deixa o código bem mais lento e distorceria as latências.
+        """
+        latencias, consultas = [], []
+        for i in range(repeticoes):
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                response = requisicao(i)
+                _consumir(response)
+                latencias.append(time.perf_counter() - inicio)
+            if response.status_code >= 400:
+                raise CommandError(f'{response.wsgi_request.path} respondeu {response.status_code}')
+            consultas.append(len(capturadas))
+
+        tracemalloc.start()
+        _consumir(requisicao(repeticoes))
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return {
+            'repeticoes': repeticoes,
+            **resumir_latencias(latencias),
+            'consultas_media': round(sum(consultas) / len(consultas), 1),
+            'consultas_max': max(consultas),
+            'memoria_pico_kb': pico // 1024,
+        }
+
+    # cenários: cada um devolve as métricas do dicionário do resultado
+
+    def gerenciar_evento_busca(self, repeticoes):
+        cliente = self._cliente(self.criador)
+        url = reverse('eventos:gerenciar_evento')
+        return self._medir(lambda i: cliente.get(url, {'nome': TERMOS_BUSCA[i % len(TERMOS_BUSCA)]}), repeticoes)
+
+    def participantes_evento(self, repeticoes):
+        cliente = self._cliente(self.criador)
+        url = reverse('eventos:participantes_evento', kwargs={'id': self.evento.id})
+        return self._medir(lambda i: cliente.get(url, {'por_pagina': 50}), repeticoes)
+
+    def gerar_csv(self, repeticoes):
+        cliente = self._cliente(self.criador)
+        url = reverse('eventos:gerar_csv', kwargs={'id': self.evento.id})
+        return self._medir(lambda i: cliente.get(url), repeticoes)
+
+    def inscrever_evento(self, repeticoes):
+        # cada repetição é um usuário diferente se inscrevendo; no fim as inscrições são desfeitas
+        usuarios = list(
+            usuarios_benchmark().filter(username__contains='usuario')
+            .exclude(evento_participante=self.evento).order_by('id')[:repeticoes + 1]
+        )
+        if len(usuarios) <= repeticoes:
+            raise CommandError('Não há usuários suficientes fora do evento para medir as inscrições.')
+        clientes = [self._cliente(usuario) for usuario in usuarios]
+        url = reverse('eventos:inscrever_evento', kwargs={'id': self.evento.id})
+        try:
+            return self._medir(lambda i: clientes[i].post(url), repeticoes)
+        finally:
+            self.evento.participantes.through.objects.filter(evento=self.evento, user__in=usuarios).delete()
+            self.evento.recontar()
+            invalidar_evento(self.evento.id, [usuario.id for usuario in usuarios])
+
+    def meus_certificados(self, repeticoes):
+        cliente = self._cliente(self.participante)
+        url = reverse('cliente:meus_certificados')
+        return self._medir(lambda i: cliente.get(url), repeticoes)
+
+    def _apagar_certificados(self, evento):
+        # só as linhas: os pngs (nomeados pelo conteúdo) são os mesmos a cada repetição,
+        # e os que sobrarem são removidos pelo comando limpar_midia
+        Certificado.objects.filter(evento=evento).delete()
+        GeracaoCertificados.objects.filter(evento=evento).delete()
+        evento.recontar()
+
+    def gerar_certificado(self, repeticoes):
+        # a view só põe a geração na fila; o tempo que importa é o do worker até o fim, então as
+        # latências deste cenário incluem a geração completa (e a limpeza para a próxima repetição)
+        evento = eventos_benchmark().get(nome=EVENTO_CERTIFICADOS)
+        cliente = self._cliente(evento.criador)
+        url = reverse('eventos:gerar_certificado', kwargs={'id': evento.id})
+        self._apagar_certificados(evento)
+
+        duracoes = []
+
+        def gerar(i):
+            response = cliente.get(url)
+            inicio = time.perf_counter()
+            executar_tarefa(GeracaoCertificados.objects.filter(evento=evento).latest('id'))
+            duracoes.append(time.perf_counter() - inicio)
+            self._apagar_certificados(evento)
+            return response
+
+        resultado = self._medir(gerar, repeticoes)
+        # a última geração foi a da medição de memória, mais lenta por causa do tracemalloc
+        duracoes = duracoes[:repeticoes]
+        quantidade = evento.participantes.count()
+        resultado['certificados'] = quantidade
+        resultado['certificados_por_segundo'] = round(quantidade * len(duracoes) / sum(duracoes), 2)
+        return resultado
+
+    def _comparar(self, anterior, atual):
+        for nome, metricas in atual['cenarios'].items():
+            antes = anterior.get('cenarios', {}).get(nome)
+            if not antes:
+                continue
+            self.stdout.write(nome)
+            for metrica in METRICAS:
+                if metrica not in metricas or not antes.get(metrica):
+                    continue
+                variacao = (metricas[metrica] - antes[metrica]) * 100 / antes[metrica]
+                self.stdout.write(f'    {metrica:<26} {antes[metrica]:>10} -> {metricas[metrica]:>10} ({variacao:+.1f}%)')
+
+    def handle(self, *args, **options):
+        self.evento = (
+            eventos_benchmark().exclude(nome=EVENTO_CERTIFICADOS).select_related('criador')
+            .order_by('-total_participantes', 'id').first()
+        )
+        if self.evento is None:
+            raise CommandError('Sem dados para medir: rode antes "python manage.py seed_benchmark".')
+        self.criador = self.evento.criador
+        self.participante = (
+            usuarios_benchmark().annotate(certificados=Count('certificado')).order_by('-certificados', 'id').first()
+        )
+
+        cenarios = {}
+        for nome in options['cenarios'] or CENARIOS:
+            repeticoes = options['repeticoes_certificados'] if nome == 'gerar_certificado' else options['repeticoes']
+            cenarios[nome] = getattr(self, nome)(repeticoes)
+            if not options['json']:
+                self.stdout.write(f"{nome:<24} p50 {cenarios[nome]['p50_ms']:>8} ms  p95 {cenarios[nome]['p95_ms']:>8} ms  "
+                                  f"{cenarios[nome]['consultas_media']:>6} consultas  {cenarios[nome]['memoria_pico_kb']:>7} KiB")
+
+        resultado = {
+            'gerado_em': datetime.now().isoformat(timespec='seconds'),
+            'git': _git(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'banco': connection.vendor,
+            'dados': {
+                'usuarios': usuarios_benchmark().count(),
+                'eventos': eventos_benchmark().count(),
+                'participantes_evento_medido': self.evento.total_participantes,
+                'certificados': Certificado.objects.filter(evento__in=eventos_benchmark()).count(),
+            },
+            'cenarios': cenarios,
+        }
+
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as arquivo:
+                self._comparar(json.load(arquivo), resultado)
+        if options['json']:
+            self.stdout.write(json.dumps(resultado, ensure_ascii=False))
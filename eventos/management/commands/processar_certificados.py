@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from eventos.importacao import executar_importacao
+from eventos.models import ImportacaoParticipantes
+from eventos.tarefas import TAMANHO_LOTE, executar_tarefa, reservar_tarefa
+
+
+class Command(BaseCommand):
+    help = 'Worker que processa a fila de geração de certificados (e a de importação de participantes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='participantes processados por lote')
+        parser.add_argument('--intervalo', type=float, default=2, help='segundos de espera quando a fila está vazia')
+        parser.add_argument('--uma-vez', action='store_true', help='processa o que estiver na fila e termina')
+
+    def handle(self, *args, **options):
+        while True:
+            # as importações vêm antes: quem importou espera para ver os participantes
+            tarefa = reservar_tarefa(ImportacaoParticipantes) or reservar_tarefa()
+            if tarefa is None:
+                if options['uma_vez']:
+                    return
+                time.sleep(options['intervalo'])
+                continue
+
+            self.stdout.write(f'Processando {tarefa}')
+            try:
+                if isinstance(tarefa, ImportacaoParticipantes):
+                    executar_importacao(tarefa)
+                else:
+                    executar_tarefa(tarefa, options['lote'])
+            except Exception as erro:
+                # a tarefa fica marcada com erro e o worker segue para a próxima
+                self.stderr.write(f'Falha em {tarefa}: {erro!r}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'Concluída: {tarefa}'))
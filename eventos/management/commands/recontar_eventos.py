@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from eventos.models import Evento
+
+
+class Command(BaseCommand):
+    help = 'Confere os contadores de participantes, certificados e envios dos eventos e corrige as diferenças'
+
+    def handle(self, *args, **options):
+        # compara o contador guardado com a contagem real, tudo dentro do banco
+        contagens = Evento.contagens_reais()
+        diferente = Q()
+        for campo in contagens:
+            diferente |= ~Q(**{campo: F(f'real_{campo}')})
+        divergentes = (
+            Evento.objects.annotate(**{f'real_{campo}': valor for campo, valor in contagens.items()})
+            .filter(diferente)
+            .values_list('id', flat=True)
+        )
+        ids = list(divergentes)
+        if ids:
+            Evento.objects.filter(id__in=ids).update(**Evento.contagens_reais())
+        self.stdout.write(self.style.SUCCESS(f'{len(ids)} evento(s) corrigido(s)'))
@@ -0,0 +1,135 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from eventos.models import Evento, Certificado, GeracaoCertificados
+
+
+# tudo que o comando cria começa com esse prefixo, para poder ser apagado com --limpar
+PREFIXO = 'bench_'
+SENHA = 'benchmark'
+# evento sem certificados usado pela medição de gerar_certificado (comando medir_desempenho)
+EVENTO_CERTIFICADOS = 'Benchmark geração de certificados'
+
+TEMAS = ['Python', 'Django', 'Dados', 'Segurança', 'Cloud', 'Design', 'Mobile', 'DevOps', 'Inteligência Artificial', 'Web']
+FORMATOS = ['Workshop', 'Meetup', 'Conferência', 'Curso', 'Hackathon', 'Semana']
+DESCRICAO = (
+    'Lorem ipsum dolor sit amet, consectetur adipiscing elit. Sed do eiusmod tempor incididunt '
+    'ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco. '
+)
+
+
+def usuarios_benchmark():
+    return User.objects.filter(username__startswith=PREFIXO)
+
+
+def eventos_benchmark():
+    return Evento.objects.filter(criador__username__startswith=PREFIXO)
+
+
+class Command(BaseCommand):
+    help = 'Cria usuários, eventos e inscrições sintéticos para as medições de desempenho'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=5000, help='quantidade de participantes')
+        parser.add_argument('--eventos', type=int, default=200, help='quantidade de eventos')
+        parser.add_argument('--criadores', type=int, default=5, help='usuários que criam os eventos')
+        parser.add_argument('--inscricoes', type=int, default=150, help='média de inscrições por evento')
+        parser.add_argument('--certificados', type=float, default=0.3,
+                            help='fração das inscrições que já tem certificado (só as linhas, sem png)')
+        parser.add_argument('--participantes-certificados', type=int, default=200,
+                            help=f'participantes do evento "{EVENTO_CERTIFICADOS}"')
+        parser.add_argument('--semente', type=int, default=42, help='semente do gerador aleatório (dados repetíveis)')
+        parser.add_argument('--limpar', action='store_true', help='só apaga os dados criados por este comando')
+
+    def limpar(self):
+        eventos = eventos_benchmark()
+        usuarios = usuarios_benchmark()
+        # as chaves estrangeiras são DO_NOTHING, então a ordem importa
+        Certificado.objects.filter(evento__in=eventos).delete()
+        Certificado.objects.filter(participante__in=usuarios).delete()
+        GeracaoCertificados.objects.filter(evento__in=eventos).delete()
+        total_eventos, _ = eventos.delete()
+        usuarios.delete()
+        return total_eventos
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        if options['limpar']:
+            self.limpar()
+            self.stdout.write(self.style.SUCCESS('Dados de benchmark apagados'))
+            return
+        if usuarios_benchmark().exists():
+            self.stdout.write('Apagando os dados de benchmark anteriores...')
+            self.limpar()
+
+        aleatorio = random.Random(options['semente'])
+        # a mesma senha para todos: o hash é calculado uma vez só, e não para cada usuário
+        senha = make_password(SENHA)
+
+        with transaction.atomic():
+            User.objects.bulk_create([
+                User(username=f'{PREFIXO}criador_{i}', email=f'{PREFIXO}criador_{i}@exemplo.com', password=senha)
+                for i in range(options['criadores'])
+            ], batch_size=2000)
+            # e-mails com maiúsculas, como chegam dos formulários, para a busca sem diferenciar maiúsculas
+            User.objects.bulk_create([
+                User(username=f'{PREFIXO}usuario_{i}', email=f'{PREFIXO}Usuario_{i}@Exemplo.com', password=senha)
+                for i in range(options['usuarios'])
+            ], batch_size=2000)
+            criadores = list(usuarios_benchmark().filter(username__startswith=f'{PREFIXO}criador_').values_list('id', flat=True))
+            participantes = list(usuarios_benchmark().filter(username__startswith=f'{PREFIXO}usuario_').values_list('id', flat=True))
+
+            primeiro_dia = date(2023, 1, 1)
+            eventos = []
+            for i in range(options['eventos']):
+                inicio_evento = primeiro_dia + timedelta(days=aleatorio.randrange(730))
+                eventos.append(Evento(
+                    criador_id=aleatorio.choice(criadores),
+                    nome=f'{aleatorio.choice(FORMATOS)} de {aleatorio.choice(TEMAS)} {i}',
+                    descricao=DESCRICAO * aleatorio.randint(1, 8),
+                    data_inicio=inicio_evento,
+                    data_termino=inicio_evento + timedelta(days=aleatorio.randint(0, 4)),
+                    carga_horaria=aleatorio.choice([2, 4, 8, 16, 40]),
+                    logo='logos/benchmark.png',
+                    cor_principal='#1e3a8a', cor_secundaria='#f59e0b', cor_fundo='#ffffff',
+                ))
+            eventos.append(Evento(
+                criador_id=criadores[0], nome=EVENTO_CERTIFICADOS, descricao=DESCRICAO,
+                data_inicio=primeiro_dia, data_termino=primeiro_dia, carga_horaria=8, logo='logos/benchmark.png',
+                cor_principal='#1e3a8a', cor_secundaria='#f59e0b', cor_fundo='#ffffff',
+            ))
+            Evento.objects.bulk_create(eventos, batch_size=1000)
+            ids_eventos = list(eventos_benchmark().exclude(nome=EVENTO_CERTIFICADOS).values_list('id', flat=True))
+            id_evento_certificados = eventos_benchmark().get(nome=EVENTO_CERTIFICADOS).id
+
+            # poucos eventos muito procurados e muitos pequenos (distribuição de Pareto)
+            Inscricao = Evento.participantes.through
+            inscricoes = []
+            certificados = []
+            for id_evento in ids_eventos:
+                # limitado à metade dos usuários, para sempre haver quem ainda possa se inscrever
+                tamanho = min(int(options['inscricoes'] * aleatorio.paretovariate(1.5) / 3), len(participantes) // 2)
+                for id_usuario in aleatorio.sample(participantes, tamanho):
+                    inscricoes.append(Inscricao(evento_id=id_evento, user_id=id_usuario))
+                    if aleatorio.random() < options['certificados']:
+                        certificados.append(Certificado(evento_id=id_evento, participante_id=id_usuario))
+            quantidade = min(options['participantes_certificados'], len(participantes))
+            for id_usuario in aleatorio.sample(participantes, quantidade):
+                inscricoes.append(Inscricao(evento_id=id_evento_certificados, user_id=id_usuario))
+
+            # bulk_create não dispara os sinais: os contadores são recontados no fim
+            Inscricao.objects.bulk_create(inscricoes, batch_size=5000, ignore_conflicts=True)
+            Certificado.objects.bulk_create(certificados, batch_size=5000, ignore_conflicts=True)
+            eventos_benchmark().update(**Evento.contagens_reais())
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(criadores) + len(participantes)} usuários, {len(ids_eventos) + 1} eventos, '
+            f'{len(inscricoes)} inscrições e {len(certificados)} certificados criados '
+            f'em {time.perf_counter() - inicio:.1f}s (senha dos usuários: "{SENHA}")'
+        ))
@@ -0,0 +1,40 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = 'Copia o banco SQLite principal para as réplicas de DB_REPLICAS (para testar as réplicas localmente)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float,
+                            help='segundos entre as cópias; sem ele, copia uma vez e termina')
+
+    def _copiar(self, destinos):
+        # a API de backup do SQLite copia um retrato consistente, mesmo com o site gravando no principal
+        origem = sqlite3.connect(str(connections[DEFAULT_DB_ALIAS].settings_dict['NAME']))
+        try:
+            for destino in destinos:
+                copia = sqlite3.connect(destino)
+                try:
+                    origem.backup(copia)
+                finally:
+                    copia.close()
+        finally:
+            origem.close()
+
+    def handle(self, *args, **options):
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError('Só para SQLite; no PostgreSQL as réplicas vêm da replicação do próprio banco.')
+        if not settings.DB_REPLICAS:
+            raise CommandError('Nenhuma réplica configurada: defina DB_REPLICAS com os caminhos das cópias.')
+
+        while True:
+            self._copiar(settings.DB_REPLICAS)
+            self.stdout.write(f'{len(settings.DB_REPLICAS)} réplica(s) atualizada(s)')
+            if not options['intervalo']:
+                return
+            time.sleep(options['intervalo'])
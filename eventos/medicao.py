@@ -0,0 +1,29 @@
+import statistics
+
+from django.conf import settings
+
+
+# funções usadas pelos comandos de medição (medir_desempenho, comparar_asgi_wsgi)
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def resumir_latencias(latencias):
+    """Percentis, média e máximo (em ms) de uma lista de durações em segundos."""
+    return {
+        'p50_ms': round(percentil(latencias, 50) * 1000, 2),
+        'p95_ms': round(percentil(latencias, 95) * 1000, 2),
+        'p99_ms': round(percentil(latencias, 99) * 1000, 2),
+        'media_ms': round(statistics.mean(latencias) * 1000, 2),
+        'max_ms': round(max(latencias) * 1000, 2),
+    }
+
+
+def host_local():
+    """Host para o Client dos comandos: ele manda "testserver", que fora dos testes não passa pelo ALLOWED_HOSTS."""
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+
+def remover_duplicados(apps, schema_editor):
+    # antes da restrição única, cada clique em "gerar" criava outro certificado
+    # para o mesmo participante, aqui fica só o primeiro de cada (evento, participante)
+    Certificado = apps.get_model('eventos', 'Certificado')
+    primeiros = (
+        Certificado.objects.values('evento', 'participante')
+        .annotate(primeiro=models.Min('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+    )
+    for duplicado in primeiros.iterator():
+        Certificado.objects.filter(
+            evento=duplicado['evento'], participante=duplicado['participante']
+        ).exclude(id=duplicado['primeiro']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0005_geracaocertificados'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='geracaocertificados',
+            name='ultimo_participante',
+        ),
+        migrations.RunPython(remover_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='certificado',
+            constraint=models.UniqueConstraint(fields=('evento', 'participante'), name='certificado_unico_por_participante'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 09:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0006_certificado_unico'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='certificado',
+            name='certificado',
+            field=models.ImageField(blank=True, upload_to='certificados'),
+        ),
+    ]
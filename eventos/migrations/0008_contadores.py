@@ -0,0 +1,42 @@
+# Generated by Django 4.2 on 2026-10-18 09:43
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def preencher_contadores(apps, schema_editor):
+    Evento = apps.get_model('eventos', 'Evento')
+    Certificado = apps.get_model('eventos', 'Certificado')
+    inscricoes = (
+        Evento.participantes.through.objects.filter(evento=models.OuterRef('pk'))
+        .values('evento').annotate(total=models.Count('*')).values('total')
+    )
+    certificados = (
+        Certificado.objects.filter(evento=models.OuterRef('pk'))
+        .values('evento').annotate(total=models.Count('*')).values('total')
+    )
+    Evento.objects.update(
+        total_participantes=Coalesce(models.Subquery(inscricoes), 0),
+        total_certificados=Coalesce(models.Subquery(certificados), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0007_certificado_sob_demanda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='total_certificados',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='total_participantes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 09:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0008_contadores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='capacidade',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
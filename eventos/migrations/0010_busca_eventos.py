@@ -0,0 +1,82 @@
+# Generated by Django 4.2 on 2026-10-18 09:48
+
+from django.db import migrations, models
+
+
+# a busca de eventos (eventos/busca.py) usa FTS5 no SQLite e GIN (texto completo + trigramas)
+# no PostgreSQL; em outros bancos nada é criado e a busca volta para o filtro simples
+SQLITE_CRIAR = [
+    '''CREATE VIRTUAL TABLE eventos_evento_fts USING fts5(
+        nome, descricao, content='eventos_evento', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )''',
+    '''CREATE TRIGGER eventos_evento_fts_insert AFTER INSERT ON eventos_evento BEGIN
+        INSERT INTO eventos_evento_fts(rowid, nome, descricao) VALUES (new.id, new.nome, new.descricao);
+    END''',
+    '''CREATE TRIGGER eventos_evento_fts_delete AFTER DELETE ON eventos_evento BEGIN
+        INSERT INTO eventos_evento_fts(eventos_evento_fts, rowid, nome, descricao) VALUES ('delete', old.id, old.nome, old.descricao);
+    END''',
+    # só quando nome ou descrição mudam, e não a cada atualização de contador
+    '''CREATE TRIGGER eventos_evento_fts_update AFTER UPDATE OF nome, descricao ON eventos_evento BEGIN
+        INSERT INTO eventos_evento_fts(eventos_evento_fts, rowid, nome, descricao) VALUES ('delete', old.id, old.nome, old.descricao);
+        INSERT INTO eventos_evento_fts(rowid, nome, descricao) VALUES (new.id, new.nome, new.descricao);
+    END''',
+    # indexa os eventos que já existiam
+    "INSERT INTO eventos_evento_fts(eventos_evento_fts) VALUES ('rebuild')",
+]
+SQLITE_REMOVER = [
+    'DROP TRIGGER IF EXISTS eventos_evento_fts_insert',
+    'DROP TRIGGER IF EXISTS eventos_evento_fts_delete',
+    'DROP TRIGGER IF EXISTS eventos_evento_fts_update',
+    'DROP TABLE IF EXISTS eventos_evento_fts',
+]
+
+POSTGRES_CRIAR = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    "CREATE INDEX IF NOT EXISTS eventos_evento_busca_gin ON eventos_evento USING GIN (to_tsvector('portuguese', nome || ' ' || descricao))",
+    'CREATE INDEX IF NOT EXISTS eventos_evento_nome_trgm ON eventos_evento USING GIN (nome gin_trgm_ops)',
+]
+POSTGRES_REMOVER = [
+    'DROP INDEX IF EXISTS eventos_evento_busca_gin',
+    'DROP INDEX IF EXISTS eventos_evento_nome_trgm',
+]
+
+
+def _sqlite_tem_fts5(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def criar_busca(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite' and _sqlite_tem_fts5(schema_editor):
+        comandos = SQLITE_CRIAR
+    elif vendor == 'postgresql':
+        comandos = POSTGRES_CRIAR
+    else:
+        return
+    for comando in comandos:
+        schema_editor.execute(comando)
+
+
+def remover_busca(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    comandos = {'sqlite': SQLITE_REMOVER, 'postgresql': POSTGRES_REMOVER}.get(vendor, [])
+    for comando in comandos:
+        schema_editor.execute(comando)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0009_evento_capacidade'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['criador', '-data_inicio', 'id'], name='evento_criador_inicio_idx'),
+        ),
+        migrations.RunPython(criar_busca, remover_busca),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 09:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0010_busca_eventos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='certificado',
+            index=models.Index(fields=['certificado'], name='certificado_arquivo_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-18 10:05
+
+from django.db import migrations, models
+import type_event.armazenamento
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0011_certificado_arquivo_idx'),
+    ]
+
+    # só o storage muda, e ele não existe no banco; como AlterField, o SQLite recriaria a
+    # tabela eventos_evento e perderia os triggers da busca (0010_busca_eventos)
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='certificado',
+                    name='certificado',
+                    field=models.ImageField(blank=True, storage=type_event.armazenamento.obter_armazenamento, upload_to='certificados'),
+                ),
+                migrations.AlterField(
+                    model_name='evento',
+                    name='logo',
+                    field=models.ImageField(storage=type_event.armazenamento.obter_armazenamento, upload_to='logos'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-18 10:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0012_armazenamento_por_conteudo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificado',
+            name='enviado_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='certificado',
+            name='erro_envio',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='certificado',
+            name='tentativas_envio',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='geracaocertificados',
+            name='enviar_email',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='certificado',
+            index=models.Index(condition=models.Q(('enviado_em__isnull', True)), fields=['evento', 'id'], name='certificado_envio_pendente_idx'),
+        ),
+    ]
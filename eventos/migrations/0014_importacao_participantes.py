@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-18 10:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0013_envio_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacaoParticipantes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('arquivo', models.FileField(blank=True, upload_to='importacoes')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluida', 'Concluída'), ('erro', 'Erro')], default='pendente', max_length=11)),
+                ('criados', models.IntegerField(default=0)),
+                ('existentes', models.IntegerField(default=0)),
+                ('inscritos', models.IntegerField(default=0)),
+                ('erro', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='eventos.evento')),
+            ],
+        ),
+    ]
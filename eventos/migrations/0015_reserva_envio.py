@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 10:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0014_importacao_participantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificado',
+            name='envio_reservado_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 16:20
+
+from importlib import import_module
+
+from django.db import migrations
+
+
+busca = import_module('eventos.migrations.0010_busca_eventos')
+
+
+def recriar_busca(apps, schema_editor):
+    # quando o SQLite recria a tabela eventos_evento (AddField/AlterField), os triggers
+    # do FTS5 somem junto; aqui eles são criados de novo e o índice é refeito do zero
+    if schema_editor.connection.vendor != 'sqlite' or not busca._sqlite_tem_fts5(schema_editor):
+        return
+    for comando in busca.SQLITE_REMOVER + busca.SQLITE_CRIAR:
+        schema_editor.execute(comando)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0015_reserva_envio'),
+    ]
+
+    operations = [
+        migrations.RunPython(recriar_busca, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2 on 2026-10-18 16:40
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+busca = import_module('eventos.migrations.0016_recriar_busca')
+
+
+def preencher_contadores(apps, schema_editor):
+    Evento = apps.get_model('eventos', 'Evento')
+    Certificado = apps.get_model('eventos', 'Certificado')
+    pendentes = (
+        Evento.participantes.through.objects.filter(evento=models.OuterRef('pk'))
+        .filter(~models.Exists(Certificado.objects.filter(
+            evento=models.OuterRef('evento'), participante=models.OuterRef('user'),
+        )))
+        .values('evento').annotate(total=models.Count('*')).values('total')
+    )
+    envio = (
+        Certificado.objects.filter(evento=models.OuterRef('pk')).values('evento')
+        .annotate(
+            enviados=models.Count('id', filter=models.Q(enviado_em__isnull=False)),
+            erros=models.Count('id', filter=models.Q(enviado_em__isnull=True, tentativas_envio__gt=0)),
+        )
+    )
+    Evento.objects.update(
+        certificados_pendentes=Coalesce(models.Subquery(pendentes), 0),
+        certificados_enviados=Coalesce(models.Subquery(envio.values('enviados')), 0),
+        envios_com_erro=Coalesce(models.Subquery(envio.values('erros')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0016_recriar_busca'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='certificados_enviados',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='certificados_pendentes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='envios_com_erro',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+        # o SQLite recria a tabela eventos_evento para os campos novos, e os triggers da busca vão junto
+        migrations.RunPython(busca.recriar_busca, migrations.RunPython.noop),
+    ]
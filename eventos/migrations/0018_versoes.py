@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0017_contadores_certificados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoEscopo',
+            fields=[
+                ('escopo', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('alterado_em', models.FloatField()),
+            ],
+        ),
+    ]
@@ -1,5 +1,9 @@
 from django.db import models
+from django.db.models.functions import Coalesce, Lower
 from django.contrib.auth.models import User
+from django.urls import reverse
+
+from type_event.armazenamento import obter_armazenamento
 
 
 class Evento(models.Model):
@@ -9,7 +13,8 @@ class Evento(models.Model):
     data_inicio = models.DateField()
     data_termino = models.DateField()
     carga_horaria = models.IntegerField()
-    logo = models.ImageField(upload_to='logos')
+    # os arquivos recebem o nome do hash do conteúdo (ver type_event/armazenamento.py)
+    logo = models.ImageField(upload_to='logos', storage=obter_armazenamento)
     participantes = models.ManyToManyField(User, related_name='evento_participante', null=True, blank=True)
 
     # paleta de cores
@@ -17,13 +22,218 @@ class Evento(models.Model):
     cor_secundaria = models.CharField(max_length=7)
     cor_fundo = models.CharField(max_length=7)
 
+    # limite de inscrições, vazio para eventos sem limite
+    capacidade = models.PositiveIntegerField(null=True, blank=True)
+
+    # contadores mantidos pelos sinais em eventos/signals.py, para as páginas não precisarem de COUNT
+    # (o comando recontar_eventos corrige qualquer diferença)
+    total_participantes = models.PositiveIntegerField(default=0, editable=False)
+    total_certificados = models.PositiveIntegerField(default=0, editable=False)
+    # situação da página de certificados: participantes ainda sem certificado e envio por e-mail
+    certificados_pendentes = models.PositiveIntegerField(default=0, editable=False)
+    certificados_enviados = models.PositiveIntegerField(default=0, editable=False)
+    envios_com_erro = models.PositiveIntegerField(default=0, editable=False)
+
+    CONTADORES = ('total_participantes', 'total_certificados', 'certificados_pendentes',
+                  'certificados_enviados', 'envios_com_erro')
+
+    class Meta:
+        indexes = [
+            # listagem do gerenciar_evento: eventos de um criador, dos mais recentes aos mais antigos
+            models.Index(fields=['criador', '-data_inicio', 'id'], name='evento_criador_inicio_idx'),
+        ]
+
     def __str__(self):
         return self.nome
 
+    def save(self, *args, **kwargs):
+        # os contadores só mudam por update() no banco; um save() completo (admin, formulário)
+        # gravaria os valores lidos antes e desfaria as atualizações feitas nesse meio tempo
+        if not self._state.adding and not args and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CONTADORES
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def contagens_reais(cls):
+        """Subqueries com o total real de participantes e de certificados de cada evento."""
+        inscricoes = (
+            cls.participantes.through.objects.filter(evento=models.OuterRef('pk'))
+            .values('evento').annotate(total=models.Count('*')).values('total')
+        )
+        certificados = (
+            Certificado.objects.filter(evento=models.OuterRef('pk'))
+            .values('evento').annotate(total=models.Count('*')).values('total')
+        )
+        # inscrições sem certificado do mesmo participante nesse evento (o anti-join do
+        # participantes_sem_certificado, para todos os eventos de uma vez)
+        pendentes = (
+            cls.participantes.through.objects.filter(evento=models.OuterRef('pk'))
+            .filter(~models.Exists(Certificado.objects.filter(
+                evento=models.OuterRef('evento'), participante=models.OuterRef('user'),
+            )))
+            .values('evento').annotate(total=models.Count('*')).values('total')
+        )
+        envio = (
+            Certificado.objects.filter(evento=models.OuterRef('pk')).values('evento')
+            .annotate(
+                enviados=models.Count('id', filter=models.Q(enviado_em__isnull=False)),
+                erros=models.Count('id', filter=models.Q(enviado_em__isnull=True, tentativas_envio__gt=0)),
+            )
+        )
+        return {
+            'total_participantes': Coalesce(models.Subquery(inscricoes), 0),
+            'total_certificados': Coalesce(models.Subquery(certificados), 0),
+            'certificados_pendentes': Coalesce(models.Subquery(pendentes), 0),
+            'certificados_enviados': Coalesce(models.Subquery(envio.values('enviados')), 0),
+            'envios_com_erro': Coalesce(models.Subquery(envio.values('erros')), 0),
+        }
+
+    @staticmethod
+    def sem_certificado(usuario_id):
+        """1 se o usuário ainda não tem certificado do evento (da linha atualizada), senão 0.
+
+        Usado nos update() de inscrição, para o contador de pendentes subir no mesmo comando.
+        """
+        certificado = Certificado.objects.filter(evento=models.OuterRef('pk'), participante_id=usuario_id)
+        return models.Case(models.When(models.Exists(certificado), then=0), default=1)
+
+    def recontar(self):
+        Evento.objects.filter(id=self.id).update(**Evento.contagens_reais())
+
+    def participantes_sem_certificado(self):
+        # anti-join: participantes do evento para os quais não existe certificado desse evento
+        certificados = Certificado.objects.filter(evento=self, participante=models.OuterRef('pk'))
+        return self.participantes.filter(~models.Exists(certificados))
+
+
+class CertificadoQuerySet(models.QuerySet):
+    def por_email(self, emails):
+        """Filtra pelos e-mails dos participantes, ignorando maiúsculas e espaços.
+
+        A comparação é feita com LOWER(email), a mesma expressão do índice
+        criado na migração usuarios/0001_email_lower_index.
+        """
+        normalizados = {email.strip().lower() for email in emails if email and email.strip()}
+        # a subconsulta encontra os usuários pelo índice do e-mail, e depois os certificados
+        # saem do índice (evento, participante), sem varrer todos os certificados do evento
+        usuarios = User.objects.alias(email_normalizado=Lower('email')).filter(email_normalizado__in=normalizados)
+        return self.filter(participante__in=usuarios.values('id'))
+
 
 class Certificado(models.Model):
-    certificado = models.ImageField(upload_to="certificados")
+    # fica vazio no modo sob demanda (CERTIFICADO_SOB_DEMANDA), quando o png não é guardado
+    certificado = models.ImageField(upload_to="certificados", blank=True, storage=obter_armazenamento)
     # todo certificado vai se de um participante
     participante = models.ForeignKey(User, on_delete=models.DO_NOTHING)
     # todo certificado vai se de um evento
     evento = models.ForeignKey(Evento, on_delete=models.DO_NOTHING)
+    # envio por e-mail (eventos/envios.py): enviado_em fica vazio até o envio dar certo,
+    # e as tentativas com erro contam até CERTIFICADO_EMAIL_TENTATIVAS
+    enviado_em = models.DateTimeField(null=True, blank=True)
+    # quem vai enviar marca a linha antes (eventos/envios.py), assim dois envios ao mesmo tempo
+    # (worker, botão, comando) não mandam o mesmo e-mail duas vezes
+    envio_reservado_em = models.DateTimeField(null=True, blank=True)
+    tentativas_envio = models.PositiveSmallIntegerField(default=0)
+    erro_envio = models.TextField(blank=True)
+
+    objects = CertificadoQuerySet.as_manager()
+
+    class Meta:
+        # um participante só pode ter um certificado por evento
+        # (a restrição também cria o índice (evento, participante) usado nas buscas)
+        constraints = [
+            models.UniqueConstraint(fields=['evento', 'participante'], name='certificado_unico_por_participante'),
+        ]
+        # a permissão dos arquivos de mídia (type_event/midia.py) procura o certificado pelo arquivo
+        indexes = [
+            models.Index(fields=['certificado'], name='certificado_arquivo_idx'),
+            # só os que ainda não foram enviados, o índice encolhe conforme os e-mails saem
+            models.Index(fields=['evento', 'id'], name='certificado_envio_pendente_idx',
+                         condition=models.Q(enviado_em__isnull=True)),
+        ]
+
+    @property
+    def url(self):
+        # no modo sob demanda não existe arquivo, então o endereço é o da view que renderiza
+        if self.certificado:
+            return self.certificado.url
+        return reverse('eventos:ver_certificado', kwargs={'id': self.id})
+
+
+class GeracaoCertificados(models.Model):
+    # cada pedido de "gerar todos os certificados" vira uma tarefa,
+    # que é processada em lotes pelo comando processar_certificados
+    PENDENTE = 'pendente'
+    PROCESSANDO = 'processando'
+    CONCLUIDA = 'concluida'
+    ERRO = 'erro'
+    STATUS_CHOICES = (
+        (PENDENTE, 'Pendente'),
+        (PROCESSANDO, 'Processando'),
+        (CONCLUIDA, 'Concluída'),
+        (ERRO, 'Erro'),
+    )
+
+    evento = models.ForeignKey(Evento, on_delete=models.CASCADE)
+    status = models.CharField(max_length=11, choices=STATUS_CHOICES, default=PENDENTE)
+    total = models.IntegerField(default=0)
+    processados = models.IntegerField(default=0)
+    erro = models.TextField(blank=True)
+    # no fim da geração, o worker também envia os certificados por e-mail
+    enviar_email = models.BooleanField(default=False)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.evento} - {self.status} ({self.processados}/{self.total})'
+
+    @property
+    def ativa(self):
+        return self.status in (self.PENDENTE, self.PROCESSANDO)
+
+    @property
+    def percentual(self):
+        if not self.total:
+            return 100 if self.status == self.CONCLUIDA else 0
+        return min(100, self.processados * 100 // self.total)
+
+
+class ImportacaoParticipantes(models.Model):
+    # cada csv enviado em participantes_evento vira uma importação na fila; o worker
+    # (processar_certificados) cria os usuários, porque o hash das senhas não cabe numa requisição
+    PENDENTE = GeracaoCertificados.PENDENTE
+    PROCESSANDO = GeracaoCertificados.PROCESSANDO
+    CONCLUIDA = GeracaoCertificados.CONCLUIDA
+    ERRO = GeracaoCertificados.ERRO
+
+    evento = models.ForeignKey(Evento, on_delete=models.CASCADE)
+    # apagado assim que é lido, porque tem as senhas; até lá só a equipe pode baixá-lo (type_event/midia.py)
+    arquivo = models.FileField(upload_to='importacoes', blank=True)
+    status = models.CharField(max_length=11, choices=GeracaoCertificados.STATUS_CHOICES, default=PENDENTE)
+    criados = models.IntegerField(default=0)
+    existentes = models.IntegerField(default=0)
+    inscritos = models.IntegerField(default=0)
+    erro = models.TextField(blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Importação {self.id} - {self.evento} - {self.status}'
+
+    @property
+    def ativa(self):
+        return self.status in (self.PENDENTE, self.PROCESSANDO)
+
+
+class VersaoEscopo(models.Model):
+    # momento (time.time()) da última alteração de um escopo, usado nos ETags da API e nas chaves
+    # do cache de meus_certificados (eventos/cache.py); fica no banco quando o cache é de cada
+    # processo (LocMemCache), para as alterações feitas pelo worker chegarem ao servidor web
+    escopo = models.CharField(max_length=100, primary_key=True)
+    alterado_em = models.FloatField()
+
+    def __str__(self):
+        return f'{self.escopo} ({self.alterado_em})'
@@ -0,0 +1,102 @@
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidar_certificados, invalidar_evento, marcar_alteracao
+from .models import Certificado, Evento
+
+
+# os contadores são atualizados no banco com F(), sem ler o valor antes,
+# assim duas inscrições ao mesmo tempo não se sobrescrevem
+
+@receiver(m2m_changed, sender=Evento.participantes.through)
+def atualizar_total_participantes(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # user.evento_participante.clear(): guarda os eventos antes de perder a relação
+        instance._eventos_limpos = list(instance.evento_participante.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if action == 'post_add' and pk_set:
+        # no post_add o pk_set só tem as relações que realmente foram inseridas; quem volta
+        # para o evento e já tinha certificado não conta como pendente
+        if reverse:
+            Evento.objects.filter(id__in=pk_set).update(
+                total_participantes=F('total_participantes') + 1,
+                certificados_pendentes=F('certificados_pendentes') + Evento.sem_certificado(instance.id),
+            )
+        else:
+            com_certificado = Certificado.objects.filter(evento_id=instance.id, participante_id__in=pk_set).count()
+            Evento.objects.filter(id=instance.id).update(
+                total_participantes=F('total_participantes') + len(pk_set),
+                certificados_pendentes=F('certificados_pendentes') + len(pk_set) - com_certificado,
+            )
+        return
+
+    # remoções são raras e o pk_set pode ter ids que nem estavam inscritos,
+    # então o total dos eventos afetados é recontado
+    if reverse:
+        ids = pk_set if action == 'post_remove' else getattr(instance, '_eventos_limpos', [])
+    else:
+        ids = [instance.id]
+    Evento.objects.filter(id__in=ids).update(**Evento.contagens_reais())
+
+
+@receiver(post_save, sender=Certificado)
+def certificado_criado(sender, instance, created, **kwargs):
+    if created:
+        contadores = {'total_certificados': F('total_certificados') + 1}
+        # o certificado só deixa alguém pendente de fora se a pessoa está inscrita
+        if Evento.participantes.through.objects.filter(
+            evento_id=instance.evento_id, user_id=instance.participante_id
+        ).exists():
+            contadores['certificados_pendentes'] = Greatest(F('certificados_pendentes') - 1, 0)
+        Evento.objects.filter(id=instance.evento_id).update(**contadores)
+        invalidar_certificados(instance.evento_id, [instance.participante_id])
+
+
+@receiver(post_delete, sender=Certificado)
+def certificado_apagado(sender, instance, **kwargs):
+    # o certificado apagado pode ter sido enviado ou ter erro de envio, então o evento é recontado
+    Evento.objects.filter(id=instance.evento_id).update(**Evento.contagens_reais())
+    invalidar_certificados(instance.evento_id, [instance.participante_id])
+
+
+# o cache é invalidado depois que os contadores já foram atualizados
+
+@receiver(m2m_changed, sender=Evento.participantes.through)
+def invalidar_cache_participantes(sender, instance, action, reverse, pk_set, **kwargs):
+    # a página de inscrição mostra vagas e a situação de cada usuário
+    if action == 'pre_clear':
+        if reverse:
+            instance._eventos_cache = list(instance.evento_participante.values_list('id', flat=True))
+        else:
+            instance._usuarios_cache = list(instance.participantes.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        eventos = pk_set if pk_set is not None else getattr(instance, '_eventos_cache', [])
+        for evento_id in eventos:
+            invalidar_evento(evento_id, [instance.id])
+    else:
+        usuarios = pk_set if pk_set is not None else getattr(instance, '_usuarios_cache', [])
+        invalidar_evento(instance.id, usuarios)
+
+
+@receiver(post_save, sender=Evento)
+@receiver(post_delete, sender=Evento)
+def invalidar_cache_evento(sender, instance, **kwargs):
+    invalidar_evento(instance.id)
+    marcar_alteracao('edicao_eventos')
+
+
+@receiver(post_save, sender=User)
+def usuario_alterado(sender, instance, update_fields=None, **kwargs):
+    # nome e e-mail aparecem nas listas da API; o login só grava o last_login e não conta
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    marcar_alteracao('usuarios')
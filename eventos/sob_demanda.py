@@ -0,0 +1,70 @@
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import caches
+
+from type_event.desempenho import cronometrar
+
+from .certificados import PATH_FONTE, PATH_TEMPLATE, desenhar_certificado
+from .imagens import redimensionar
+
+
+# alias do cache (settings.CACHES) onde ficam os certificados renderizados sob demanda,
+# o limite de tamanho (MAX_ENTRIES) é configurado no próprio cache
+CACHE = getattr(settings, 'CERTIFICADO_CACHE', 'certificados')
+
+_versao_template = None
+
+
+def sob_demanda():
+    """No modo sob demanda, "gerar" só grava as linhas e o png é feito quando alguém abre."""
+    return getattr(settings, 'CERTIFICADO_SOB_DEMANDA', False)
+
+
+def versao_template():
+    # trocar a imagem de fundo ou a fonte muda a versão e, com ela, todas as chaves de cache e ETags
+    global _versao_template
+    if _versao_template is None:
+        digest = hashlib.sha1()
+        for path in (PATH_TEMPLATE, PATH_FONTE):
+            with open(path, 'rb') as arquivo:
+                digest.update(arquivo.read())
+        _versao_template = digest.hexdigest()[:12]
+    return _versao_template
+
+
+def chave_certificado(evento, participante_id, username, largura=None):
+    """Chave de cache (evento, participante, versão do template) e o ETag correspondente."""
+    # o conteúdo desenhado também entra no ETag, assim renomear o evento invalida o certificado
+    conteudo = f'{username}|{evento.nome}|{evento.carga_horaria}|{largura or 0}'
+    etag = hashlib.sha1(f'{versao_template()}|{conteudo}'.encode('utf-8')).hexdigest()[:20]
+    chave = f'certificado:{evento.id}:{participante_id}:{versao_template()}:{largura or 0}:{etag}'
+    return chave, f'"{etag}"'
+
+
+@cronometrar('imagem')
+def renderizar_sob_demanda(evento, username, largura=None):
+    img = desenhar_certificado(username, evento.nome, evento.carga_horaria)
+    if largura:
+        return redimensionar(img, (largura,))[largura]
+    output = BytesIO()
+    img.save(output, format="PNG")
+    return output.getvalue()
+
+
+def obter_certificado(evento, participante_id, username, largura=None, cachear=True):
+    """Devolve (bytes, etag) do certificado, renderizando só se não estiver no cache.
+
+    cachear=False é para quem percorre o evento inteiro (zip, envio por e-mail): usa o
+    que já estiver no cache, mas não guarda o que renderizou, senão tiraria do cache
+    os certificados que estão sendo abertos.
+    """
+    chave, etag = chave_certificado(evento, participante_id, username, largura)
+    cache = caches[CACHE]
+    conteudo = cache.get(chave)
+    if conteudo is None:
+        conteudo = renderizar_sob_demanda(evento, username, largura)
+        if cachear:
+            cache.set(chave, conteudo, timeout=None)
+    return conteudo, etag
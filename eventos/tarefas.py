@@ -0,0 +1,141 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import invalidar_certificados
+from .certificados import renderizar_lote
+from .envios import enviar_certificados
+from .imagens import salvar_derivados
+from .sob_demanda import sob_demanda
+from .models import Certificado, GeracaoCertificados
+
+
+# quantos participantes são processados (e gravados) de cada vez
+TAMANHO_LOTE = getattr(settings, 'CERTIFICADO_TAMANHO_LOTE', 200)
+# uma tarefa "processando" que não avança há esse tempo é considerada abandonada
+# (o worker caiu no meio) e pode ser assumida por outro worker
+EXPIRACAO = timedelta(seconds=getattr(settings, 'CERTIFICADO_EXPIRACAO_TAREFA', 300))
+
+
+def agendar_geracao(evento, enviar_email=False):
+    """Cria (ou reaproveita) a tarefa de geração de certificados de um evento.
+
+    Com enviar_email, o worker também manda os certificados por e-mail no fim.
+    """
+    tarefa = GeracaoCertificados.objects.filter(evento=evento).order_by('-id').first()
+    if tarefa and tarefa.ativa:
+        if enviar_email and not tarefa.enviar_email:
+            GeracaoCertificados.objects.filter(id=tarefa.id).update(enviar_email=True)
+            tarefa.enviar_email = True
+        return tarefa
+    if tarefa and tarefa.status == GeracaoCertificados.ERRO:
+        # volta para a fila, só os participantes ainda sem certificado serão processados,
+        # então o progresso recomeça a contar a partir deles
+        tarefa.status = GeracaoCertificados.PENDENTE
+        tarefa.erro = ''
+        tarefa.total = evento.participantes_sem_certificado().count()
+        tarefa.processados = 0
+        tarefa.enviar_email = tarefa.enviar_email or enviar_email
+        tarefa.save()
+        return tarefa
+    return GeracaoCertificados.objects.create(evento=evento, enviar_email=enviar_email)
+
+
+def reservar_tarefa(modelo=GeracaoCertificados):
+    """Pega a próxima tarefa da fila, garantindo que só um worker fique com ela.
+
+    A fila é a tabela do modelo: GeracaoCertificados ou ImportacaoParticipantes.
+    """
+    limite = timezone.now() - EXPIRACAO
+    candidatas = modelo.objects.filter(
+        Q(status=modelo.PENDENTE) |
+        Q(status=modelo.PROCESSANDO, atualizado_em__lt=limite)
+    ).order_by('id')
+
+    for tarefa in candidatas[:10]:
+        # o update só altera a linha se ninguém mexeu nela desde a leitura,
+        # se outro worker chegou primeiro o retorno é 0 e tentamos a próxima
+        reservada = modelo.objects.filter(
+            id=tarefa.id, status=tarefa.status, atualizado_em=tarefa.atualizado_em
+        ).update(status=modelo.PROCESSANDO, atualizado_em=timezone.now())
+        if reservada:
+            tarefa.refresh_from_db()
+            return tarefa
+    return None
+
+
+def processar_lote(tarefa, tamanho=TAMANHO_LOTE):
+    """Gera os certificados do próximo lote de participantes sem certificado.
+
+    Devolve quantos participantes foram processados (0 quando acabou).
+    """
+    evento = tarefa.evento
+    # a cada lote a busca é refeita, então quem já tem certificado nunca é renderizado de novo
+    # e uma tarefa interrompida continua exatamente de onde parou
+    participantes = list(
+        evento.participantes_sem_certificado().order_by('id').only('id', 'username')[:tamanho]
+    )
+    if not participantes:
+        return 0
+
+    certificados = []
+    todas_miniaturas = []
+    if sob_demanda():
+        # só as linhas são gravadas, o png é renderizado quando o certificado for aberto
+        certificados = [Certificado(participante=participante, evento=evento) for participante in participantes]
+        dados = []
+    else:
+        dados = [(participante.username, evento.nome, evento.carga_horaria) for participante in participantes]
+
+    for participante, (png, miniaturas) in zip(participantes, renderizar_lote(dados)):
+        certificados.append(Certificado(
+            # o nome final vem do hash do png (type_event/armazenamento.py), renders iguais viram um arquivo só
+            certificado=ContentFile(png, name='certificado.png'),
+            participante=participante,
+            evento=evento,
+        ))
+        todas_miniaturas.append(miniaturas)
+
+    with transaction.atomic():
+        # ignore_conflicts: se outra geração gravou o mesmo participante nesse meio tempo,
+        # a restrição única (evento, participante) descarta a linha repetida
+        Certificado.objects.bulk_create(certificados, batch_size=tamanho, ignore_conflicts=True)
+        tarefa.processados += len(participantes)
+        tarefa.save(update_fields=['processados', 'atualizado_em'])
+        # o bulk_create não dispara sinais, então os contadores (certificados e pendentes) são recontados aqui
+        evento.recontar()
+        invalidar_certificados(evento.id, [p.id for p in participantes], depois_do_commit=True)
+
+    # o nome final do png só é conhecido depois que o arquivo é gravado no storage
+    for certificado, miniaturas in zip(certificados, todas_miniaturas):
+        salvar_derivados(certificado.certificado.name, miniaturas)
+    return len(participantes)
+
+
+def executar_tarefa(tarefa, tamanho=TAMANHO_LOTE):
+    # recontado sempre: uma tarefa assumida depois que o worker caiu continua só com quem
+    # ainda não tem certificado, e o progresso é desses
+    tarefa.total = tarefa.evento.participantes_sem_certificado().count()
+    tarefa.processados = 0
+    tarefa.save(update_fields=['total', 'processados', 'atualizado_em'])
+    try:
+        while processar_lote(tarefa, tamanho):
+            pass
+    except Exception as erro:
+        tarefa.status = GeracaoCertificados.ERRO
+        tarefa.erro = repr(erro)
+        tarefa.save(update_fields=['status', 'erro', 'atualizado_em'])
+        raise
+    tarefa.status = GeracaoCertificados.CONCLUIDA
+    tarefa.save(update_fields=['status', 'atualizado_em'])
+
+    # o envio fica depois da conclusão: ele pode demorar mais que a EXPIRACAO (por causa do
+    # limite de e-mails por segundo) e a tarefa não pode ser assumida por outro worker.
+    # Se o worker cair no meio, o comando enviar_certificados continua de onde parou.
+    # O pedido de envio pode ter chegado com a tarefa já em andamento, por isso é lido do banco
+    if GeracaoCertificados.objects.filter(id=tarefa.id, enviar_email=True).exists():
+        return enviar_certificados(tarefa.evento)
@@ -0,0 +1,37 @@
+from django import template
+from django.core.files.storage import default_storage
+
+from eventos.imagens import LARGURAS, derivados_existentes, nome_derivado, url_imagem
+
+
+register = template.Library()
+
+
+def _nome(arquivo):
+    # aceita tanto o campo de imagem (FieldFile) quanto o nome do arquivo
+    return getattr(arquivo, 'name', arquivo)
+
+
+@register.filter
+def miniatura(arquivo, largura):
+    """URL do derivado de uma imagem na largura pedida: {{ evento.logo|miniatura:160 }}
+
+    Sem o derivado (imagem antiga, geração que falhou), devolve a URL do original.
+    """
+    if not _nome(arquivo):
+        return ''
+    return url_imagem(_nome(arquivo), int(largura))
+
+
+@register.filter
+def srcset(arquivo, tipo):
+    """Valor do atributo srcset com os derivados que existem: {{ evento.logo|srcset:'logo' }}
+
+    Sem nenhum derivado fica vazio, e o navegador usa o src.
+    """
+    if not _nome(arquivo):
+        return ''
+    return ', '.join(
+        f'{default_storage.url(nome_derivado(_nome(arquivo), largura))} {largura}w'
+        for largura in derivados_existentes(_nome(arquivo), LARGURAS[tipo])
+    )
@@ -1,3 +1,1177 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import os
+import smtplib
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from PIL import Image
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import OperationalError, connection, connections, router
+from django.http import Http404, HttpResponse
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.files.storage import default_storage
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.shortcuts import render
+from django.urls import reverse
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+
+from type_event.api import resposta_condicional
+from type_event.armazenamento import armazenamento_por_conteudo
+from type_event.desempenho import DesempenhoMiddleware
+from type_event.midia import servir_midia
+from type_event import replicas
+from type_event.paginacao import CursorPaginator
+
+from . import views_async
+from .cache import TEMPO
+from .busca import buscar_ids
+from .certificados import MINIMO_PARALELO, renderizar_lote
+from .envios import enviar_certificados
+from .exportacao import comprimir_gzip, gerar_linhas_csv, gerar_zip
+from .imagens import gerar_derivados, nome_derivado
+from .importacao import importar_participantes
+from .inscricoes import INSCRITO, JA_INSCRITO, LOTADO, inscrever
+from .models import Certificado, Evento, GeracaoCertificados, ImportacaoParticipantes, VersaoEscopo
+from .sob_demanda import CACHE, chave_certificado
+from .tarefas import EXPIRACAO, agendar_geracao, executar_tarefa, processar_lote, reservar_tarefa
+from .templatetags.imagens import miniatura, srcset
+
+
+def criar_evento(**kwargs):
+    dados = dict(
+        nome='Evento', descricao='Descrição', data_inicio='2023-04-10', data_termino='2023-04-14',
+        carga_horaria=8, logo='logos/logo.png', cor_principal='#000000', cor_secundaria='#000000',
+        cor_fundo='#000000',
+    )
+    dados.update(kwargs)
+    return Evento.objects.create(**dados)
+
+
+def contadores(evento):
+    """(contadores guardados no evento, contagens reais) para comparar nos testes."""
+    reais = {f'real_{campo}': valor for campo, valor in Evento.contagens_reais().items()}
+    linha = Evento.objects.filter(id=evento.id).values(*Evento.CONTADORES, **reais).get()
+    return {campo: linha[campo] for campo in Evento.CONTADORES}, {campo: linha[f'real_{campo}'] for campo in Evento.CONTADORES}
+
+
+class RenderizacaoTestCase(SimpleTestCase):
+    def test_pool_de_processos_gera_os_mesmos_bytes(self):
+        dados = [(f'participante{i}', 'Evento', 8) for i in range(MINIMO_PARALELO)]
+        em_serie = list(renderizar_lote(dados, workers=1))
+        em_paralelo = list(renderizar_lote(dados, workers=2))
+        self.assertEqual(len(em_paralelo), MINIMO_PARALELO)
+        # mesma ordem e mesmo conteúdo (png e miniaturas) nos dois caminhos
+        self.assertEqual(em_paralelo, em_serie)
+
+
+@override_settings(CERTIFICADO_SOB_DEMANDA=True)
+class GeracaoTestCase(TestCase):
+    # no modo sob demanda só as linhas são gravadas, sem renderizar os png
+    def setUp(self):
+        self.criador = User.objects.create_user('criador', 'criador@email.com', 'senha')
+        self.evento = criar_evento(criador=self.criador)
+        self.participantes = [User.objects.create_user(f'p{i}', f'p{i}@email.com', 'senha') for i in range(3)]
+        self.evento.participantes.add(*self.participantes)
+
+    def test_tarefa_abandonada_e_retomada(self):
+        tarefa = agendar_geracao(self.evento)
+        # o worker pegou a tarefa, gravou um certificado e caiu
+        Certificado.objects.create(evento=self.evento, participante=self.participantes[0])
+        GeracaoCertificados.objects.filter(id=tarefa.id).update(
+            status=GeracaoCertificados.PROCESSANDO, total=3, processados=1,
+            atualizado_em=timezone.now() - EXPIRACAO - timedelta(seconds=1),
+        )
+
+        reservada = reservar_tarefa()
+        self.assertEqual(reservada.id, tarefa.id)
+        self.assertIsNone(reservar_tarefa())
+        executar_tarefa(reservada)
+
+        reservada.refresh_from_db()
+        self.assertEqual(reservada.status, GeracaoCertificados.CONCLUIDA)
+        self.assertEqual((reservada.processados, reservada.total), (2, 2))
+        self.assertEqual(Certificado.objects.filter(evento=self.evento).count(), 3)
+
+    def test_tarefa_em_andamento_nao_e_assumida(self):
+        tarefa = agendar_geracao(self.evento)
+        GeracaoCertificados.objects.filter(id=tarefa.id).update(status=GeracaoCertificados.PROCESSANDO)
+        self.assertIsNone(reservar_tarefa())
+
+    def test_tarefa_com_erro_volta_com_o_progresso_recontado(self):
+        tarefa = agendar_geracao(self.evento)
+        Certificado.objects.create(evento=self.evento, participante=self.participantes[0])
+        GeracaoCertificados.objects.filter(id=tarefa.id).update(
+            status=GeracaoCertificados.ERRO, total=3, processados=3, erro='falhou',
+        )
+
+        tarefa = agendar_geracao(self.evento)
+        self.assertEqual(tarefa.status, GeracaoCertificados.PENDENTE)
+        self.assertEqual((tarefa.processados, tarefa.total, tarefa.erro), (0, 2, ''))
+
+    def test_status_em_json(self):
+        self.client.force_login(self.criador)
+        url = reverse('eventos:status_certificados', args=[self.evento.id])
+        self.assertEqual(self.client.get(url).json(), {'status': None})
+
+        executar_tarefa(agendar_geracao(self.evento))
+        self.assertEqual(self.client.get(url).json(), {
+            'status': 'concluida', 'total': 3, 'processados': 3, 'percentual': 100, 'erro': '',
+        })
+        # só o criador do evento vê o progresso
+        self.client.force_login(self.participantes[0])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class GeracaoIncrementalTestCase(TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        configuracao = override_settings(MEDIA_ROOT=pasta.name, CERTIFICADO_SOB_DEMANDA=False)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def test_processar_lote_duas_vezes_nao_duplica(self):
+        evento = criar_evento()
+        participantes = [User.objects.create_user(f'p{i}', f'p{i}@email.com', 'senha') for i in range(2)]
+        evento.participantes.add(*participantes)
+        tarefa = GeracaoCertificados.objects.create(evento=evento)
+
+        self.assertEqual(processar_lote(tarefa), 2)
+        # a segunda passada só procura quem ainda não tem certificado: ninguém
+        self.assertEqual(processar_lote(tarefa), 0)
+        evento.refresh_from_db()
+        self.assertEqual(Certificado.objects.filter(evento=evento).count(), 2)
+        self.assertEqual(evento.total_certificados, 2)
+        self.assertFalse(evento.participantes_sem_certificado().exists())
+
+
+class ExportacaoTestCase(TestCase):
+    def setUp(self):
+        self.criador = User.objects.create_user('criador', 'criador@email.com', 'senha')
+        self.evento = criar_evento(criador=self.criador)
+        self.evento.participantes.add(*[
+            User.objects.create_user(f'p{i}', f'p{i}@email.com', 'senha') for i in range(5)
+        ])
+
+    @mock.patch('eventos.exportacao.LINHAS_POR_BLOCO', 2)
+    def test_csv_em_blocos_e_gzip(self):
+        blocos = list(gerar_linhas_csv(self.evento.participantes.all(), ('username', 'email')))
+        # 5 linhas em blocos de 2
+        self.assertEqual(len(blocos), 3)
+        texto = gzip.decompress(b''.join(comprimir_gzip(iter(blocos)))).decode('utf-8')
+        linhas = sorted(csv.reader(StringIO(texto), delimiter=';'))
+        self.assertEqual(linhas, [[f'p{i}', f'p{i}@email.com'] for i in range(5)])
+
+    def test_view_gzip(self):
+        self.client.force_login(self.criador)
+        response = self.client.get(reverse('eventos:gerar_csv', args=[self.evento.id]), {'gzip': 1, 'colunas': 'username'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        texto = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8')
+        self.assertEqual(sorted(texto.split()), [f'p{i}' for i in range(5)])
+
+
+class ZipTestCase(SimpleTestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        configuracao = override_settings(MEDIA_ROOT=pasta.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def test_entradas_e_compressao(self):
+        guardado = default_storage.save('certificados/a.png', ContentFile(b'png do storage' * 1000))
+        arquivos = [
+            ('a.png', guardado),
+            ('b.png', b'png renderizado'),
+            ('apagado.png', 'certificados/nao_existe.png'),
+            ('leia.txt', b'texto ' * 1000),
+        ]
+        conteudo = b''.join(gerar_zip(arquivos, tamanho_bloco=1024))
+
+        with zipfile.ZipFile(BytesIO(conteudo)) as arquivo_zip:
+            self.assertIsNone(arquivo_zip.testzip())
+            # o arquivo que sumiu do storage fica de fora, o resto continua
+            self.assertEqual(arquivo_zip.namelist(), ['a.png', 'b.png', 'leia.txt'])
+            self.assertEqual(arquivo_zip.read('a.png'), b'png do storage' * 1000)
+            self.assertEqual(arquivo_zip.read('b.png'), b'png renderizado')
+            tipos = {info.filename: info.compress_type for info in arquivo_zip.infolist()}
+        self.assertEqual(tipos, {'a.png': zipfile.ZIP_STORED, 'b.png': zipfile.ZIP_STORED,
+                                 'leia.txt': zipfile.ZIP_DEFLATED})
+
+
+class InscricaoTestCase(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('participante', 'participante@email.com', 'senha')
+
+    def test_inscricao_atualiza_contador(self):
+        evento = criar_evento()
+        self.assertEqual(inscrever(evento.id, self.usuario.id), INSCRITO)
+        evento.refresh_from_db()
+        self.assertEqual(evento.total_participantes, 1)
+        self.assertTrue(evento.participantes.filter(id=self.usuario.id).exists())
+
+    def test_inscricao_repetida_nao_conta_duas_vezes(self):
+        evento = criar_evento()
+        inscrever(evento.id, self.usuario.id)
+        self.assertEqual(inscrever(evento.id, self.usuario.id), JA_INSCRITO)
+        evento.refresh_from_db()
+        self.assertEqual(evento.total_participantes, 1)
+
+    def test_evento_lotado(self):
+        evento = criar_evento(capacidade=1)
+        outro = User.objects.create_user('outro', 'outro@email.com', 'senha')
+        inscrever(evento.id, self.usuario.id)
+        self.assertEqual(inscrever(evento.id, outro.id), LOTADO)
+        self.assertEqual(inscrever(evento.id, self.usuario.id), JA_INSCRITO)
+        self.assertEqual(evento.participantes.count(), 1)
+
+    def test_fragmentos_usam_o_tempo_do_cache_de_eventos(self):
+        evento = criar_evento()
+        cache.clear()
+        self.client.force_login(self.usuario)
+        response = self.client.get(reverse('eventos:inscrever_evento', args=[evento.id]))
+        self.assertEqual(response.context['cache_eventos_tempo'], TEMPO)
+        self.assertIsNotNone(cache.get(make_template_fragment_key('evento_inscricao', [evento.id])))
+
+    def test_pendentes_ignoram_certificado_de_quem_saiu(self):
+        criador = User.objects.create_user('criador', 'criador@email.com', 'senha')
+        evento = criar_evento(criador=criador)
+        outro = User.objects.create_user('outro', 'outro@email.com', 'senha')
+        inscrever(evento.id, self.usuario.id)
+        inscrever(evento.id, outro.id)
+        Certificado.objects.create(evento=evento, participante=self.usuario)
+        # o participante com certificado sai: os contadores ficam 1 e 1, mas o outro continua sem certificado
+        evento.participantes.remove(self.usuario)
+        evento.recontar()
+
+        self.client.force_login(criador)
+        response = self.client.get(reverse('eventos:certificados_evento', args=[evento.id]))
+        self.assertEqual(response.context['qtd_certificados'], 1)
+        self.assertContains(response, reverse('eventos:gerar_certificado', args=[evento.id]))
+
+
+    def test_contadores_acompanham_inscricoes_e_certificados(self):
+        criador = User.objects.create_user('criador', 'criador@email.com', 'senha')
+        evento = criar_evento(criador=criador)
+        outros = [User.objects.create_user(f'p{i}', f'p{i}@email.com', 'senha') for i in range(3)]
+        inscrever(evento.id, self.usuario.id)
+        evento.participantes.add(outros[0], outros[1])
+        outros[2].evento_participante.add(evento)
+        Certificado.objects.create(evento=evento, participante=self.usuario)
+        # quem sai e volta já com certificado não fica pendente de novo
+        evento.participantes.remove(self.usuario)
+        inscrever(evento.id, self.usuario.id)
+        Certificado.objects.create(evento=evento, participante=outros[0])
+        with override_settings(CERTIFICADO_SOB_DEMANDA=True):
+            processar_lote(GeracaoCertificados.objects.create(evento=evento))
+
+        guardados, reais = contadores(evento)
+        self.assertEqual(guardados, reais)
+        self.assertEqual((guardados['total_participantes'], guardados['certificados_pendentes']), (4, 0))
+
+    def test_pagina_de_certificados_nao_conta_linhas(self):
+        criador = User.objects.create_user('criador', 'criador@email.com', 'senha')
+        evento = criar_evento(criador=criador)
+        inscrever(evento.id, self.usuario.id)
+
+        self.client.force_login(criador)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('eventos:certificados_evento', args=[evento.id]))
+        self.assertEqual(response.context['qtd_certificados'], 1)
+        self.assertFalse([c['sql'] for c in consultas.captured_queries if 'COUNT(' in c['sql'].upper()])
+
+    def test_save_completo_nao_sobrescreve_contadores(self):
+        evento = criar_evento()
+        desatualizado = Evento.objects.get(id=evento.id)
+        inscrever(evento.id, self.usuario.id)
+        # como o admin: grava o objeto lido antes da inscrição
+        desatualizado.nome = 'Outro nome'
+        desatualizado.save()
+
+        evento.refresh_from_db()
+        self.assertEqual((evento.nome, evento.total_participantes, evento.certificados_pendentes), ('Outro nome', 1, 1))
+
+
+class ProcurarCertificadosTestCase(TestCase):
+    def setUp(self):
+        self.criador = User.objects.create_user('criador', 'criador@email.com', 'senha')
+        self.evento = criar_evento(criador=self.criador)
+        self.ana = User.objects.create_user('ana', 'Ana@Email.com', 'senha')
+        self.bia = User.objects.create_user('bia', 'bia@email.com', 'senha')
+        self.com_arquivo = Certificado.objects.create(
+            evento=self.evento, participante=self.ana, certificado='certificados/ana.png',
+        )
+        self.sob_demanda = Certificado.objects.create(evento=self.evento, participante=self.bia)
+        self.client.force_login(self.criador)
+        self.url = reverse('eventos:procurar_certificados', args=[self.evento.id])
+
+    def test_varios_emails_sem_diferenciar_maiusculas(self):
+        armazenamento = Certificado._meta.get_field('certificado').storage
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(self.url, {'emails': ' ANA@email.com\nBia@Email.com; ninguem@email.com'})
+        self.assertEqual(response.json()['certificados'], {
+            'ana@email.com': armazenamento.url('certificados/ana.png'),
+            'bia@email.com': reverse('eventos:ver_certificado', kwargs={'id': self.sob_demanda.id}),
+            'ninguem@email.com': None,
+        })
+        # uma consulta só para todos os e-mails
+        self.assertEqual(len([c for c in consultas.captured_queries if 'eventos_certificado' in c['sql']]), 1)
+
+    def test_json_e_url_pelo_storage_do_campo(self):
+        # o endereço vem do storage do campo certificado, não do default_storage
+        with mock.patch.object(Certificado._meta.get_field('certificado').storage, 'url', lambda nome: f'/cdn/{nome}'):
+            response = self.client.post(self.url, {'emails': ['ana@EMAIL.com']}, content_type='application/json')
+        self.assertEqual(response.json()['certificados'], {'ana@email.com': '/cdn/certificados/ana.png'})
+
+
+class CursorPaginatorTestCase(TestCase):
+    def setUp(self):
+        # datas repetidas para testar o desempate pelo id
+        for i in range(7):
+            criar_evento(nome=f'Evento {i}', data_inicio=f'2023-04-{10 + i // 2}')
+
+    def _percorrer(self, paginator):
+        paginas = [paginator.pagina()]
+        while paginas[-1].has_next:
+            paginas.append(paginator.pagina(paginas[-1].proximo))
+        return paginas
+
+    def test_percorre_todos_sem_repetir(self):
+        paginator = CursorPaginator(Evento.objects.all(), ordenacao=('-data_inicio', 'id'), por_pagina=3)
+        paginas = self._percorrer(paginator)
+        ids = [evento.id for pagina in paginas for evento in pagina]
+        esperado = list(Evento.objects.order_by('-data_inicio', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, esperado)
+        self.assertEqual([len(pagina) for pagina in paginas], [3, 3, 1])
+        self.assertFalse(paginas[0].has_previous)
+
+    def test_volta_para_a_pagina_anterior(self):
+        paginator = CursorPaginator(Evento.objects.all(), ordenacao=('-data_inicio', 'id'), por_pagina=3)
+        paginas = self._percorrer(paginator)
+        anterior = paginator.pagina(paginas[2].anterior)
+        self.assertEqual([e.id for e in anterior], [e.id for e in paginas[1]])
+        primeira = paginator.pagina(anterior.anterior)
+        self.assertEqual([e.id for e in primeira], [e.id for e in paginas[0]])
+        self.assertFalse(primeira.has_previous)
+
+    def test_total_so_quando_pedido(self):
+        paginator = CursorPaginator(Evento.objects.all(), por_pagina=3)
+        self.assertIsNone(paginator.pagina().total)
+        self.assertEqual(paginator.pagina(contar=True).total, 7)
+
+    async def test_apagina_igual_a_pagina(self):
+        paginator = CursorPaginator(Evento.objects.all(), ordenacao=('-data_inicio', 'id'), por_pagina=3)
+        primeira = await paginator.apagina(contar=True)
+        segunda = await paginator.apagina(primeira.proximo)
+        esperado = await sync_to_async(paginator.pagina)(primeira.proximo)
+        self.assertEqual(primeira.total, 7)
+        self.assertEqual([e.id for e in segunda], [e.id for e in esperado])
+        self.assertEqual((segunda.proximo, segunda.anterior), (esperado.proximo, esperado.anterior))
+
+
+class BuscaTestCase(TestCase):
+    def setUp(self):
+        self.criador = User.objects.create_user('criador', password='senha')
+
+    def test_evento_criado_depois_das_migracoes_entra_no_indice(self):
+        # as migrações que recriam a tabela eventos_evento no SQLite não podem perder os triggers
+        evento = criar_evento(criador=self.criador, nome='Workshop de Python')
+        self.assertEqual(buscar_ids('python', self.criador.id, 10), [evento.id])
+
+    def _buscar(self, nome):
+        self.client.force_login(self.criador)
+        response = self.client.get(reverse('eventos:gerenciar_evento'), {'nome': nome})
+        return [evento.id for evento in response.context['eventos']]
+
+    def test_busca_por_palavra_e_por_prefixo(self):
+        python = criar_evento(criador=self.criador, nome='Workshop de Python', descricao='Introdução à linguagem')
+        criar_evento(criador=self.criador, nome='Encontro de Java')
+        # eventos de outro criador nunca aparecem
+        outro = User.objects.create_user('outro', password='senha')
+        criar_evento(criador=outro, nome='Python avançado')
+
+        self.assertEqual(self._buscar('python'), [python.id])
+        self.assertEqual(self._buscar('Pyth'), [python.id])
+        # a descrição também entra no índice, sem acentos
+        self.assertEqual(self._buscar('introducao'), [python.id])
+        self.assertEqual(self._buscar('ruby'), [])
+
+    def test_evento_editado_e_apagado_atualiza_o_indice(self):
+        evento = criar_evento(criador=self.criador, nome='Workshop de Python')
+        evento.nome = 'Workshop de Rust'
+        evento.save()
+
+        self.assertEqual(self._buscar('python'), [])
+        self.assertEqual(self._buscar('rust'), [evento.id])
+        # só os contadores mudando não mexem no índice
+        inscrever(evento.id, self.criador.id)
+        self.assertEqual(self._buscar('rust'), [evento.id])
+
+        evento.delete()
+        self.assertEqual(self._buscar('rust'), [])
+
+
+class ViewsAsyncTestCase(TestCase):
+    def setUp(self):
+        self.criador = User.objects.create_user('criador', 'criador@email.com', 'senha')
+        self.evento = criar_evento(criador=self.criador)
+        self.factory = AsyncRequestFactory()
+
+    async def test_participantes_evento(self):
+        request = self.factory.get(f'/eventos/participantes_evento/{self.evento.id}/')
+        request.user = self.criador
+        response = await views_async.participantes_evento(request, id=self.evento.id)
+        self.assertEqual(response.status_code, 200)
+
+    async def test_participantes_evento_de_outro_usuario(self):
+        outro = await User.objects.acreate(username='outro', email='outro@email.com')
+        request = self.factory.get(f'/eventos/participantes_evento/{self.evento.id}/')
+        request.user = outro
+        with self.assertRaises(Http404):
+            await views_async.participantes_evento(request, id=self.evento.id)
+
+    async def test_anonimo_vai_para_o_login_como_nas_views_sincronas(self):
+        for nome in ('participantes_evento', 'procurar_certificado'):
+            url = reverse(f'eventos:{nome}', kwargs={'id': self.evento.id})
+            request = self.factory.post(url) if nome == 'procurar_certificado' else self.factory.get(url)
+            request.user = AnonymousUser()
+            with self.subTest(nome=nome):
+                response = await getattr(views_async, nome)(request, id=self.evento.id)
+                self.assertEqual(response.status_code, 302)
+                self.assertTrue(response.url.startswith(reverse(settings.LOGIN_URL)))
+                # a síncrona responde igual
+                sincrona = await sync_to_async(self.client.generic)(request.method, url)
+                self.assertEqual(sincrona.status_code, 302)
+                self.assertEqual(sincrona.url, response.url)
+
+
+class ConexaoSqliteTestCase(TestCase):
+    def test_pragmas_aplicados(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('só para SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+
+    def test_replica_somente_leitura_conecta(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('só para SQLite')
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        caminho = os.path.join(pasta.name, 'replica.sqlite3')
+        # cópia sem WAL, aberta só para leitura como as de DB_REPLICAS
+        with sqlite3.connect(caminho) as copia:
+            copia.execute('CREATE TABLE t (x)')
+        copia.close()
+        configuracao = dict(settings.DATABASES['default'], NAME=f'file:{caminho}?mode=ro')
+        replica = connections['default'].__class__(configuracao, alias='replica1')
+        self.addCleanup(replica.close)
+
+        with replica.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'delete')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+
+
+class SeedBenchmarkTestCase(TestCase):
+    def test_cria_dados_com_contadores_corretos(self):
+        call_command('seed_benchmark', usuarios=50, eventos=5, criadores=2, inscricoes=10,
+                     participantes_certificados=5, stdout=StringIO())
+        self.assertEqual(User.objects.filter(username__startswith='bench_').count(), 52)
+        self.assertEqual(Evento.objects.count(), 6)
+        for evento in Evento.objects.all():
+            self.assertEqual(evento.total_participantes, evento.participantes.count())
+            self.assertEqual(evento.total_certificados, evento.certificado_set.count())
+
+        call_command('seed_benchmark', limpar=True, stdout=StringIO())
+        self.assertFalse(User.objects.filter(username__startswith='bench_').exists())
+        self.assertFalse(Evento.objects.exists())
+
+
+class DesempenhoMiddlewareTestCase(TestCase):
+    def setUp(self):
+        criador = User.objects.create_user('criador', 'criador@email.com', 'senha')
+        for i in range(6):
+            criar_evento(nome=f'Evento {i}', criador=criador)
+
+    def test_server_timing_e_consultas_repetidas(self):
+        def view(request):
+            # N+1: o criador é buscado uma vez para cada evento
+            nomes = [evento.criador.username for evento in Evento.objects.all()]
+            return HttpResponse(', '.join(nomes))
+
+        with self.assertLogs('type_event.desempenho', 'WARNING') as logs:
+            response = DesempenhoMiddleware(view)(RequestFactory().get('/'))
+        self.assertIn('sql;dur=', response['Server-Timing'])
+        self.assertIn('desc="7 consultas"', response['Server-Timing'])
+        self.assertIn('"vezes": 6', logs.output[0])
+
+    def test_sem_log_para_requisicao_rapida(self):
+        def view(request):
+            return HttpResponse(str(Evento.objects.select_related('criador').count()))
+
+        with self.assertNoLogs('type_event.desempenho', 'WARNING'):
+            response = DesempenhoMiddleware(view)(RequestFactory().get('/'))
+        self.assertIn('desc="1 consulta"', response['Server-Timing'])
+
+    def test_tempo_de_template_pelo_backend(self):
+        backend = dict(settings.TEMPLATES[0], BACKEND='type_event.desempenho.TemplatesMedidos', NAME='django')
+
+        def view(request):
+            return render(request, 'novo_evento.html')
+
+        with override_settings(TEMPLATES=[backend]):
+            response = DesempenhoMiddleware(view)(RequestFactory().get('/'))
+        self.assertIn('template;dur=', response['Server-Timing'])
+        # sem o backend medido, nada muda no Template do Django
+        response = DesempenhoMiddleware(view)(RequestFactory().get('/'))
+        self.assertNotIn('template;dur=', response['Server-Timing'])
+
+    def test_view_assincrona_continua_assincrona(self):
+        async def view(request):
+            total = await Evento.objects.acount()
+            return HttpResponse(str(total))
+
+        middleware = DesempenhoMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'6')
+        self.assertIn('desc="1 consulta"', response['Server-Timing'])
+
+
+class ArmazenamentoTestCase(TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        configuracao = override_settings(MEDIA_ROOT=pasta.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.participante = User.objects.create_user('participante', 'participante@email.com', 'senha')
+
+    def test_conteudo_igual_vira_um_arquivo(self):
+        primeiro = armazenamento_por_conteudo.save('certificados/a.png', ContentFile(b'png'))
+        segundo = armazenamento_por_conteudo.save('certificados/b.png', ContentFile(b'png'))
+        outro = armazenamento_por_conteudo.save('certificados/c.png', ContentFile(b'outro png'))
+        self.assertEqual(primeiro, segundo)
+        self.assertNotEqual(primeiro, outro)
+        self.assertRegex(primeiro, r'^certificados/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+
+    def test_limpar_midia_apaga_so_os_orfaos(self):
+        evento = criar_evento()
+        certificado = Certificado.objects.create(
+            evento=evento, participante=self.participante, certificado=ContentFile(b'png', name='certificado.png'),
+        )
+        orfao = armazenamento_por_conteudo.save('certificados/x.png', ContentFile(b'sem dono'))
+        csv_antigo = default_storage.save('abc123.csv', ContentFile(b'usuario;email'))
+        # derivados: do certificado usado, de uma largura que não é mais gerada e do órfão
+        derivado = default_storage.save(nome_derivado(certificado.certificado.name, 400), ContentFile(b'webp'))
+        derivado_antigo = default_storage.save(nome_derivado(certificado.certificado.name, 123), ContentFile(b'webp'))
+        derivado_orfao = default_storage.save(nome_derivado(orfao, 400), ContentFile(b'webp'))
+
+        # lotes pequenos, para os usados e os órfãos caírem em consultas diferentes
+        with mock.patch('eventos.management.commands.limpar_midia.TAMANHO_LOTE', 2):
+            call_command('limpar_midia', idade_minima=0, stdout=StringIO())
+
+        self.assertTrue(default_storage.exists(certificado.certificado.name))
+        self.assertTrue(default_storage.exists(derivado))
+        self.assertFalse(default_storage.exists(derivado_antigo))
+        self.assertFalse(default_storage.exists(derivado_orfao))
+        self.assertFalse(default_storage.exists(orfao))
+        self.assertFalse(default_storage.exists(csv_antigo))
+        self.assertFalse(os.path.exists(os.path.dirname(default_storage.path(orfao))))
+
+
+class MidiaTestCase(TestCase):
+    CONTEUDO = b'0123456789'
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        configuracao = override_settings(MEDIA_ROOT=pasta.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.criador = User.objects.create_user('criador', 'criador@email.com', 'senha')
+        self.dono = User.objects.create_user('dono', 'dono@email.com', 'senha')
+        self.estranho = User.objects.create_user('estranho', 'estranho@email.com', 'senha')
+        self.equipe = User.objects.create_user('equipe', 'equipe@email.com', 'senha', is_staff=True)
+        self.certificado = default_storage.save('certificados/ab/cd/abcd.png', ContentFile(self.CONTEUDO))
+        self.derivado = default_storage.save(nome_derivado(self.certificado, 400), ContentFile(b'webp'))
+        self.logo = default_storage.save('logos/logo.png', ContentFile(b'logo'))
+        self.csv = default_storage.save('importacao.csv', ContentFile(b'usuario;email'))
+        evento = criar_evento(criador=self.criador, logo=self.logo)
+        Certificado.objects.create(evento=evento, participante=self.dono, certificado=self.certificado)
+
+    def _get(self, nome, usuario=None, **cabecalhos):
+        if usuario:
+            self.client.force_login(usuario)
+        return self.client.get(reverse('midia', kwargs={'caminho': nome}), **cabecalhos)
+
+    def test_certificado_e_derivado_so_para_o_dono_e_o_criador(self):
+        for nome in (self.certificado, self.derivado):
+            for usuario, status in ((self.dono, 200), (self.criador, 200), (self.estranho, 404), (None, 404)):
+                with self.subTest(nome=nome, usuario=usuario):
+                    self.client.logout()
+                    self.assertEqual(self._get(nome, usuario).status_code, status)
+        response = self._get(self.certificado, self.dono)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTEUDO)
+        self.assertTrue(response['Cache-Control'].startswith('private'))
+
+    def test_logo_publico_e_outros_arquivos_so_para_a_equipe(self):
+        response = self._get(self.logo)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Cache-Control'].startswith('public'))
+        self.assertEqual(self._get(self.csv, self.estranho).status_code, 404)
+        self.assertEqual(self._get(self.csv, self.equipe).status_code, 200)
+        # a equipe vê qualquer certificado
+        self.assertEqual(self._get(self.certificado).status_code, 200)
+
+    def test_caminho_para_fora_da_pasta_de_midia(self):
+        fora = os.path.join(os.path.dirname(settings.MEDIA_ROOT), 'fora.txt')
+        with open(fora, 'wb') as arquivo:
+            arquivo.write(b'segredo')
+        self.addCleanup(os.remove, fora)
+        request = RequestFactory().get('/')
+        request.user = self.equipe
+        for caminho in ('../fora.txt', 'logos/../../fora.txt', '/../fora.txt'):
+            with self.subTest(caminho=caminho), self.assertRaises(Http404):
+                servir_midia(request, caminho)
+        # "../" que continua dentro da mídia vale pelo caminho normalizado: o csv só para a equipe
+        request.user = self.estranho
+        with self.assertRaises(Http404):
+            servir_midia(request, f'logos/../{self.csv}')
+
+    def test_entrega_pelo_servidor_web(self):
+        with mock.patch('type_event.midia.MEDIA_ACCEL', 'nginx'):
+            response = self._get(self.certificado, self.dono)
+        self.assertEqual(response['X-Accel-Redirect'], f'/media_protegida/{self.certificado}')
+        self.assertEqual(response.content, b'')
+        with mock.patch('type_event.midia.MEDIA_ACCEL', 'apache'):
+            response = self._get(self.certificado)
+        self.assertEqual(response['X-Sendfile'], default_storage.path(self.certificado))
+        # a permissão é conferida antes de passar o arquivo para o servidor web
+        self.client.logout()
+        with mock.patch('type_event.midia.MEDIA_ACCEL', 'nginx'):
+            self.assertEqual(self._get(self.certificado, self.estranho).status_code, 404)
+
+    def test_range_if_range_e_if_none_match(self):
+        response = self._get(self.certificado, self.dono, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        etag = response['ETag']
+
+        response = self._get(self.certificado, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        response = self._get(self.certificado, HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+        # If-Range com a versão atual: parcial; com outra versão: o arquivo inteiro
+        self.assertEqual(self._get(self.certificado, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE=etag).status_code, 206)
+        response = self._get(self.certificado, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"outra"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTEUDO)
+
+        response = self._get(self.certificado, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+
+def png(largura=40, altura=20):
+    conteudo = BytesIO()
+    Image.new('RGB', (largura, altura), '#336699').save(conteudo, format='PNG')
+    return conteudo.getvalue()
+
+
+class ImagensTestCase(TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        configuracao = override_settings(MEDIA_ROOT=pasta.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        # o cache lembra dos derivados que existem, e o mesmo png tem o mesmo nome em todo teste
+        cache.clear()
+        self.criador = User.objects.create_user('criador', 'criador@email.com', 'senha')
+        self.client.force_login(self.criador)
+
+    def dados(self, logo):
+        return {
+            'nome': 'Evento', 'descricao': 'Descrição', 'data_inicio': '2023-04-10',
+            'data_termino': '2023-04-14', 'carga_horaria': 8, 'cor_principal': '#000000',
+            'cor_secundaria': '#000000', 'cor_fundo': '#000000', 'logo': logo,
+        }
+
+    def test_logo_que_nao_e_imagem_nao_cria_evento(self):
+        logo = SimpleUploadedFile('logo.png', b'isso nao e um png', content_type='image/png')
+        response = self.client.post(reverse('eventos:novo_evento'), self.dados(logo))
+        self.assertRedirects(response, reverse('eventos:novo_evento'), fetch_redirect_response=False)
+        self.assertFalse(Evento.objects.exists())
+
+    def test_logo_valido_gera_derivados(self):
+        logo = SimpleUploadedFile('logo.png', png(), content_type='image/png')
+        self.client.post(reverse('eventos:novo_evento'), self.dados(logo))
+        evento = Evento.objects.get()
+        self.assertTrue(default_storage.exists(nome_derivado(evento.logo.name, 160)))
+        self.assertIn(' 160w', srcset(evento.logo, 'logo'))
+
+    def test_sem_derivado_usa_o_original(self):
+        evento = criar_evento(criador=self.criador, logo=ContentFile(png(), name='logo.png'))
+        # logo anterior aos derivados: o src é o original e o srcset fica vazio
+        self.assertEqual(miniatura(evento.logo, 160), evento.logo.url)
+        self.assertEqual(srcset(evento.logo, 'logo'), '')
+
+        # o "falta" também fica no cache: o próximo render não consulta o storage
+        with mock.patch.object(default_storage, 'exists') as exists:
+            self.assertEqual(srcset(evento.logo, 'logo'), '')
+        exists.assert_not_called()
+
+        gerar_derivados(evento.logo, 'logo')
+        self.assertEqual(miniatura(evento.logo, 160), default_storage.url(nome_derivado(evento.logo.name, 160)))
+        self.assertEqual(srcset(evento.logo, 'logo').count('w,'), 2)
+
+
+class SobDemandaTestCase(TestCase):
+    def test_zip_nao_enche_o_cache_de_certificados(self):
+        criador = User.objects.create_user('criador', 'criador@email.com', 'senha')
+        participante = User.objects.create_user('participante', 'participante@email.com', 'senha')
+        evento = criar_evento(criador=criador)
+        # sem arquivo: o certificado é renderizado enquanto o zip é enviado
+        Certificado.objects.create(evento=evento, participante=participante)
+        caches[CACHE].clear()
+
+        self.client.force_login(criador)
+        response = self.client.get(reverse('eventos:baixar_certificados', args=[evento.id]))
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+
+        chave, _ = chave_certificado(evento, participante.id, participante.username)
+        self.assertIsNone(caches[CACHE].get(chave))
+
+
+class ImportacaoTestCase(TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        configuracao = override_settings(MEDIA_ROOT=pasta.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.criador = User.objects.create_user('criador', 'criador@email.com', 'senha')
+        self.evento = criar_evento(criador=self.criador)
+
+    def test_contagens_ignoram_existentes_e_ja_inscritos(self):
+        inscrito = User.objects.create_user('inscrito', 'inscrito@email.com', 'senha')
+        User.objects.create_user('existente', 'existente@email.com', 'senha')
+        inscrever(self.evento.id, inscrito.id)
+        linhas = [
+            ('novo1', 'novo1@email.com', 'senha1'),
+            ('novo2', 'novo2@email.com', ''),
+            ('novo1', 'repetido@email.com', 'outra'),
+            ('inscrito', 'inscrito@email.com', ''),
+            ('existente', 'existente@email.com', ''),
+        ]
+
+        resultado = importar_participantes(linhas, evento=self.evento, workers=1)
+        self.assertEqual(resultado, {'criados': 2, 'existentes': 2, 'inscritos': 3})
+        self.assertTrue(User.objects.get(username='novo1').check_password('senha1'))
+        self.assertFalse(User.objects.get(username='novo2').has_usable_password())
+        self.evento.refresh_from_db()
+        self.assertEqual(self.evento.total_participantes, 4)
+
+        # importar o mesmo csv de novo não cria nem inscreve ninguém
+        resultado = importar_participantes(linhas, evento=self.evento, workers=1)
+        self.assertEqual(resultado, {'criados': 0, 'existentes': 4, 'inscritos': 0})
+
+    def test_upload_vai_para_a_fila(self):
+        arquivo = SimpleUploadedFile('participantes.csv', b'username;email;senha\nana;ana@email.com;\nbia;bia@email.com;\n')
+        self.client.force_login(self.criador)
+        self.client.post(reverse('eventos:importar_participantes', args=[self.evento.id]), {'arquivo': arquivo})
+        importacao = ImportacaoParticipantes.objects.get()
+        self.assertEqual(importacao.status, ImportacaoParticipantes.PENDENTE)
+        self.assertFalse(User.objects.filter(username='ana').exists())
+
+        call_command('processar_certificados', uma_vez=True, stdout=StringIO())
+
+        importacao.refresh_from_db()
+        self.assertEqual(importacao.status, ImportacaoParticipantes.CONCLUIDA)
+        self.assertEqual((importacao.criados, importacao.inscritos), (2, 2))
+        self.assertEqual(self.evento.participantes.count(), 2)
+        # o csv (com as senhas) não fica no storage
+        self.assertFalse(importacao.arquivo)
+        self.assertEqual(default_storage.listdir('importacoes')[1], [])
+
+
+class EmailBackendComFalha(EmailBackend):
+    # locmem que conta as conexões abertas e recusa os endereços de FALHAS
+    aberturas = 0
+    FALHAS = set()
+
+    def open(self):
+        EmailBackendComFalha.aberturas += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        for mensagem in messages:
+            if set(mensagem.to) & self.FALHAS:
+                raise ConnectionRefusedError(mensagem.to[0])
+        return super().send_messages(messages)
+
+
+class EmailBackendQueCai(EmailBackendComFalha):
+    # o servidor derruba a conexão no e-mail do p1 e não aceita reconectar na mesma conexão
+    def open(self):
+        if getattr(self, 'caiu', False):
+            raise ConnectionRefusedError('servidor fora')
+        return super().open()
+
+    def send_messages(self, messages):
+        if messages[0].to == ['p1@email.com']:
+            self.caiu = True
+            raise smtplib.SMTPServerDisconnected('conexão encerrada')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='eventos.tests.EmailBackendComFalha')
+class EnvioEmailTestCase(TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        configuracao = override_settings(MEDIA_ROOT=pasta.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        EmailBackendComFalha.aberturas = 0
+        EmailBackendComFalha.FALHAS = {'p3@email.com'}
+
+        self.evento = criar_evento()
+        for i in range(5):
+            participante = User.objects.create_user(f'p{i}', f'p{i}@email.com', 'senha')
+            Certificado.objects.create(
+                evento=self.evento, participante=participante,
+                certificado=ContentFile(f'png {i}'.encode(), name='certificado.png'),
+            )
+        sem_email = User.objects.create_user('sem_email', '', 'senha')
+        Certificado.objects.create(evento=self.evento, participante=sem_email)
+
+    def test_envia_em_lotes_com_anexo(self):
+        enviados, erros = enviar_certificados(self.evento, tamanho=2, por_segundo=0)
+
+        self.assertEqual((enviados, erros), (4, 1))
+        # 5 certificados com e-mail em lotes de 2: uma conexão por lote
+        self.assertEqual(EmailBackendComFalha.aberturas, 3)
+        self.assertEqual(len(mail.outbox), 4)
+        nome, conteudo, tipo = mail.outbox[0].attachments[0]
+        self.assertEqual((conteudo, tipo), (b'png 0', 'image/png'))
+        self.assertIn('/eventos/ver_certificado/', mail.outbox[0].body)
+        falhou = Certificado.objects.get(participante__username='p3')
+        self.assertIsNone(falhou.enviado_em)
+        self.assertEqual(falhou.tentativas_envio, 1)
+        self.assertIn('ConnectionRefusedError', falhou.erro_envio)
+
+    def test_reenvio_so_para_quem_faltou(self):
+        enviar_certificados(self.evento, por_segundo=0)
+        mail.outbox = []
+        EmailBackendComFalha.FALHAS = set()
+
+        self.assertEqual(enviar_certificados(self.evento, por_segundo=0), (1, 0))
+        self.assertEqual([mensagem.to for mensagem in mail.outbox], [['p3@email.com']])
+        self.assertEqual(enviar_certificados(self.evento, por_segundo=0), (0, 0))
+        self.assertEqual(Certificado.objects.filter(enviado_em__isnull=False).count(), 5)
+
+    def test_certificado_reservado_por_outro_envio_fica_de_fora(self):
+        Certificado.objects.filter(participante__username='p0').update(envio_reservado_em=timezone.now())
+        # reserva velha: o envio que a fez caiu no meio
+        Certificado.objects.filter(participante__username='p1').update(
+            envio_reservado_em=timezone.now() - timedelta(days=1),
+        )
+
+        self.assertEqual(enviar_certificados(self.evento, por_segundo=0), (3, 1))
+        self.assertNotIn(['p0@email.com'], [mensagem.to for mensagem in mail.outbox])
+        self.assertIn(['p1@email.com'], [mensagem.to for mensagem in mail.outbox])
+        # a reserva de quem deu erro é desfeita, para a próxima tentativa
+        self.assertIsNone(Certificado.objects.get(participante__username='p3').envio_reservado_em)
+
+    def test_contadores_de_envio(self):
+        enviar_certificados(self.evento, tamanho=2, por_segundo=0)
+        guardados, reais = contadores(self.evento)
+        self.assertEqual(guardados, reais)
+        self.assertEqual((guardados['certificados_enviados'], guardados['envios_com_erro']), (4, 1))
+
+        # o erro de antes agora vai: sai dos erros e entra nos enviados
+        EmailBackendComFalha.FALHAS = set()
+        enviar_certificados(self.evento, por_segundo=0)
+        guardados, reais = contadores(self.evento)
+        self.assertEqual(guardados, reais)
+        self.assertEqual((guardados['certificados_enviados'], guardados['envios_com_erro']), (5, 0))
+
+    @override_settings(EMAIL_BACKEND='eventos.tests.EmailBackendQueCai')
+    def test_falha_ao_reconectar_nao_interrompe_o_envio(self):
+        self.assertEqual(enviar_certificados(self.evento, por_segundo=0), (3, 2))
+        self.assertEqual([mensagem.to for mensagem in mail.outbox],
+                         [['p0@email.com'], ['p2@email.com'], ['p4@email.com']])
+
+
+# os testes rodam num processo só, então o LocMemCache vale como compartilhado
+@override_settings(CACHE_VERSOES_COMPARTILHADAS=True)
+class ApiTestCase(TestCase):
+    def setUp(self):
+        self.criador = User.objects.create_user('criador', 'criador@email.com', 'senha')
+        self.evento = criar_evento(criador=self.criador, nome='API')
+        self.participantes = [User.objects.create_user(f'p{i}', f'p{i}@email.com', 'senha') for i in range(5)]
+        self.evento.participantes.add(*self.participantes)
+        self.client.force_login(self.criador)
+
+    def test_campos_e_cursor(self):
+        url = reverse('eventos:api_participantes', kwargs={'id': self.evento.id})
+        dados = self.client.get(url, {'campos': 'username,inexistente', 'por_pagina': 3}).json()
+        self.assertEqual(dados['resultados'], [{'username': 'p0'}, {'username': 'p1'}, {'username': 'p2'}])
+        dados = self.client.get(url, {'campos': 'username', 'por_pagina': 3, 'cursor': dados['proximo']}).json()
+        self.assertEqual(dados['resultados'], [{'username': 'p3'}, {'username': 'p4'}])
+        self.assertIsNone(dados['proximo'])
+
+    def test_304_ate_a_proxima_alteracao(self):
+        url = reverse('eventos:api_participantes', kwargs={'id': self.evento.id})
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(2):
+            # só a sessão e o usuário da autenticação; o evento e as versões vêm do cache
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.evento.participantes.add(User.objects.create_user('novo', 'novo@email.com', 'senha'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['resultados']), 6)
+
+    @override_settings(CACHE_VERSOES_COMPARTILHADAS=None)
+    def test_versoes_no_banco_com_cache_de_cada_processo(self):
+        # LocMemCache: a versão marcada pelo worker não chegaria aqui pelo cache, então ela fica no banco
+        url = reverse('eventos:api_participantes', kwargs={'id': self.evento.id})
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(3):
+            # sessão, usuário e as versões
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # o worker (outro processo, com outro cache) gera um certificado
+        with mock.patch('eventos.cache.cache', LocMemCache('worker', {})):
+            Certificado.objects.create(evento=self.evento, participante=self.participantes[0])
+        self.assertTrue(VersaoEscopo.objects.filter(escopo=f'evento:{self.evento.id}').exists())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_envio_por_email_muda_o_etag(self):
+        Certificado.objects.create(evento=self.evento, participante=self.participantes[0])
+        url = reverse('eventos:api_participantes', kwargs={'id': self.evento.id}) + '?campos=certificado_enviado_em'
+        etag = self.client.get(url)['ETag']
+
+        # o envio grava com update(), sem sinais; as versões avançam no fim do lote
+        self.assertEqual(enviar_certificados(self.evento, por_segundo=0, anexar=False), (1, 0))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()['resultados'][0]['certificado_enviado_em'])
+
+    def test_inscricao_e_status_em_lote(self):
+        response = self.client.post(
+            reverse('eventos:api_inscricoes', kwargs={'id': self.evento.id}),
+            {'participantes': [{'username': 'p0'}, {'username': 'novo', 'email': 'Novo@email.com'}]},
+            content_type='application/json',
+        )
+        # p0 já estava inscrito, só o novo conta
+        self.assertEqual(response.json(), {'criados': 1, 'existentes': 1, 'inscritos': 1})
+        Certificado.objects.create(evento=self.evento, participante=self.participantes[0])
+
+        response = self.client.post(
+            reverse('eventos:api_status', kwargs={'id': self.evento.id}),
+            {'emails': ['P0@email.com', 'novo@email.com', 'ninguem@email.com']},
+            content_type='application/json',
+        )
+        situacao = response.json()['participantes']
+        self.assertIsNone(situacao['ninguem@email.com'])
+        self.assertTrue(situacao['novo@email.com']['inscrito'])
+        self.assertIsNone(situacao['novo@email.com']['certificado'])
+        self.assertIn('/eventos/ver_certificado/', situacao['p0@email.com']['certificado'])
+
+    def test_sem_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('eventos:api_eventos')).status_code, 401)
+
+
+@override_settings(DATABASE_ROUTERS=['type_event.replicas.RoteadorReplicas'])
+class ReplicasTestCase(SimpleTestCase):
+    # sem réplica de verdade no ambiente de teste, a lista de réplicas é trocada por uma falsa
+    def setUp(self):
+        self.addCleanup(replicas._fora.clear)
+
+    def _requisicao(self, escrever=False, **cookies):
+        lidos = []
+
+        @replicas.ler_da_replica
+        def view(request):
+            lidos.append(replicas.banco_leitura())
+            if escrever:
+                router.db_for_write(User)
+                lidos.append(replicas.banco_leitura())
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies)
+        response = replicas.ReplicaMiddleware(view)(request)
+        return lidos, response
+
+    @mock.patch.object(replicas, '_disponivel', return_value=True)
+    @mock.patch.object(replicas, 'replicas', return_value=['replica1'])
+    def test_leitura_na_replica_e_principal_depois_de_escrever(self, *mocks):
+        self.assertEqual(replicas.banco_leitura(), 'default')
+        lidos, response = self._requisicao()
+        self.assertEqual(lidos, ['replica1'])
+        self.assertNotIn(replicas.COOKIE, response.cookies)
+
+        lidos, response = self._requisicao(escrever=True)
+        self.assertEqual(lidos, ['replica1', 'default'])
+        self.assertIn(replicas.COOKIE, response.cookies)
+
+        # dentro da janela (cookie), as leituras ficam no principal
+        lidos, _ = self._requisicao(**{replicas.COOKIE: '1'})
+        self.assertEqual(lidos, ['default'])
+
+    @mock.patch.object(replicas, '_disponivel', return_value=True)
+    @mock.patch.object(replicas, 'replicas', return_value=['replica1'])
+    def test_corpo_com_etag_vem_do_principal(self, *mocks):
+        lidos = []
+
+        def gerar():
+            lidos.append(replicas.banco_leitura())
+            return {}
+
+        @replicas.ler_da_replica
+        def view(request):
+            request.user = AnonymousUser()
+            resposta_condicional(request, [time.time() - 10], gerar)
+            resposta_condicional(request, None, gerar)
+            return HttpResponse()
+
+        replicas.ReplicaMiddleware(view)(RequestFactory().get('/'))
+        # com ETag, do principal; sem ETag (versões não compartilhadas), da réplica
+        self.assertEqual(lidos, ['default', 'replica1'])
+
+    @mock.patch.object(replicas, '_disponivel', return_value=True)
+    @mock.patch.object(replicas, 'replicas', return_value=['replica1'])
+    def test_middleware_assincrono(self, *mocks):
+        lidos = []
+
+        @replicas.ler_da_replica
+        async def view(request):
+            lidos.append(replicas.banco_leitura())
+            await sync_to_async(router.db_for_write)(User)
+            return HttpResponse()
+
+        middleware = replicas.ReplicaMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertEqual(lidos, ['replica1'])
+        # a escrita feita na thread do sync_to_async também abre a janela
+        self.assertIn(replicas.COOKIE, response.cookies)
+
+    @mock.patch.object(connections['default'], 'ensure_connection', side_effect=OperationalError('fora'))
+    @mock.patch.object(replicas, 'replicas', return_value=['default'])
+    def test_replica_fora_volta_para_o_principal(self, *mocks):
+        # o próprio default faz o papel da réplica que não conecta
+        with self.assertLogs('type_event.replicas', 'WARNING'):
+            lidos, _ = self._requisicao()
+        self.assertEqual(lidos, ['default'])
+        self.assertGreater(replicas._fora['default'], time.monotonic())
+        # dentro da espera nem tenta conectar de novo
+        self.assertFalse(replicas._disponivel('default'))
+        self.assertEqual(connections['default'].ensure_connection.call_count, 1)
+
+
+class InscricaoConcorrenteTestCase(TransactionTestCase):
+    # várias threads inscrevendo ao mesmo tempo, cada uma com a sua conexão
+    THREADS = 8
+    TENTATIVAS_POR_THREAD = 3
+    # repetições quando o banco está travado; um travamento que não passa reprova o teste
+    MAXIMO_REPETICOES = 200
+    ESPERA = 30
+
+    def _inscrever_em_paralelo(self, evento, usuarios):
+        resultados = []
+        travados = []
+        barreira = threading.Barrier(len(usuarios), timeout=self.ESPERA)
+
+        def inscrever_usuario(usuario):
+            try:
+                barreira.wait()
+                # cada usuário clica várias vezes, as repetições devem ser ignoradas
+                for _ in range(self.TENTATIVAS_POR_THREAD):
+                    for _ in range(self.MAXIMO_REPETICOES):
+                        try:
+                            resultados.append(inscrever(evento.id, usuario.id))
+                            break
+                        except OperationalError:
+                            # o SQLite em memória trava a tabela em vez de esperar, tenta de novo
+                            time.sleep(0.01)
+                    else:
+                        travados.append(usuario.username)
+                        return
+            except threading.BrokenBarrierError:
+                travados.append(usuario.username)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=inscrever_usuario, args=(usuario,)) for usuario in usuarios]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(self.ESPERA)
+        self.assertFalse(any(thread.is_alive() for thread in threads), 'inscrições paradas')
+        self.assertEqual(travados, [], 'banco travado por mais de MAXIMO_REPETICOES tentativas')
+        return resultados
+
+    def _usuarios(self):
+        return [User.objects.create_user(f'usuario{i}', f'usuario{i}@email.com', 'senha') for i in range(self.THREADS)]
+
+    def test_sem_inscricoes_perdidas_ou_duplicadas(self):
+        evento = criar_evento()
+        usuarios = self._usuarios()
+
+        resultados = self._inscrever_em_paralelo(evento, usuarios)
+
+        evento.refresh_from_db()
+        self.assertEqual(resultados.count(INSCRITO), self.THREADS)
+        self.assertEqual(evento.participantes.count(), self.THREADS)
+        self.assertEqual(evento.total_participantes, self.THREADS)
+
+    def test_capacidade_respeitada(self):
+        evento = criar_evento(capacidade=3)
+        usuarios = self._usuarios()
+
+        resultados = self._inscrever_em_paralelo(evento, usuarios)
+
+        evento.refresh_from_db()
+        self.assertEqual(resultados.count(INSCRITO), 3)
+        self.assertEqual(evento.participantes.count(), 3)
+        self.assertEqual(evento.total_participantes, 3)
@@ -1,16 +1,32 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views, views_async
+
+
+# views de leitura: assíncronas quando o projeto roda em ASGI com VIEWS_ASYNC ligado
+leitura = views_async if settings.VIEWS_ASYNC else views
 
 
 app_name = 'eventos'
 
 urlpatterns = [
     path('novo_evento/', views.novo_evento, name='novo_evento'),
-    path('gerenciar_evento/', views.gerenciar_evento, name='gerenciar_evento'),
+    path('gerenciar_evento/', leitura.gerenciar_evento, name='gerenciar_evento'),
     path('inscrever_evento/<int:id>/', views.inscrever_evento, name='inscrever_evento'),
-    path('participantes_evento/<int:id>/', views.participantes_evento, name='participantes_evento'),
+    path('participantes_evento/<int:id>/', leitura.participantes_evento, name='participantes_evento'),
+    path('importar_participantes/<int:id>/', views.importar_participantes_evento, name='importar_participantes'),
     path('gerar_csv/<int:id>/', views.gerar_csv, name='gerar_csv'),
     path('certificados_evento/<int:id>/', views.certificados_evento, name='certificados_evento'),
     path('gerar_certificado/<int:id>/', views.gerar_certificado, name='gerar_certificado'),
-    path('procurar_certificado/<int:id>/', views.procurar_certificado, name='procurar_certificado'),
+    path('enviar_certificados/<int:id>/', views.enviar_certificados, name='enviar_certificados'),
+    path('status_certificados/<int:id>/', views.status_certificados, name='status_certificados'),
+    path('procurar_certificados/<int:id>/', views.procurar_certificados, name='procurar_certificados'),
+    path('ver_certificado/<int:id>/', leitura.ver_certificado, name='ver_certificado'),
+    path('baixar_certificados/<int:id>/', views.baixar_certificados, name='baixar_certificados'),
+    path('procurar_certificado/<int:id>/', leitura.procurar_certificado, name='procurar_certificado'),
+    # API JSON
+    path('api/', api.eventos, name='api_eventos'),
+    path('api/<int:id>/participantes/', api.participantes, name='api_participantes'),
+    path('api/<int:id>/inscricoes/', api.inscrever_lote, name='api_inscricoes'),
+    path('api/<int:id>/status/', api.status_participantes, name='api_status'),
 ]
\ No newline at end of file
@@ -1,18 +1,34 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, Http404
+from django.http import HttpResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.messages import constants
 from django.urls import reverse
 from django.conf import settings
-from django.core.files.uploadedfile import InMemoryUploadedFile
-from django.core.paginator import Paginator
+from django.db.models.functions import Lower, Substr
+from django.utils.cache import get_conditional_response
+from django.utils.http import urlencode
+from django.views.decorators.http import require_POST
+import json, re
 
-from .models import Evento, Certificado
-import csv, os, sys
-from secrets import token_urlsafe
-from PIL import Image, ImageDraw, ImageFont
-from io import BytesIO
+from type_event.paginacao import CursorInvalido, CursorPaginator, por_pagina
+from type_event.replicas import banco_leitura, ler_da_replica
+
+from .models import Evento, Certificado, GeracaoCertificados, ImportacaoParticipantes
+from .tarefas import agendar_geracao
+from .envios import pendentes_envio
+from .cache import obter_evento, obter_inscrito
+from .busca import buscar_ids
+from .inscricoes import INSCRITO, JA_INSCRITO, esta_inscrito, inscrever
+from .imagens import LARGURAS, gerar_derivados, imagem_valida, url_imagem
+from .sob_demanda import chave_certificado, obter_certificado
+from .exportacao import escolher_colunas, gerar_linhas_csv, comprimir_gzip, gerar_zip
+
+
+# quantidade máxima de e-mails aceita na busca em lote
+MAXIMO_EMAILS_BUSCA = 1000
+# o storage do próprio campo (hoje o type_event/armazenamento.py), que pode não ser o default_storage
+ARMAZENAMENTO_CERTIFICADOS = Certificado._meta.get_field('certificado').storage
 
 
 # A view novo_evento, só pode ser acessada por usuário logado. 
@@ -30,8 +46,14 @@ def novo_evento(request):
         cor_principal  = request.POST.get('cor_principal')
         cor_secundaria = request.POST.get('cor_secundaria')
         cor_fundo      = request.POST.get('cor_fundo')  
+        capacidade     = request.POST.get('capacidade') or None
 
         logo           = request.FILES.get('logo')
+
+        # um arquivo que não é imagem seria gravado e só quebraria ao gerar os derivados
+        if logo and not imagem_valida(logo):
+            messages.add_message(request, constants.ERROR, 'O logo enviado não é uma imagem válida.')
+            return redirect(reverse('eventos:novo_evento'))
         
         evento = Evento(
             criador=request.user,
@@ -43,52 +65,103 @@ def novo_evento(request):
             cor_principal=cor_principal,
             cor_secundaria=cor_secundaria,
             cor_fundo=cor_fundo,
+            capacidade=capacidade,
             logo=logo,
         )
     
         evento.save()
+        # versões reduzidas do logo, usadas no srcset das páginas do evento
+        # (se falhar, as páginas usam o logo original e o comando gerar_derivados tenta de novo)
+        if evento.logo:
+            try:
+                gerar_derivados(evento.logo, 'logo')
+            except (OSError, ValueError):
+                pass
         
         messages.add_message(request, constants.SUCCESS, 'Evento cadastrado com sucesso')
         return redirect(reverse('eventos:novo_evento'))
     
 
+@ler_da_replica
 @login_required
 def gerenciar_evento(request):
     if request.method == "GET":
         # cria uma variável para pegar o título do evento na busca
         nome = request.GET.get('nome') 
+        tamanho = por_pagina(request)
         # cria uma variável para receber os dados dos eventos que foram cadastrados
-        # pelo usuário que está logado
-        eventos = Evento.objects.filter(criador=request.user)
+        # pelo usuário que está logado; a descrição completa (TextField) não é carregada,
+        # só o começo dela, que é o que aparece na tabela
+        eventos = (
+            Evento.objects.filter(criador=request.user)
+            .defer('descricao')
+            .annotate(resumo=Substr('descricao', 1, 200))
+        )
+        data = {'nome': nome or ''}
         
         if nome:
-            # filtra entre todos os eventos do usário logado, onde no nome,
-            # CONTENHA os dados enviados na variável de busca
-            eventos = eventos.filter(nome__contains=nome)
+            # busca indexada (FTS5 no SQLite, GIN no PostgreSQL), ordenada por relevância;
+            # como a ordem é pela relevância, a página é indicada pelo número
+            pagina = int(request.GET['pagina']) if request.GET.get('pagina', '').isdigit() else 1
+            pagina = max(pagina, 1)
+            inicio = (pagina - 1) * tamanho
+            ids = buscar_ids(nome, request.user.id, tamanho + 1, inicio)
+            if ids is None:
+                # banco sem busca indexada: filtra entre todos os eventos do usário logado,
+                # onde no nome, CONTENHA os dados enviados na variável de busca
+                ids = list(
+                    eventos.filter(nome__icontains=nome).order_by('-data_inicio', 'id')
+                    .values_list('id', flat=True)[inicio:inicio + tamanho + 1]
+                )
+            por_id = eventos.in_bulk(ids[:tamanho])
+            data['eventos'] = [por_id[id] for id in ids[:tamanho] if id in por_id]
+            if len(ids) > tamanho:
+                data['proxima'] = urlencode({'nome': nome, 'pagina': pagina + 1, 'por_pagina': tamanho})
+            if pagina > 1:
+                data['anterior'] = urlencode({'nome': nome, 'pagina': pagina - 1, 'por_pagina': tamanho})
+        else:
+            # listagem completa paginada por cursor, usando o índice (criador, data_inicio, id)
+            paginator = CursorPaginator(eventos, ordenacao=('-data_inicio', 'id'), por_pagina=tamanho)
+            try:
+                data['eventos'] = paginator.pagina(request.GET.get('cursor'))
+            except CursorInvalido:
+                data['eventos'] = paginator.pagina()
+            if data['eventos'].has_next:
+                data['proxima'] = urlencode({'cursor': data['eventos'].proximo, 'por_pagina': tamanho})
+            if data['eventos'].has_previous:
+                data['anterior'] = urlencode({'cursor': data['eventos'].anterior, 'por_pagina': tamanho})
 
-        return render(request, 'gerenciar_evento.html', {'eventos':eventos})
+        return render(request, 'gerenciar_evento.html', data)
     
 
 @login_required
 def inscrever_evento(request, id):
-    # buscando na tabela Evento pelo id passado como parâmetro
-    # se não encontrar, devolva uma "página não encontrada" 
-    evento = get_object_or_404(Evento,id=id)
     if request.method == "GET":
-        return render(request, 'inscrever_evento.html', {'evento':evento})
+        # buscando o Evento pelo id passado como parâmetro, primeiro no cache e depois no banco
+        # se não encontrar, devolva uma "página não encontrada" 
+        evento = obter_evento(id)
+        # a verificação usa só a tabela de ligação, sem carregar os participantes,
+        # e fica no cache por usuário até a próxima mudança nas inscrições do evento
+        inscrito = obter_inscrito(evento.id, request.user.id, esta_inscrito)
+        return render(request, 'inscrever_evento.html', {'evento':evento, 'inscrito':inscrito})
     elif request.method == "POST":
-        # O campo ManyToManyField permite adicionar (fazer uma relação entre outros campos)
-        # nesse caso co-realaciona o id do usuário logado ao id do evento selecionado
+        # a inscrição vai direto para a tabela de ligação do ManyToManyField,
+        # sem carregar nem regravar o evento (ver eventos/inscricoes.py)
+        resultado = inscrever(id, request.user.id)
 
-        # TODO: validar se o usuário já é um participante
-        
-        evento.participantes.add(request.user)
-        evento.save()
-        messages.add_message(request, constants.SUCCESS, 'Inscriçao realizada com sucesso!')
-        # return redirect(f"/eventos/inscrever_evento/{evento.id}/") 
+        if resultado == INSCRITO:
+            messages.add_message(request, constants.SUCCESS, 'Inscriçao realizada com sucesso!')
+        elif resultado == JA_INSCRITO:
+            messages.add_message(request, constants.INFO, 'Você já está inscrito neste evento.')
+        elif not Evento.objects.filter(id=id).exists():
+            raise Http404('Evento não encontrado')
+        else:
+            messages.add_message(request, constants.WARNING, 'As inscrições para este evento estão esgotadas.')
         return redirect(reverse('eventos:inscrever_evento', kwargs={'id':id}))
     
 
+@ler_da_replica
+@login_required
 def participantes_evento(request, id):
     # buscando na tabela Evento pelo id passado como parâmetro
     # se não encontrar, devolva uma "página não encontrada" 
@@ -100,16 +173,21 @@ def participantes_evento(request, id):
     if request.method == "GET":
         data = {}
         data['evento'] = evento
+        # última importação de csv, para mostrar se ainda está na fila ou como terminou
+        data['importacao'] = ImportacaoParticipantes.objects.filter(evento=evento).order_by('-id').first()
         # o evento tem o campo participantes, então é só acessá-lo
-        data['participantes'] = evento.participantes.all()
-        all = evento.participantes.all()
-        # seleciona quantos participantes vão ser mostrados em cada página
-        paginator = Paginator(all, 2)
-        pages = request.GET.get('page')
-        data['paginas'] = paginator.get_page(pages)
+        participantes = evento.participantes.only('id', 'username', 'email')
+        # paginação por cursor: cada página continua do último id da anterior (sem OFFSET),
+        # e o total vem do contador do evento, sem COUNT no banco
+        paginator = CursorPaginator(participantes, ordenacao=('id',), por_pagina=por_pagina(request))
+        try:
+            data['paginas'] = paginator.pagina(request.GET.get('cursor'))
+        except CursorInvalido:
+            data['paginas'] = paginator.pagina()
         return render(request, 'participantes_evento.html', data)
 
 
+@ler_da_replica
 def gerar_csv(request, id):
     # buscando na tabela Evento pelo id passado como parâmetro
     # se não encontrar, devolva uma "página não encontrada" 
@@ -118,23 +196,23 @@ def gerar_csv(request, id):
     if not evento.criador == request.user:
         raise Http404('Esse evento não é seu')
     
-    # para gerar um csv com todos os participantes, é necessário buscar todos eles
-    participantes = evento.participantes.all()
-
-    # token vai gerar um nome aleatório de 8 bites, toda vez que for gerado um arquivo .csv
-    token = f"{token_urlsafe(6)}.csv"
-    # mostra o caminho onde vai ser armazenado esse arquivo, junto com o seu nome
-    path = os.path.join(settings.MEDIA_ROOT, token)
-    # cria o csv (para escrita)
-    with open(path, 'w') as arq:
-        writer = csv.writer(arq, delimiter=';')
-        for participante in participantes:
-            x = (participante.username, participante.email)
-            writer.writerow(x)
-    
-    return redirect(f"/media/{token}")
+    # ?colunas=username,email escolhe as colunas e ?gzip=1 comprime o arquivo
+    colunas = escolher_colunas(request.GET.get('colunas'))
+    # o csv é gerado aos poucos e enviado direto na resposta, sem arquivo temporário no disco
+    # o csv é lido depois que a view termina (streaming), então o banco de leitura é escolhido aqui
+    conteudo = gerar_linhas_csv(evento.participantes.all().using(banco_leitura()), colunas)
+    nome_arquivo = f"participantes_{evento.id}.csv"
+
+    if request.GET.get('gzip'):
+        response = StreamingHttpResponse(comprimir_gzip(conteudo), content_type='application/gzip')
+        nome_arquivo += '.gz'
+    else:
+        response = StreamingHttpResponse(conteudo, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    return response
     
 
+@ler_da_replica
 def certificados_evento(request, id):
     # buscar o evento no banco
     evento = get_object_or_404(Evento, id=id)
@@ -142,11 +220,20 @@ def certificados_evento(request, id):
     if not evento.criador == request.user:
         raise Http404('Esse evento não é seu')
     if request.method == "GET":
-        # verifica a quantidade de certificados gerados
-        # subtraindo o total de certificados menos os certificados desse evento
-        qtd_certificados = evento.participantes.all().count() - Certificado.objects.filter(evento=evento).count()
+        # os números vêm dos contadores do evento (eventos/signals.py, processar_lote e envios),
+        # sem COUNT a cada visita
+        qtd_certificados = evento.certificados_pendentes
+        # última geração pedida para o evento, usada para mostrar o progresso
+        tarefa = GeracaoCertificados.objects.filter(evento=evento).order_by('-id').first()
+        envio = {
+            'total': evento.total_certificados,
+            'enviados': evento.certificados_enviados,
+            'erros': evento.envios_com_erro,
+        }
         return render(request, 'certificados_evento.html', {'qtd_certificados': qtd_certificados,
-                                                            'evento': evento,})
+                                                            'evento': evento,
+                                                            'tarefa': tarefa,
+                                                            'envio': envio,})
     
 
 def gerar_certificado(request, id):
@@ -157,75 +244,182 @@ def gerar_certificado(request, id):
     if not evento.criador == request.user:
         raise Http404('Esse evento não é seu')
     
-    path_template = os.path.join(settings.BASE_DIR, 'templates/static/evento/img/template_certificado.png')
-    path_fonte = os.path.join(settings.BASE_DIR, 'templates/static/fontes/arimo.ttf')
-
-    for participante in evento.participantes.all():
-        # TODO validar se o certificado já foi gerado
-
-        # abre a imagem
-        img = Image.open(path_template) 
-        # cria uma variável para escrever na imagem
-        draw = ImageDraw.Draw(img)
-        # para utilizar uma fonte na imagem, é preciso passar o caminho e o tamanho da fonte
-        fonte_nome = ImageFont.truetype(path_fonte, 80)
-        fonte_info = ImageFont.truetype(path_fonte, 30)
-
-        # é preciso passar as coordenadas em forma de tupla, 
-        # depois o texto a ser digitado, 
-        # depois a fonte a ser utilizada
-        # e por último a cor da fonte em forma de tupla
-        draw.text((222, 632), f"{participante.username}", font=fonte_nome, fill=(0, 0, 0))
-        draw.text((761, 775), f"{evento.nome}", font=fonte_info, fill=(0, 0, 0))
-        draw.text((816, 842), f"{evento.carga_horaria} horas.", font=fonte_info, fill=(0, 0, 0))
-
-        # cria uma variável para salvar essa imagem para manipular de acordo com as necessidades
-        output = BytesIO()
-        # é preciso passar o caminho onde será salvo, nesse caso, dentro da variável output
-        # depois o formato da imagem
-        # depois a qualidade da imagem
-        img.save(output, format="PNG", quality=100)
-        # aponta para o início do arquivo
-        output.seek(0)
-        # agora é preciso converter essa imagem em um arquivo que o Django compreende
-        # existem dois tipos de arquivo  que o Django utiliza: InMemoryUploadedFile e TemporaryUploadedFile
-        # para finalizar é preciso criar a imagem final passando:
-        # o arquivo, 
-        # tipo do campo, 
-        # nome (gerado com função que gera um nome aleatório de 8 bites), 
-        # tipo de imagem
-        # tamanho, que recebe a função getsizeof, que recebe o tamanho de outoput e retorna o tamanho dele mesmo
-        # charset, se fosse um texto, poderia ser o UTF-8, mas como é imagem, não precisa, então None
-        img_final = InMemoryUploadedFile(
-                                output,
-                                'Imagefield',
-                                f'{token_urlsafe(8)}.png',
-                                'image/jpeg',
-                                sys.getsizeof(output),
-                                None
-                                )
-        certificado_gerado = Certificado(
-                            certificado=img_final,
-                            participante=participante,
-                            evento=evento
-                            )
-        certificado_gerado.save()
-    messages.add_message(request, constants.SUCCESS, 'Certificados gerados com sucesso!')
+    if not evento.participantes_sem_certificado().exists():
+        messages.add_message(request, constants.WARNING, 'Não há certificados para serem gerados')
+        return redirect(reverse('eventos:certificados_evento', kwargs={'id':id}))
+
+    # a geração é feita em segundo plano pelo comando processar_certificados,
+    # a view só coloca o pedido na fila e volta na hora
+    agendar_geracao(evento)
+    messages.add_message(request, constants.SUCCESS, 'Geração dos certificados iniciada!')
+    return redirect(reverse('eventos:certificados_evento', kwargs={'id':id}))
+
+
+@require_POST
+def enviar_certificados(request, id):
+    evento = get_object_or_404(Evento, id=id)
+    if not evento.criador == request.user:
+        raise Http404('Esse evento não é seu')
+
+    if not evento.participantes_sem_certificado().exists() and not pendentes_envio(evento).exists():
+        messages.add_message(request, constants.WARNING, 'Não há certificados para serem enviados')
+        return redirect(reverse('eventos:certificados_evento', kwargs={'id':id}))
+
+    # o envio também é feito pelo worker: ele gera os certificados que faltarem e,
+    # no fim, manda os e-mails de quem ainda não recebeu
+    agendar_geracao(evento, enviar_email=True)
+    messages.add_message(request, constants.SUCCESS, 'Envio dos certificados por e-mail iniciado!')
     return redirect(reverse('eventos:certificados_evento', kwargs={'id':id}))
 
 
+@ler_da_replica
+def status_certificados(request, id):
+    # essa view é consultada várias vezes pela página, então busca só o criador do evento
+    evento = get_object_or_404(Evento.objects.only('criador'), id=id)
+    if not evento.criador == request.user:
+        raise Http404('Esse evento não é seu')
+
+    tarefa = GeracaoCertificados.objects.filter(evento=evento).order_by('-id').first()
+    if not tarefa:
+        return JsonResponse({'status': None})
+    return JsonResponse({
+        'status': tarefa.status,
+        'total': tarefa.total,
+        'processados': tarefa.processados,
+        'percentual': tarefa.percentual,
+        'erro': tarefa.erro,
+    })
+
+
+@ler_da_replica
+@login_required
 def procurar_certificado(request, id):
     evento = get_object_or_404(Evento,id=id)
     if not evento.criador == request.user:
         raise Http404('Esse evento não é seu')
 
-    email = request.POST.get('email')
-    # buscar pelo evento e pelo email que foi passado pelo POST, mostrando apenas o primeiro
-    certificado = Certificado.objects.filter(evento=evento).filter(participante__email=email).first()
+    email = request.POST.get('email', '')
+    # buscar pelo evento e pelo email que foi passado pelo POST (sem diferenciar maiúsculas),
+    # mostrando apenas o primeiro
+    certificado = Certificado.objects.filter(evento=evento).por_email([email]).order_by('id').first()
     if not certificado:
         messages.add_message(request, constants.WARNING, 'Este certificado ainda não foi gerado')
         return redirect(reverse('eventos:certificados_evento', kwargs={'id':id}))
     else:
+        return redirect(certificado.url)
+
+
+@ler_da_replica
+@require_POST
+def procurar_certificados(request, id):
+    evento = get_object_or_404(Evento.objects.only('criador'), id=id)
+    if not evento.criador == request.user:
+        raise Http404('Esse evento não é seu')
+
+    # aceita um JSON {"emails": [...]} ou o campo "emails" do formulário,
+    # com um e-mail por linha (ou separados por vírgula / ponto e vírgula)
+    if request.content_type == 'application/json':
+        try:
+            emails = json.loads(request.body).get('emails', [])
+        except (ValueError, AttributeError):
+            return JsonResponse({'erro': 'JSON inválido'}, status=400)
+        if not isinstance(emails, list):
+            return JsonResponse({'erro': 'emails deve ser uma lista'}, status=400)
+        emails = [email for email in emails if isinstance(email, str)]
+    else:
+        emails = re.split(r'[\s,;]+', request.POST.get('emails', ''))
+
+    emails = {email.strip().lower() for email in emails if email.strip()}
+    if len(emails) > MAXIMO_EMAILS_BUSCA:
+        return JsonResponse({'erro': f'No máximo {MAXIMO_EMAILS_BUSCA} e-mails por busca'}, status=400)
+
+    # todos os e-mails são resolvidos em uma única consulta
+    encontrados = (
+        Certificado.objects.filter(evento=evento).por_email(emails)
+        .annotate(email=Lower('participante__email'))
+        .values_list('email', 'id', 'certificado')
+    )
+    certificados = dict.fromkeys(sorted(emails))
+    for email, certificado_id, arquivo in encontrados:
+        if certificados[email] is None:
+            certificados[email] = (
+                ARMAZENAMENTO_CERTIFICADOS.url(arquivo) if arquivo
+                else reverse('eventos:ver_certificado', kwargs={'id': certificado_id})
+            )
+    return JsonResponse({'certificados': certificados})
+
+
+@ler_da_replica
+def baixar_certificados(request, id):
+    evento = get_object_or_404(Evento, id=id)
+    if not evento.criador == request.user:
+        raise Http404('Esse evento não é seu')
+
+    # só os nomes dos arquivos, lidos do banco aos poucos
+    certificados = (
+        Certificado.objects.using(banco_leitura()).filter(evento=evento)
+        .order_by('id')
+        .values_list('participante_id', 'participante__username', 'certificado')
+        .iterator(chunk_size=500)
+    )
+    # certificados sem arquivo (modo sob demanda) são renderizados enquanto o zip é enviado
+    arquivos = (
+        (f'{username}.png', certificado or obter_certificado(evento, participante_id, username, cachear=False)[0])
+        for participante_id, username, certificado in certificados
+    )
+
+    response = StreamingHttpResponse(gerar_zip(arquivos), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="certificados_{evento.id}.zip"'
+    return response
+
+
+@ler_da_replica
+@login_required
+def ver_certificado(request, id):
+    certificado = get_object_or_404(Certificado.objects.select_related('evento', 'participante'), id=id)
+    # só o participante e o criador do evento podem ver o certificado
+    if request.user.id not in (certificado.participante_id, certificado.evento.criador_id):
+        raise Http404('Esse certificado não é seu')
+
+    largura = request.GET.get('largura')
+    largura = int(largura) if largura and largura.isdigit() else None
+    if largura not in LARGURAS['certificado']:
+        largura = None
+
+    if certificado.certificado:
+        # certificado já guardado no storage
+        if largura:
+            # sem o derivado (certificado antigo, worker interrompido), o original
+            return redirect(url_imagem(certificado.certificado.name, largura))
         return redirect(certificado.certificado.url)
 
+    chave, etag = chave_certificado(certificado.evento, certificado.participante_id,
+                                    certificado.participante.username, largura)
+    # If-None-Match: o navegador já tem essa versão, responde 304 sem renderizar nada
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        conteudo, etag = obter_certificado(certificado.evento, certificado.participante_id,
+                                           certificado.participante.username, largura)
+        response = HttpResponse(conteudo, content_type='image/webp' if largura else 'image/png')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+
+@login_required
+def importar_participantes_evento(request, id):
+    evento = get_object_or_404(Evento, id=id)
+    if not evento.criador == request.user:
+        raise Http404('Esse evento não é seu')
+
+    arquivo = request.FILES.get('arquivo')
+    if request.method != "POST" or not arquivo:
+        messages.add_message(request, constants.ERROR, 'Envie um arquivo csv.')
+        return redirect(reverse('eventos:participantes_evento', kwargs={'id':id}))
 
+    # o hash das senhas de milhares de linhas passaria do tempo de uma requisição, então o csv
+    # fica no storage e o worker (processar_certificados) faz a importação
+    ImportacaoParticipantes.objects.create(evento=evento, arquivo=arquivo)
+    messages.add_message(request, constants.SUCCESS,
+                         'Importação iniciada! Os participantes aparecem aqui conforme forem criados.')
+    return redirect(reverse('eventos:participantes_evento', kwargs={'id':id}))
@@ -0,0 +1,155 @@
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.messages import constants
+from django.db.models.functions import Substr
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import urlencode
+
+from type_event.assincrono import arender, em_executor, exigir_login, usuario_logado
+from type_event.paginacao import CursorInvalido, CursorPaginator, por_pagina
+from type_event.replicas import ler_da_replica
+
+from .models import Evento, Certificado, ImportacaoParticipantes
+from .busca import buscar_ids
+from .imagens import LARGURAS, url_imagem
+from .sob_demanda import chave_certificado, obter_certificado
+
+
+# Versões assíncronas (ASGI) das views de leitura de views.py, com o mesmo comportamento.
+# As consultas usam a interface assíncrona do ORM (aget, afirst, async for) e o
+# trabalho do Pillow roda no executor limitado de type_event.assincrono.
+# São usadas no lugar das síncronas quando settings.VIEWS_ASYNC está ligado.
+
+
+async def _evento_do_criador(id, usuario):
+    try:
+        evento = await Evento.objects.aget(id=id)
+    except Evento.DoesNotExist:
+        raise Http404()
+    # verifica se o evento pertence ao criador do evento
+    if evento.criador_id != usuario.id:
+        raise Http404('Esse evento não é seu')
+    return evento
+
+
+@ler_da_replica
+async def gerenciar_evento(request):
+    usuario = await usuario_logado(request)
+    if usuario is None:
+        return exigir_login(request)
+    if request.method != "GET":
+        return HttpResponse(status=405)
+
+    nome = request.GET.get('nome')
+    tamanho = por_pagina(request)
+    eventos = (
+        Evento.objects.filter(criador=usuario)
+        .defer('descricao')
+        .annotate(resumo=Substr('descricao', 1, 200))
+    )
+    data = {'nome': nome or ''}
+
+    if nome:
+        pagina = int(request.GET['pagina']) if request.GET.get('pagina', '').isdigit() else 1
+        pagina = max(pagina, 1)
+        inicio = (pagina - 1) * tamanho
+        # a busca indexada usa SQL próprio (cursor do banco), que não tem versão assíncrona
+        ids = await sync_to_async(buscar_ids)(nome, usuario.id, tamanho + 1, inicio)
+        if ids is None:
+            ids = [
+                id async for id in eventos.filter(nome__icontains=nome).order_by('-data_inicio', 'id')
+                .values_list('id', flat=True)[inicio:inicio + tamanho + 1]
+            ]
+        por_id = {evento.id: evento async for evento in eventos.filter(id__in=ids[:tamanho])}
+        data['eventos'] = [por_id[id] for id in ids[:tamanho] if id in por_id]
+        if len(ids) > tamanho:
+            data['proxima'] = urlencode({'nome': nome, 'pagina': pagina + 1, 'por_pagina': tamanho})
+        if pagina > 1:
+            data['anterior'] = urlencode({'nome': nome, 'pagina': pagina - 1, 'por_pagina': tamanho})
+    else:
+        paginator = CursorPaginator(eventos, ordenacao=('-data_inicio', 'id'), por_pagina=tamanho)
+        try:
+            data['eventos'] = await paginator.apagina(request.GET.get('cursor'))
+        except CursorInvalido:
+            data['eventos'] = await paginator.apagina()
+        if data['eventos'].has_next:
+            data['proxima'] = urlencode({'cursor': data['eventos'].proximo, 'por_pagina': tamanho})
+        if data['eventos'].has_previous:
+            data['anterior'] = urlencode({'cursor': data['eventos'].anterior, 'por_pagina': tamanho})
+
+    return await arender(request, 'gerenciar_evento.html', data)
+
+
+@ler_da_replica
+async def participantes_evento(request, id):
+    usuario = await usuario_logado(request)
+    if usuario is None:
+        return exigir_login(request)
+    evento = await _evento_do_criador(id, usuario)
+
+    if request.method != "GET":
+        return HttpResponse(status=405)
+    participantes = evento.participantes.only('id', 'username', 'email')
+    paginator = CursorPaginator(participantes, ordenacao=('id',), por_pagina=por_pagina(request))
+    try:
+        paginas = await paginator.apagina(request.GET.get('cursor'))
+    except CursorInvalido:
+        paginas = await paginator.apagina()
+    importacao = await ImportacaoParticipantes.objects.filter(evento=evento).order_by('-id').afirst()
+    return await arender(request, 'participantes_evento.html',
+                         {'evento': evento, 'paginas': paginas, 'importacao': importacao})
+
+
+@ler_da_replica
+async def procurar_certificado(request, id):
+    usuario = await usuario_logado(request)
+    if usuario is None:
+        return exigir_login(request)
+    evento = await _evento_do_criador(id, usuario)
+
+    email = request.POST.get('email', '')
+    certificado = await Certificado.objects.filter(evento=evento).por_email([email]).order_by('id').afirst()
+    if not certificado:
+        messages.add_message(request, constants.WARNING, 'Este certificado ainda não foi gerado')
+        return redirect(reverse('eventos:certificados_evento', kwargs={'id': id}))
+    return redirect(certificado.url)
+
+
+@ler_da_replica
+async def ver_certificado(request, id):
+    usuario = await usuario_logado(request)
+    if usuario is None:
+        return exigir_login(request)
+    try:
+        certificado = await Certificado.objects.select_related('evento', 'participante').aget(id=id)
+    except Certificado.DoesNotExist:
+        raise Http404()
+    # só o participante e o criador do evento podem ver o certificado
+    if usuario.id not in (certificado.participante_id, certificado.evento.criador_id):
+        raise Http404('Esse certificado não é seu')
+
+    largura = request.GET.get('largura')
+    largura = int(largura) if largura and largura.isdigit() else None
+    if largura not in LARGURAS['certificado']:
+        largura = None
+
+    if certificado.certificado:
+        if largura:
+            # sem o derivado, o original
+            return redirect(await sync_to_async(url_imagem)(certificado.certificado.name, largura))
+        return redirect(certificado.certificado.url)
+
+    chave, etag = chave_certificado(certificado.evento, certificado.participante_id,
+                                    certificado.participante.username, largura)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        # renderizar (ou buscar no cache) fica no executor, o loop continua atendendo
+        conteudo, etag = await em_executor(obter_certificado, certificado.evento, certificado.participante_id,
+                                           certificado.participante.username, largura)
+        response = HttpResponse(conteudo, content_type='image/webp' if largura else 'image/png')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
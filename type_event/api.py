@@ -0,0 +1,117 @@
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.db.models import F
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from .paginacao import CursorInvalido, CursorPaginator, por_pagina
+from .replicas import ler_do_principal
+
+
+# muda quando o formato das respostas mudar, assim os ETags que os clientes guardaram deixam de valer
+VERSAO = 1
+
+
+def erro(mensagem, status=400):
+    return JsonResponse({'erro': mensagem}, status=status)
+
+
+def login_api(view):
+    """Como o login_required, mas responde 401 em JSON em vez de redirecionar para o login."""
+    @wraps(view)
+    def _view(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return erro('Autenticação necessária', status=401)
+        return view(request, *args, **kwargs)
+    return _view
+
+
+def ler_json(request):
+    """Corpo da requisição em JSON (um objeto), ou None se for inválido."""
+    try:
+        dados = json.loads(request.body)
+    except ValueError:
+        return None
+    return dados if isinstance(dados, dict) else None
+
+
+def escolher_campos(pedido, disponiveis, padrao):
+    """Transforma o parâmetro ?campos=a,b numa lista de campos válidos (os inválidos são ignorados)."""
+    if not pedido:
+        return list(padrao)
+    campos = [campo for campo in dict.fromkeys(pedido.split(',')) if campo in disponiveis]
+    return campos or list(padrao)
+
+
+def listar(request, queryset, disponiveis, padrao, ordenacao, formatar=None):
+    """Uma página (por cursor) da consulta, só com os campos pedidos em ?campos=.
+
+    disponiveis liga o nome do campo na API ao campo do modelo, a um lookup ('evento__nome')
+    ou a uma expressão; a consulta usa values(), sem montar instâncias. Os campos da
+    ordenação entram na consulta mesmo sem terem sido pedidos, porque formam o cursor.
+    formatar(item) pode ajustar cada item (urls, por exemplo) antes de sair.
+    """
+    campos = escolher_campos(request.GET.get('campos'), disponiveis, padrao)
+    selecionados = dict.fromkeys(campos + [campo.lstrip('-') for campo in ordenacao])
+    simples, expressoes, nomes = [], {}, {}
+    for campo in selecionados:
+        origem = disponiveis.get(campo, campo)
+        if origem == campo:
+            simples.append(campo)
+            nomes[campo] = campo
+        else:
+            # apelido próprio: o nome da API pode coincidir com uma relação do modelo
+            nomes[campo] = f'api_{campo}'
+            expressoes[nomes[campo]] = F(origem) if isinstance(origem, str) else origem
+
+    paginator = CursorPaginator(queryset.values(*simples, **expressoes), ordenacao, por_pagina(request))
+    pagina = paginator.pagina(request.GET.get('cursor'))
+    resultados = []
+    for item in pagina:
+        item = {campo: item[nome] for campo, nome in nomes.items()}
+        if formatar:
+            formatar(item)
+        resultados.append({campo: item[campo] for campo in campos})
+    return {'resultados': resultados, 'proximo': pagina.proximo, 'anterior': pagina.anterior}
+
+
+def resposta_condicional(request, versoes, gerar):
+    """JsonResponse com ETag e Last-Modified tirados das versões (momento da última alteração).
+
+    O ETag sai das versões, do usuário e da url, sem consultar o banco: se o cliente já
+    tem essa versão (If-None-Match / If-Modified-Since) a resposta é um 304 e gerar()
+    nem é chamado. Com versoes None a resposta sai sempre inteira, sem ETag.
+    """
+    etag = last_modified = response = None
+    if versoes is not None:
+        chave = f'{VERSAO}|{request.user.id}|{request.get_full_path()}|{"|".join(map(repr, versoes))}'
+        etag = '"%s"' % hashlib.sha1(chave.encode('utf-8')).hexdigest()[:20]
+        ultima = int(max(versoes))
+        # o Last-Modified só tem segundos: ele só é enviado depois que o segundo da última alteração
+        # passou, senão uma nova alteração no mesmo segundo teria a mesma data e daria um 304 errado
+        last_modified = ultima if time.time() >= ultima + 1 else None
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    if response is None:
+        try:
+            if etag:
+                # o corpo fica guardado no cliente com o ETag da versão mais nova, então ele é
+                # lido do principal: o de uma réplica atrasada receberia 304 até a próxima mudança
+                with ler_do_principal():
+                    response = JsonResponse(gerar())
+            else:
+                response = JsonResponse(gerar())
+        except CursorInvalido:
+            return erro('Cursor inválido')
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    # o navegador (ou o cliente) pode guardar, mas sempre confirma a versão antes de usar
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Cookie'])
+    return response
@@ -0,0 +1,74 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ArmazenamentoPorConteudo(FileSystemStorage):
+    """Storage que dá a cada arquivo o nome do hash (sha256) do seu conteúdo.
+
+    certificados/x.png vira certificados/ab/cd/abcd…ef.png: as duas subpastas de dois
+    caracteres espalham os arquivos (no máximo 65536 pastas, poucos arquivos em cada),
+    e arquivos iguais ficam com o mesmo nome, então são gravados uma vez só.
+
+    Como um arquivo pode ser usado por mais de uma linha, ele nunca é apagado junto
+    com a linha; o comando limpar_midia remove os que ninguém mais usa.
+    """
+
+    def nome_por_conteudo(self, nome, conteudo):
+        digest = hashlib.sha256()
+        if hasattr(conteudo, 'seek'):
+            conteudo.seek(0)
+        for bloco in conteudo.chunks():
+            digest.update(bloco)
+        if hasattr(conteudo, 'seek'):
+            conteudo.seek(0)
+        hash_ = digest.hexdigest()
+        pasta = posixpath.dirname(nome)
+        extensao = posixpath.splitext(nome)[1].lower()
+        return posixpath.join(pasta, hash_[:2], hash_[2:4], f'{hash_}{extensao}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        nome = self.nome_por_conteudo(name, content)
+        if self.exists(nome):
+            # mesmo conteúdo, mesmo nome: o arquivo que já está lá serve. A data é atualizada
+            # para o limpar_midia não apagar um arquivo órfão que acabou de voltar a ser usado
+            os.utime(self.path(nome))
+            return nome
+        return self._save(nome, content)
+
+    def _save(self, name, content):
+        # grava num temporário da mesma pasta e renomeia: dois processos gravando o mesmo
+        # conteúdo ao mesmo tempo terminam com o mesmo arquivo, sem erro e sem arquivo pela metade
+        completo = self.path(name)
+        pasta = os.path.dirname(completo)
+        os.makedirs(pasta, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=pasta, prefix='.tmp-')
+        try:
+            with os.fdopen(descritor, 'wb') as arquivo:
+                for bloco in content.chunks():
+                    arquivo.write(bloco)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporario, self.file_permissions_mode)
+            os.replace(temporario, completo)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+        return name
+
+
+# sem location, o FileSystemStorage usa o MEDIA_ROOT e o MEDIA_URL do settings
+armazenamento_por_conteudo = ArmazenamentoPorConteudo()
+
+
+def obter_armazenamento():
+    # usado no storage= dos campos; como é uma função, as migrações guardam só a referência
+    return armazenamento_por_conteudo
@@ -0,0 +1,56 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import render
+
+
+# threads para o trabalho de CPU (Pillow) das views assíncronas; o Pillow libera o GIL
+# enquanto redimensiona e comprime, então algumas threads dão conta sem travar o loop
+IMAGENS_THREADS = getattr(settings, 'IMAGENS_THREADS', None) or min(4, os.cpu_count() or 1)
+
+_executor = None
+
+
+def executor_imagens():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=IMAGENS_THREADS, thread_name_prefix='imagens')
+    return _executor
+
+
+async def em_executor(funcao, *args, **kwargs):
+    """Roda uma função de CPU (Pillow) no executor limitado, fora do loop de eventos."""
+    loop = asyncio.get_running_loop()
+    # o run_in_executor não leva o contexto junto, e a medição da requisição (type_event/desempenho.py) fica nele
+    contexto = contextvars.copy_context()
+    return await loop.run_in_executor(executor_imagens(), partial(contexto.run, funcao, *args, **kwargs))
+
+
+def _carregar_usuario(request):
+    # request.user é preguiçoso: carregá-lo lê a sessão e o usuário no banco (código síncrono)
+    return request.user if request.user.is_authenticated else None
+
+
+async def usuario_logado(request):
+    """O usuário logado, ou None para anônimos, sem bloquear o loop."""
+    return await sync_to_async(_carregar_usuario)(request)
+
+
+def exigir_login(request):
+    # o login_required do Django 4.2 não aceita views assíncronas
+    return redirect_to_login(request.get_full_path())
+
+
+async def arender(request, template, contexto=None):
+    """render() numa thread: os context processors leem a sessão e as mensagens de forma síncrona.
+
+    Os querysets do contexto já devem vir avaliados (listas), senão o template
+    consultaria o banco fora do código assíncrono.
+    """
+    return await sync_to_async(render)(request, template, contexto)
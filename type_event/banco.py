@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+PRAGMAS = getattr(settings, 'SQLITE_PRAGMAS', {})
+# PRAGMAs de escrita: as réplicas (type_event/replicas.py) são abertas com mode=ro, e lá o
+# journal_mode=WAL falharia ("attempt to write a readonly database") e derrubaria a conexão
+PRAGMAS_ESCRITA = ('journal_mode', 'synchronous')
+
+
+@receiver(connection_created)
+def configurar_sqlite(sender, connection, **kwargs):
+    """Aplica os PRAGMAs de settings.SQLITE_PRAGMAS a cada conexão nova do SQLite.
+
+    Os PRAGMAs valem só para a conexão (menos o journal_mode=WAL, que fica gravado
+    no arquivo), então precisam ser repetidos sempre que uma conexão é aberta. Nas
+    réplicas (todo alias que não é o default) só entram os de leitura.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    replica = connection.alias != DEFAULT_DB_ALIAS
+    with connection.cursor() as cursor:
+        for nome, valor in PRAGMAS.items():
+            if replica and nome in PRAGMAS_ESCRITA:
+                continue
+            cursor.execute(f'PRAGMA {nome} = {valor}')
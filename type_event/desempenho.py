@@ -0,0 +1,184 @@
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+
+# DesempenhoMiddleware: mede cada requisição sorteada (DESEMPENHO_AMOSTRAGEM) e devolve
+# o cabeçalho Server-Timing (aparece na aba Network do navegador), com o tempo de SQL,
+# de templates e de imagens (Pillow). Requisições lentas e consultas repetidas (N+1)
+# vão para o log "type_event.desempenho" como JSON.
+AMOSTRAGEM = getattr(settings, 'DESEMPENHO_AMOSTRAGEM', 1.0)
+LIMITE_LENTO_MS = getattr(settings, 'DESEMPENHO_LIMITE_LENTO_MS', 500)
+# a mesma consulta (mesmo SQL, parâmetros diferentes) repetida essa quantidade de vezes numa requisição
+LIMITE_REPETICOES = getattr(settings, 'DESEMPENHO_LIMITE_REPETICOES', 5)
+
+logger = logging.getLogger('type_event.desempenho')
+
+# medição da requisição atual; None fora de uma requisição sorteada. ContextVar funciona
+# com threads e com o código assíncrono (o sync_to_async copia o contexto)
+_medicao = ContextVar('medicao', default=None)
+
+RE_LISTA_IN = re.compile(r'IN \((?:%s|\?)(?:, (?:%s|\?))*\)')
+
+
+class Medicao:
+    def __init__(self):
+        self.tempos = defaultdict(float)
+        self.consultas = 0
+        self.repetidas = Counter()
+        self._abertos = set()
+
+
+@contextmanager
+def cronometrar(nome):
+    """Soma o tempo do bloco em Server-Timing com esse nome; também funciona como decorator.
+
+    Blocos com o mesmo nome dentro de outro não são contados de novo.
+    """
+    medicao = _medicao.get()
+    if medicao is None or nome in medicao._abertos:
+        yield
+        return
+    medicao._abertos.add(nome)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicao.tempos[nome] += time.perf_counter() - inicio
+        medicao._abertos.discard(nome)
+
+
+def _registrar_consulta(execute, sql, params, many, context):
+    medicao = _medicao.get()
+    if medicao is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicao.tempos['sql'] += time.perf_counter() - inicio
+        medicao.consultas += 1
+        # os parâmetros já vêm separados, só as listas do IN mudam de tamanho
+        medicao.repetidas[RE_LISTA_IN.sub('IN (...)', sql)] += 1
+
+
+def _instalar(connection, **kwargs):
+    if _registrar_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_registrar_consulta)
+
+
+class TemplateMedido(Template):
+    def render(self, context=None, request=None):
+        # o render() do template da página; os {% include %} ficam dentro dele
+        with cronometrar('template'):
+            return super().render(context, request)
+
+
+class TemplatesMedidos(DjangoTemplates):
+    """Backend de templates do Django que soma o tempo de render em Server-Timing.
+
+    Fica no lugar do DjangoTemplates quando DESEMPENHO=1 (type_event/settings.py).
+    """
+
+    def from_string(self, template_code):
+        return TemplateMedido(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TemplateMedido(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class DesempenhoMiddleware:
+    # sob ASGI as views assíncronas continuam no event loop, sem passar por uma thread
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+        # todas as conexões (de todas as threads) passam pelo wrapper, que não faz nada
+        # quando a requisição não foi sorteada
+        connection_created.connect(_instalar, dispatch_uid='type_event.desempenho')
+        for connection in connections.all(initialized_only=True):
+            _instalar(connection)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        if random.random() >= AMOSTRAGEM:
+            return self.get_response(request)
+
+        medicao = Medicao()
+        token = _medicao.set(medicao)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicao.reset(token)
+        return self.concluir(request, response, medicao, time.perf_counter() - inicio)
+
+    async def __acall__(self, request):
+        if random.random() >= AMOSTRAGEM:
+            return await self.get_response(request)
+
+        # o sync_to_async copia o contexto, então as consultas feitas nas threads
+        # somam na mesma Medicao
+        medicao = Medicao()
+        token = _medicao.set(medicao)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicao.reset(token)
+        return self.concluir(request, response, medicao, time.perf_counter() - inicio)
+
+    def concluir(self, request, response, medicao, total):
+        response['Server-Timing'] = self.server_timing(medicao, total)
+        self.registrar(request, response, medicao, total)
+        return response
+
+    def server_timing(self, medicao, total):
+        consultas = f'{medicao.consultas} consulta' + ('s' if medicao.consultas != 1 else '')
+        partes = [f'sql;dur={medicao.tempos["sql"] * 1000:.1f};desc="{consultas}"']
+        for nome in ('template', 'imagem'):
+            if nome in medicao.tempos:
+                partes.append(f'{nome};dur={medicao.tempos[nome] * 1000:.1f}')
+        partes.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(partes)
+
+    def registrar(self, request, response, medicao, total):
+        repetidas = {sql: vezes for sql, vezes in medicao.repetidas.items() if vezes >= LIMITE_REPETICOES}
+        lenta = total * 1000 >= LIMITE_LENTO_MS
+        if not lenta and not repetidas:
+            return
+        match = request.resolver_match
+        dados = {
+            'view': match.view_name if match else None,
+            'metodo': request.method,
+            'caminho': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'consultas': medicao.consultas,
+            **{f'{nome}_ms': round(tempo * 1000, 1) for nome, tempo in medicao.tempos.items()},
+        }
+        if repetidas:
+            # provável N+1: a mesma consulta feita uma vez para cada item de uma lista
+            dados['repetidas'] = [{'sql': sql[:300], 'vezes': vezes} for sql, vezes in repetidas.items()]
+        logger.warning(json.dumps(dados, ensure_ascii=False),
+                       extra={'desempenho': dados})
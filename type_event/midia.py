@@ -0,0 +1,141 @@
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from eventos.models import Certificado
+
+
+# como os arquivos são entregues depois da verificação de permissão:
+# None     - o próprio Django envia o arquivo (FileResponse com Range/ETag)
+# 'nginx'  - X-Accel-Redirect para MEDIA_ACCEL_PREFIX + caminho (location "internal" no nginx)
+# 'apache' - X-Sendfile com o caminho completo do arquivo (mod_xsendfile, lighttpd)
+MEDIA_ACCEL = getattr(settings, 'MEDIA_ACCEL', None)
+MEDIA_ACCEL_PREFIX = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/media_protegida/')
+
+TAMANHO_BLOCO = 64 * 1024
+RE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _dono_do_certificado(request, nome):
+    # com nomes por conteúdo, certificados iguais dividem o mesmo arquivo: basta ser dono de um deles
+    return Certificado.objects.filter(certificado=nome).filter(
+        Q(participante_id=request.user.id) | Q(evento__criador_id=request.user.id)
+    ).exists()
+
+
+def pode_acessar(request, caminho):
+    """Logos (e seus derivados) são públicos; certificados, só do participante e do criador do evento."""
+    if request.user.is_staff:
+        return True
+
+    partes = caminho.split('/')
+    if partes[0] == 'derivados' and len(partes) >= 3:
+        # derivados/<pasta do original>/<base>-<largura>w-v<versão>.webp vem de <pasta do original>/<base>.*
+        pasta, arquivo = '/'.join(partes[1:-1]), partes[-1]
+        if partes[1] == 'logos':
+            return True
+        if partes[1] == 'certificados':
+            base = re.sub(r'-\d+w-v\d+\.webp$', '', arquivo)
+            return request.user.is_authenticated and _dono_do_certificado(request, f'{pasta}/{base}.png')
+        return False
+
+    # certificados/<nome>.png (antigos) ou certificados/ab/cd/<hash>.png (type_event/armazenamento.py)
+    if partes[0] == 'logos':
+        return True
+    if partes[0] == 'certificados':
+        return request.user.is_authenticated and _dono_do_certificado(request, caminho)
+    # qualquer outro arquivo (como csv antigos) só para a equipe
+    return False
+
+
+def _intervalo(request, tamanho, etag, modificado):
+    """(início, fim) do cabeçalho Range, ou None para enviar o arquivo inteiro."""
+    cabecalho = request.META.get('HTTP_RANGE', '')
+    correspondencia = RE_RANGE.match(cabecalho.strip())
+    if not correspondencia:
+        # sem Range, ou com vários intervalos (que não são suportados): arquivo inteiro
+        return None
+
+    # If-Range: só responde parcialmente se o arquivo for o mesmo que o cliente já tem
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range not in (etag, http_date(modificado)):
+        return None
+
+    inicio, fim = correspondencia.groups()
+    if not inicio:
+        # bytes=-500: os últimos 500 bytes
+        if not fim:
+            return None
+        inicio, fim = max(0, tamanho - int(fim)), tamanho - 1
+    else:
+        inicio, fim = int(inicio), min(int(fim), tamanho - 1) if fim else tamanho - 1
+    if inicio > fim or inicio >= tamanho:
+        return False
+    return inicio, fim
+
+
+def _ler(caminho, inicio, quantidade):
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(inicio)
+        while quantidade > 0:
+            bloco = arquivo.read(min(TAMANHO_BLOCO, quantidade))
+            if not bloco:
+                break
+            quantidade -= len(bloco)
+            yield bloco
+
+
+def servir_midia(request, caminho):
+    caminho = posixpath.normpath(caminho).lstrip('/')
+    try:
+        completo = safe_join(settings.MEDIA_ROOT, caminho)
+    except (ValueError, SuspiciousFileOperation):
+        raise Http404()
+    if not os.path.isfile(completo) or not pode_acessar(request, caminho):
+        raise Http404()
+
+    tipo = mimetypes.guess_type(completo)[0] or 'application/octet-stream'
+    publico = caminho.startswith(('logos/', 'derivados/logos/'))
+    cache_control = 'public, max-age=86400' if publico else 'private, max-age=3600'
+
+    if MEDIA_ACCEL == 'nginx':
+        # o nginx envia o arquivo (com Range, ETag e sendfile), o worker Python fica livre
+        response = HttpResponse(content_type=tipo)
+        response['X-Accel-Redirect'] = MEDIA_ACCEL_PREFIX + caminho
+        response['Cache-Control'] = cache_control
+        return response
+    if MEDIA_ACCEL == 'apache':
+        response = HttpResponse(content_type=tipo)
+        response['X-Sendfile'] = completo
+        response['Cache-Control'] = cache_control
+        return response
+
+    stat = os.stat(completo)
+    etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        intervalo = _intervalo(request, stat.st_size, etag, stat.st_mtime)
+        if intervalo is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        elif intervalo:
+            inicio, fim = intervalo
+            response = StreamingHttpResponse(_ler(completo, inicio, fim - inicio + 1), status=206, content_type=tipo)
+            response['Content-Range'] = f'bytes {inicio}-{fim}/{stat.st_size}'
+            response['Content-Length'] = str(fim - inicio + 1)
+        else:
+            response = FileResponse(open(completo, 'rb'), content_type=tipo)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control
+    return response
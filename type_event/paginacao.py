@@ -0,0 +1,146 @@
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.db.models import Q
+
+
+POR_PAGINA = getattr(settings, 'PAGINACAO_POR_PAGINA', 20)
+MAXIMO_POR_PAGINA = getattr(settings, 'PAGINACAO_MAXIMO_POR_PAGINA', 100)
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def por_pagina(request, padrao=POR_PAGINA):
+    """Tamanho da página pedido em ?por_pagina=, limitado a MAXIMO_POR_PAGINA."""
+    valor = request.GET.get('por_pagina', '')
+    if not valor.isdigit() or int(valor) < 1:
+        return padrao
+    return min(int(valor), MAXIMO_POR_PAGINA)
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def codificar_cursor(valores, direcao):
+    dados = json.dumps({'v': [_serializar(valor) for valor in valores], 'd': direcao}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(dados.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        dados = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        dados = json.loads(dados)
+        return dados['v'], dados['d']
+    except (ValueError, KeyError, TypeError):
+        raise CursorInvalido(cursor)
+
+
+class PaginaCursor:
+    def __init__(self, itens, proximo, anterior, total=None):
+        self.itens = itens
+        self.proximo = proximo
+        self.anterior = anterior
+        self.total = total
+
+    def __iter__(self):
+        return iter(self.itens)
+
+    def __len__(self):
+        return len(self.itens)
+
+    @property
+    def has_next(self):
+        return self.proximo is not None
+
+    @property
+    def has_previous(self):
+        return self.anterior is not None
+
+
+class CursorPaginator:
+    """Paginação por cursor (keyset): cada página continua a partir da última chave vista.
+
+    Em vez de OFFSET, a consulta filtra pela chave de ordenação (que deve ter índice),
+    então a página N custa o mesmo que a primeira. A ordenação precisa ser única,
+    por isso o último campo deve ser a chave primária (ou outro campo único).
+    Os cursores (próximo/anterior) são opacos para quem usa.
+    """
+
+    def __init__(self, queryset, ordenacao=('id',), por_pagina=POR_PAGINA):
+        self.queryset = queryset
+        self.ordenacao = tuple(ordenacao)
+        self.por_pagina = por_pagina
+        self.campos = [campo.lstrip('-') for campo in self.ordenacao]
+
+    def _filtro(self, valores, para_tras):
+        # (a > x) OU (a = x E b > y) OU ... respeitando a direção de cada campo
+        filtro = Q()
+        for i, campo in enumerate(self.ordenacao):
+            decrescente = campo.startswith('-') != para_tras
+            nome = campo.lstrip('-')
+            condicao = Q(**{f'{nome}__{"lt" if decrescente else "gt"}': valores[i]})
+            for anterior, valor in zip(self.campos[:i], valores[:i]):
+                condicao &= Q(**{anterior: valor})
+            filtro |= condicao
+        return filtro
+
+    def _inverter(self, campo):
+        return campo[1:] if campo.startswith('-') else f'-{campo}'
+
+    def _cursor(self, item, direcao):
+        # os itens podem ser instâncias ou dicionários (querysets com values())
+        if isinstance(item, dict):
+            return codificar_cursor([item[campo] for campo in self.campos], direcao)
+        return codificar_cursor([getattr(item, campo) for campo in self.campos], direcao)
+
+    def _consulta(self, cursor):
+        para_tras = False
+        queryset = self.queryset
+        if cursor:
+            valores, direcao = decodificar_cursor(cursor)
+            if len(valores) != len(self.campos):
+                raise CursorInvalido(cursor)
+            para_tras = direcao == 'a'
+            queryset = queryset.filter(self._filtro(valores, para_tras))
+
+        if para_tras:
+            queryset = queryset.order_by(*[self._inverter(campo) for campo in self.ordenacao])
+        else:
+            queryset = queryset.order_by(*self.ordenacao)
+
+        # um item a mais só para saber se existe outra página nessa direção
+        return queryset[:self.por_pagina + 1], para_tras
+
+    def _montar(self, itens, cursor, para_tras, total):
+        tem_mais = len(itens) > self.por_pagina
+        itens = itens[:self.por_pagina]
+        if para_tras:
+            itens.reverse()
+
+        proximo = anterior = None
+        if itens:
+            if tem_mais or para_tras:
+                proximo = self._cursor(itens[-1], 'p')
+            if (tem_mais and para_tras) or (cursor and not para_tras):
+                anterior = self._cursor(itens[0], 'a')
+        return PaginaCursor(itens, proximo, anterior, total)
+
+    def pagina(self, cursor=None, contar=False):
+        """Devolve uma PaginaCursor; o total (COUNT) só é calculado se contar=True."""
+        queryset, para_tras = self._consulta(cursor)
+        total = self.queryset.count() if contar else None
+        return self._montar(list(queryset), cursor, para_tras, total)
+
+    async def apagina(self, cursor=None, contar=False):
+        """Versão assíncrona de pagina(), para as views ASGI."""
+        queryset, para_tras = self._consulta(cursor)
+        itens = [item async for item in queryset]
+        total = await self.queryset.acount() if contar else None
+        return self._montar(itens, cursor, para_tras, total)
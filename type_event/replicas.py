@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+# Leitura nas réplicas (settings.DB_REPLICAS): as views marcadas com @ler_da_replica
+# leem de uma réplica sorteada, o resto (e toda escrita) fica no banco principal.
+# Quem acabou de gravar alguma coisa fica no principal por REPLICA_JANELA segundos
+# (cookie), assim vê a própria inscrição mesmo que a réplica esteja atrasada.
+JANELA = getattr(settings, 'REPLICA_JANELA', 5)
+# uma réplica que não conecta fica fora por esse tempo, e as leituras voltam para o principal
+ESPERA_FALHA = getattr(settings, 'REPLICA_ESPERA_FALHA', 30)
+COOKIE = 'ler_do_principal'
+
+logger = logging.getLogger('type_event.replicas')
+
+
+class Estado:
+    def __init__(self, principal=False):
+        # principal: a requisição veio dentro da janela depois de uma escrita
+        self.principal = principal
+        self.replica = False
+        self.escreveu = False
+
+
+# estado da requisição atual; None fora de uma requisição (comandos, worker): tudo vai ao principal.
+# O objeto é o mesmo nas cópias do contexto (sync_to_async), então as views assíncronas também o veem
+_estado = ContextVar('replicas', default=None)
+
+# réplica -> time.monotonic() até quando ela fica fora
+_fora = {}
+
+
+def replicas():
+    return [alias for alias in connections if alias != DEFAULT_DB_ALIAS]
+
+
+def _disponivel(alias):
+    if _fora.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        # só conecta se a thread ainda não tiver a conexão aberta
+        connections[alias].ensure_connection()
+    except DatabaseError as erro:
+        _fora[alias] = time.monotonic() + ESPERA_FALHA
+        logger.warning('réplica %s indisponível por %ss: %r', alias, ESPERA_FALHA, erro)
+        return False
+    _fora.pop(alias, None)
+    return True
+
+
+def banco_leitura():
+    """Alias do banco para as leituras agora: uma réplica disponível ou o principal."""
+    estado = _estado.get()
+    if estado is None or not estado.replica or estado.principal or estado.escreveu:
+        return DEFAULT_DB_ALIAS
+    # dentro de uma transação, as leituras precisam ver o que a própria transação gravou
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    candidatas = replicas()
+    random.shuffle(candidatas)
+    for alias in candidatas:
+        if _disponivel(alias):
+            return alias
+    return DEFAULT_DB_ALIAS
+
+
+class RoteadorReplicas:
+    def db_for_read(self, model, **hints):
+        # a sessão sempre no principal: uma sessão que ainda não chegou à réplica
+        # (login recém-feito) faria o usuário aparecer deslogado
+        if model._meta.app_label == 'sessions':
+            return DEFAULT_DB_ALIAS
+        return banco_leitura()
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None:
+            estado.escreveu = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # as réplicas têm os mesmos dados do principal
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # as réplicas recebem o esquema pela replicação
+        return db == DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def _na_replica():
+    estado = _estado.get()
+    if estado is None:
+        yield
+        return
+    anterior = estado.replica
+    estado.replica = True
+    try:
+        yield
+    finally:
+        estado.replica = anterior
+
+
+@contextmanager
+def ler_do_principal():
+    """Dentro do bloco as leituras vão ao principal, mesmo numa view @ler_da_replica.
+
+    Para o que vai para o cache: o que é lido de uma réplica atrasada logo depois
+    de uma invalidação ficaria guardado até a próxima.
+    """
+    estado = _estado.get()
+    if estado is None:
+        yield
+        return
+    anterior = estado.principal
+    estado.principal = True
+    try:
+        yield
+    finally:
+        estado.principal = anterior
+
+
+def ler_da_replica(view):
+    """Marca uma view só de leitura: as consultas dela (inclusive o usuário logado) vão para a réplica.
+
+    Deve ficar por fora do login_required, para a autenticação também ler da réplica.
+    Respostas em streaming consultam o banco depois que a view termina, então elas
+    devem usar .using(banco_leitura()) na própria consulta.
+    """
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def _view(request, *args, **kwargs):
+            with _na_replica():
+                return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def _view(request, *args, **kwargs):
+            with _na_replica():
+                return view(request, *args, **kwargs)
+    return _view
+
+
+class ReplicaMiddleware:
+    # sob ASGI as views assíncronas continuam no event loop; o estado é o mesmo objeto
+    # nas threads do sync_to_async, então as escritas feitas lá também marcam escreveu
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        estado = Estado(principal=COOKIE in request.COOKIES)
+        token = _estado.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            _estado.reset(token)
+        return self.concluir(estado, response)
+
+    async def __acall__(self, request):
+        estado = Estado(principal=COOKIE in request.COOKIES)
+        token = _estado.set(estado)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _estado.reset(token)
+        return self.concluir(estado, response)
+
+    def concluir(self, estado, response):
+        if estado.escreveu:
+            # a janela recomeça a cada escrita; o cookie só escolhe o banco, não dá acesso a nada
+            response.set_cookie(COOKIE, '1', max_age=JANELA, httponly=True, samesite='Lax')
+        return response
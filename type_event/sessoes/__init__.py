@@ -0,0 +1,38 @@
+# backends de sessão que só gravam quando o conteúdo da sessão mudou de verdade
+# (SESSION_ENGINE = 'type_event.sessoes.db' ou 'type_event.sessoes.cached_db')
+
+
+class SemEscritaRepetida:
+    """Evita o UPDATE em django_session quando a sessão foi marcada como modificada
+    mas termina a requisição com o mesmo conteúdo com que começou
+    (por exemplo, request.session['x'] = valor que já estava lá).
+    """
+
+    _carregado = None
+
+    def _serializar(self, dados):
+        return self.serializer().dumps(dados)
+
+    def load(self):
+        dados = super().load()
+        self._carregado = self._serializar(dados)
+        return dados
+
+    def save(self, must_create=False):
+        if (not must_create and self.session_key is not None and self._carregado is not None
+                and self._serializar(self._get_session()) == self._carregado):
+            return
+        super().save(must_create=must_create)
+        self._carregado = self._serializar(self._get_session())
+
+    def cycle_key(self):
+        # o padrão grava a sessão com a chave nova na hora (INSERT) e de novo no fim da requisição
+        # com os dados do login (UPDATE); sem chave, o save() do fim da requisição cria a sessão
+        # já com os dados finais, num INSERT só
+        dados = self._get_session()
+        chave_antiga = self.session_key
+        self._session_key = None
+        self._session_cache = dados
+        self.modified = True
+        if chave_antiga:
+            self.delete(chave_antiga)
@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends import cached_db
+
+from . import SemEscritaRepetida
+
+
+class SessionStore(SemEscritaRepetida, cached_db.SessionStore):
+    pass
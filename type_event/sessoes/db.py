@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends import db
+
+from . import SemEscritaRepetida
+
+
+class SessionStore(SemEscritaRepetida, db.SessionStore):
+    pass
@@ -42,6 +42,28 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Medição de desempenho por requisição (type_event/desempenho.py): cabeçalho Server-Timing
+# e log das requisições lentas e das consultas repetidas (N+1). Com DESEMPENHO=1 ela fica
+# por fora de todos os outros middlewares; DESEMPENHO_AMOSTRAGEM é a fração das requisições medidas
+DESEMPENHO_ATIVO = os.environ.get('DESEMPENHO') == '1'
+DESEMPENHO_AMOSTRAGEM = float(os.environ.get('DESEMPENHO_AMOSTRAGEM', 1.0 if DEBUG else 0.05))
+DESEMPENHO_LIMITE_LENTO_MS = 500
+DESEMPENHO_LIMITE_REPETICOES = 5
+if DESEMPENHO_ATIVO:
+    MIDDLEWARE.insert(0, 'type_event.desempenho.DesempenhoMiddleware')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'type_event.desempenho': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+        'type_event.replicas': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 ROOT_URLCONF = 'type_event.urls'
 
 TEMPLATES = [
@@ -55,25 +77,165 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'eventos.context_processors.cache_eventos',
             ],
         },
     },
 ]
 
+if DESEMPENHO_ATIVO:
+    # mesmo backend do Django, com o tempo de render somado ao Server-Timing;
+    # o NAME continua 'django' para quem busca o engine pelo nome
+    TEMPLATES[0].update(BACKEND='type_event.desempenho.TemplatesMedidos', NAME='django')
+
 WSGI_APPLICATION = 'type_event.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_PERFIL escolhe o banco: sqlite (padrão) ou postgresql.
+# Conexões persistentes: cada worker reaproveita a sua conexão por até DB_CONN_MAX_AGE
+# segundos, e o health check descarta a que tiver caído antes de usá-la. Rodando em ASGI,
+# use DB_CONN_MAX_AGE=0 com um pool externo (pgbouncer), já que lá cada thread abre a sua.
+DB_PERFIL = os.environ.get('DB_PERFIL', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+if DB_PERFIL == 'postgresql':
+    # precisa do psycopg (pip install "psycopg[binary]")
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NOME', 'type_event'),
+            'USER': os.environ.get('DB_USUARIO', 'postgres'),
+            'PASSWORD': os.environ.get('DB_SENHA', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORTA', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'connect_timeout': 5},
+        }
     }
+    if os.environ.get('DB_PGBOUNCER') == '1':
+        # pgbouncer em modo transaction: o pool fica com ele, e os cursores
+        # do lado do servidor (iterator()) não sobrevivem à troca de conexão
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NOME') or BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            # segundos esperando o lock de escrita antes de "database is locked"
+            'OPTIONS': {'timeout': 20},
+        }
+    }
+
+# Réplicas de leitura (type_event/replicas.py)
+# DB_REPLICAS: lista separada por vírgulas com os hosts das réplicas do PostgreSQL (host ou host:porta)
+# ou, no SQLite, os caminhos das cópias do banco (abertas só para leitura; para testar localmente,
+# o comando sincronizar_replicas copia o banco principal para elas)
+DB_REPLICAS = [replica.strip() for replica in os.environ.get('DB_REPLICAS', '').split(',') if replica.strip()]
+for numero, replica in enumerate(DB_REPLICAS, start=1):
+    configuracao = dict(DATABASES['default'], OPTIONS=dict(DATABASES['default']['OPTIONS']))
+    if DB_PERFIL == 'postgresql':
+        configuracao['HOST'], _, porta = replica.partition(':')
+        configuracao['PORT'] = porta or configuracao['PORT']
+    else:
+        configuracao['NAME'] = f'file:{replica}?mode=ro'
+    # nos testes a réplica é o próprio banco de teste
+    configuracao['TEST'] = {'MIRROR': 'default'}
+    DATABASES[f'replica{numero}'] = configuracao
+if DB_REPLICAS:
+    DATABASE_ROUTERS = ['type_event.replicas.RoteadorReplicas']
+    # por fora da sessão e da autenticação, que também leem (e gravam) no banco
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+                      'type_event.replicas.ReplicaMiddleware')
+# segundos em que as leituras de quem acabou de gravar ficam no principal
+REPLICA_JANELA = int(os.environ.get('REPLICA_JANELA', 5))
+# segundos que uma réplica que não conectou fica fora antes de ser tentada de novo
+REPLICA_ESPERA_FALHA = 30
+
+# PRAGMAs aplicados em cada conexão nova do SQLite (type_event/banco.py)
+SQLITE_PRAGMAS = {
+    # WAL: leituras não bloqueiam a escrita, nem a escrita as leituras
+    'journal_mode': 'WAL',
+    # com WAL, NORMAL só faz fsync no checkpoint; uma queda de energia pode perder
+    # as últimas transações, mas não corrompe o banco
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    # negativo é em KiB: 64 MB de cache de páginas por conexão
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # certificados renderizados sob demanda, o LocMemCache descarta os menos usados (LRU)
+    # quando passa de MAX_ENTRIES
+    'certificados': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'certificados',
+        'OPTIONS': {'MAX_ENTRIES': 500},
+    },
+}
+
+# o LocMemCache é de cada processo: com vários workers, a invalidação feita por um
+# não chega aos outros, então em produção use um cache compartilhado
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+elif os.environ.get('CACHE_DIR'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['CACHE_DIR'],
+    }
+
+# tempo (em segundos) de eventos, páginas e fragmentos no cache (ver eventos/cache.py)
+CACHE_EVENTOS_TEMPO = 600
+# versões usadas nos ETags da API (eventos/cache.py): ficam no cache quando ele é compartilhado
+# entre o servidor web e o worker (Redis, arquivo), e no banco (tabela eventos_versaoescopo)
+# com o LocMemCache. None: decide pelo backend do cache; True/False força cache/banco
+CACHE_VERSOES_TEMPO = 24 * 60 * 60
+CACHE_VERSOES_COMPARTILHADAS = None
+
+
+# Sessões e mensagens
+# SESSAO_PERFIL escolhe onde fica a sessão:
+# db     - tabela django_session (padrão), gravada só quando o conteúdo muda (type_event/sessoes)
+# cache  - cached_db: lida do cache "sessoes" e gravada no banco só quando muda
+# cookie - cookie assinado: nenhuma leitura ou escrita no banco, mas o conteúdo fica visível
+#          para o usuário (assinado, não criptografado) e o logout não invalida cópias do cookie
+SESSAO_PERFIL = os.environ.get('SESSAO_PERFIL', 'db')
+if SESSAO_PERFIL == 'cookie':
+    SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+    # sem sessão no servidor, as mensagens também ficam só no cookie
+    MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+elif SESSAO_PERFIL == 'cache':
+    SESSION_ENGINE = 'type_event.sessoes.cached_db'
+    SESSION_CACHE_ALIAS = 'sessoes'
+    # o LocMemCache é de cada processo: com vários workers, um logout feito em um não
+    # chegaria aos outros, então fora do runserver use um cache compartilhado (REDIS_URL)
+    CACHES['sessoes'] = dict(CACHES['default']) if os.environ.get('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessoes',
+    }
+else:
+    SESSION_ENGINE = 'type_event.sessoes.db'
+# sessões vencidas apagadas por vez no comando limpar_sessoes
+SESSAO_LIMPEZA_LOTE = 1000
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -114,12 +276,21 @@ STATIC_ROOT = os.path.join('static')
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
+# entrega dos arquivos de mídia depois da verificação de permissão (type_event/midia.py):
+# None (o Django envia), 'nginx' (X-Accel-Redirect) ou 'apache' (X-Sendfile)
+MEDIA_ACCEL = os.environ.get('MEDIA_ACCEL') or None
+# location "internal" do nginx que aponta para MEDIA_ROOT
+MEDIA_ACCEL_PREFIX = '/media_protegida/'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Login
+# para onde o login_required manda quem não está logado (o padrão do Django, /accounts/login/, não existe aqui)
+LOGIN_URL = 'usuarios:login'
+
 # Messages
 MESSAGE_TAGS = {
     constants.DEBUG: 'alert-primary',
@@ -127,4 +298,43 @@ MESSAGE_TAGS = {
     constants.WARNING: 'alert-warning',
     constants.SUCCESS: 'alert-success',
     constants.INFO: 'alert-info ',
-}
\ No newline at end of file
+}
+
+# Certificados
+# True: "gerar todos" só grava as linhas, e cada png é renderizado quando for aberto
+CERTIFICADO_SOB_DEMANDA = False
+# certificados por página em "meus certificados"
+MEUS_CERTIFICADOS_POR_PAGINA = 12
+
+# E-mail
+# em desenvolvimento os e-mails aparecem no console; em produção use
+# EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend e os dados do servidor SMTP
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS') == '1'
+EMAIL_TIMEOUT = 30
+# pasta usada pelo backend django.core.mail.backends.filebased.EmailBackend
+EMAIL_FILE_PATH = os.environ.get('EMAIL_FILE_PATH', os.path.join(BASE_DIR, 'emails'))
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'certificados@typeevent.com.br')
+# endereço do site nos links dos e-mails (o worker não tem uma requisição para descobrir o domínio)
+SITE_URL = os.environ.get('SITE_URL', 'http://127.0.0.1:8000')
+
+# Envio dos certificados por e-mail (eventos/envios.py)
+# e-mails por conexão SMTP, limite por segundo do provedor (0: sem limite) e tentativas por participante
+CERTIFICADO_EMAIL_LOTE = 50
+CERTIFICADO_EMAIL_POR_SEGUNDO = float(os.environ.get('CERTIFICADO_EMAIL_POR_SEGUNDO', 5))
+CERTIFICADO_EMAIL_TENTATIVAS = 5
+# segundos até a reserva de um envio que caiu no meio poder ser assumida por outro
+CERTIFICADO_EMAIL_EXPIRACAO_RESERVA = 600
+# False: o e-mail leva só o link, sem o png anexado
+CERTIFICADO_EMAIL_ANEXO = True
+
+# Views assíncronas (ASGI)
+# VIEWS_ASYNC=1 troca as views de leitura mais acessadas pelas versões assíncronas
+# (eventos/views_async.py e cliente/views_async.py); só faz sentido servindo pelo asgi.py
+VIEWS_ASYNC = os.environ.get('VIEWS_ASYNC') == '1'
+# threads que fazem o trabalho do Pillow nas views assíncronas (padrão: até 4)
+IMAGENS_THREADS = int(os.environ.get('IMAGENS_THREADS', 0)) or None
@@ -1,8 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from . import views
+from .midia import servir_midia
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -10,6 +10,6 @@ urlpatterns = [
     path('usuarios/', include('usuarios.urls')),
     path('eventos/', include('eventos.urls')),
     path('cliente/', include('cliente.urls')),
+    # os arquivos de mídia passam pela verificação de permissão (ver type_event/midia.py)
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:caminho>", servir_midia, name='midia'),
 ]
-
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
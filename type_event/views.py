@@ -1,5 +1,8 @@
 from django.shortcuts import render
+from django.views.decorators.cache import cache_page
 
 
+# a página inicial é igual para todos os visitantes, então fica inteira no cache
+@cache_page(60 * 15)
 def index(request):
-    return render(request, 'index.html')
\ No newline at end of file
+    return render(request, 'index.html')
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Apaga as sessões vencidas aos poucos, em lotes, sem travar a tabela de sessões'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=getattr(settings, 'SESSAO_LIMPEZA_LOTE', 1000),
+                            help='sessões apagadas por vez')
+        parser.add_argument('--pausa', type=float, default=0.1,
+                            help='segundos entre um lote e outro, para as requisições gravarem no meio')
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE.endswith('signed_cookies'):
+            self.stdout.write('As sessões estão em cookies, não há nada para apagar no banco.')
+            return
+
+        # o clearsessions do Django apaga tudo num DELETE só, que no SQLite segura o lock
+        # de escrita até terminar; aqui cada lote é uma transação curta
+        agora = timezone.now()
+        total = 0
+        while True:
+            chaves = list(
+                Session.objects.filter(expire_date__lt=agora)
+                .values_list('session_key', flat=True)[:options['lote']]
+            )
+            if not chaves:
+                break
+            total += Session.objects.filter(session_key__in=chaves).delete()[0]
+            if len(chaves) < options['lote']:
+                break
+            time.sleep(options['pausa'])
+        self.stdout.write(self.style.SUCCESS(f'{total} sessão(ões) vencida(s) apagada(s)'))
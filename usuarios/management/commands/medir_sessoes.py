@@ -0,0 +1,111 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from eventos.medicao import host_local
+from eventos.models import Evento
+
+
+SENHA = 'medir-sessoes'
+COMANDOS_ESCRITA = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+# perfis comparados: o "antes" (backend padrão do Django) e os de SESSAO_PERFIL
+PERFIS = {
+    'django_db': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    },
+    'db': {
+        'SESSION_ENGINE': 'type_event.sessoes.db',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    },
+    'cache': {
+        'SESSION_ENGINE': 'type_event.sessoes.cached_db',
+        'SESSION_CACHE_ALIAS': 'sessoes' if 'sessoes' in settings.CACHES else 'default',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    },
+    'cookie': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.cookie.CookieStorage',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = 'Conta as leituras e escritas no banco por requisição em cada perfil de sessão (SESSAO_PERFIL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=10, help='vezes que a navegação completa é repetida')
+        parser.add_argument('--json', action='store_true', help='imprime o resultado em JSON')
+
+    def _navegar(self, cliente, usuario, evento):
+        # login, páginas de leitura, uma inscrição (com mensagem) e a página que mostra a mensagem
+        inscrever = reverse('eventos:inscrever_evento', kwargs={'id': evento.id})
+        yield cliente.get(reverse('usuarios:login'))
+        yield cliente.post(reverse('usuarios:login'), {'username': usuario.username, 'senha': SENHA})
+        yield cliente.get(reverse('eventos:gerenciar_evento'))
+        yield cliente.get(inscrever)
+        yield cliente.post(inscrever)
+        yield cliente.get(inscrever)
+        yield cliente.get(reverse('cliente:meus_certificados'))
+        yield cliente.get(reverse('usuarios:sair'))
+
+    def _medir(self, usuario, evento, repeticoes):
+        requisicoes = consultas = escritas = sessao_leituras = sessao_escritas = 0
+        for _ in range(repeticoes):
+            cliente = Client(HTTP_HOST=host_local())
+            navegacao = self._navegar(cliente, usuario, evento)
+            while True:
+                with CaptureQueriesContext(connection) as capturadas:
+                    if next(navegacao, None) is None:
+                        break
+                requisicoes += 1
+                for consulta in capturadas:
+                    sql = consulta['sql'].lstrip().upper()
+                    if sql.startswith(('SAVEPOINT', 'RELEASE', 'ROLLBACK')):
+                        continue
+                    escrita = sql.startswith(COMANDOS_ESCRITA)
+                    consultas += 1
+                    escritas += escrita
+                    if 'DJANGO_SESSION' in sql:
+                        sessao_escritas += escrita
+                        sessao_leituras += not escrita
+        return {
+            'requisicoes': requisicoes,
+            'consultas_por_requisicao': round(consultas / requisicoes, 2),
+            'escritas_por_requisicao': round(escritas / requisicoes, 2),
+            'sessao_leituras_por_requisicao': round(sessao_leituras / requisicoes, 2),
+            'sessao_escritas_por_requisicao': round(sessao_escritas / requisicoes, 2),
+        }
+
+    def handle(self, *args, **options):
+        resultados = {}
+        # tudo numa transação desfeita no fim: o usuário, o evento e as sessões da medição não ficam no banco
+        with transaction.atomic():
+            usuario = User.objects.create_user('medir_sessoes', 'medir_sessoes@exemplo.com', SENHA)
+            evento = Evento.objects.create(
+                criador=usuario, nome='Medição de sessões', descricao='', data_inicio='2023-01-01',
+                data_termino='2023-01-01', carga_horaria=1, logo='logos/benchmark.png',
+                cor_principal='#000000', cor_secundaria='#000000', cor_fundo='#ffffff',
+            )
+            for perfil, configuracao in PERFIS.items():
+                with override_settings(**configuracao):
+                    resultados[perfil] = self._medir(usuario, evento, options['repeticoes'])
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultados))
+            return
+        for perfil, r in resultados.items():
+            self.stdout.write(
+                f"{perfil:<10} {r['consultas_por_requisicao']:>6} consultas/req  "
+                f"{r['escritas_por_requisicao']:>5} escritas/req  "
+                f"sessão: {r['sessao_leituras_por_requisicao']:>5} leituras/req, "
+                f"{r['sessao_escritas_por_requisicao']:>5} escritas/req"
+            )
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # o User é do django.contrib.auth, então o índice no e-mail é criado aqui, direto no banco;
+    # LOWER(email) permite buscar ignorando maiúsculas (ver CertificadoQuerySet.por_email)
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS usuario_email_lower_idx ON auth_user (LOWER(email))',
+            'DROP INDEX IF EXISTS usuario_email_lower_idx',
+        ),
+    ]
@@ -1,3 +1,43 @@
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from type_event.sessoes.db import SessionStore
+
+
+class SessaoTestCase(TestCase):
+    def setUp(self):
+        User.objects.create_user('usuario', 'usuario@email.com', 'senha')
+
+    def _escritas_na_sessao(self, capturadas):
+        return [
+            consulta['sql'] for consulta in capturadas
+            if 'django_session' in consulta['sql'] and not consulta['sql'].lstrip().upper().startswith('SELECT')
+        ]
+
+    def test_login_grava_a_sessao_uma_vez(self):
+        with CaptureQueriesContext(connection) as capturadas:
+            self.client.post(reverse('usuarios:login'), {'username': 'usuario', 'senha': 'senha'})
+        self.assertEqual(len(self._escritas_na_sessao(capturadas)), 1)
+        # e a sessão criada mantém o usuário logado nas próximas requisições
+        response = self.client.get(reverse('eventos:gerenciar_evento'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Session.objects.count(), 1)
+
+    def test_sessao_sem_mudanca_nao_e_gravada(self):
+        sessao = SessionStore()
+        sessao['chave'] = 'valor'
+        sessao.save()
+
+        mesma = SessionStore(sessao.session_key)
+        mesma['chave'] = 'valor'
+        with CaptureQueriesContext(connection) as capturadas:
+            mesma.save()
+        self.assertEqual(self._escritas_na_sessao(capturadas), [])
+
+        mesma['chave'] = 'outro valor'
+        mesma.save()
+        self.assertEqual(SessionStore(sessao.session_key)['chave'], 'outro valor')